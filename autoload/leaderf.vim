@@ -498,11 +498,13 @@ function! leaderf#NormalModeFilter(id, winid, key) abort
     elseif key ==? "<PageUp>" || key ==? "<C-B>"
         call win_execute(a:winid, "norm! \<PageUp>")
         exec g:Lf_py printf("ctypes.cast(%d, ctypes.py_object).value._cli._buildPopupPrompt()", a:id)
+        exec g:Lf_py printf("ctypes.cast(%d, ctypes.py_object).value._updateViewport()", a:id)
         exec g:Lf_py printf("ctypes.cast(%d, ctypes.py_object).value._getInstance().refreshPopupStatusline()", a:id)
         exec g:Lf_py printf("ctypes.cast(%d, ctypes.py_object).value._previewResult(False)", a:id)
     elseif key ==? "<PageDown>" || key ==? "<C-F>"
         call win_execute(a:winid, "norm! \<PageDown>")
         exec g:Lf_py printf("ctypes.cast(%d, ctypes.py_object).value._cli._buildPopupPrompt()", a:id)
+        exec g:Lf_py printf("ctypes.cast(%d, ctypes.py_object).value._updateViewport()", a:id)
         exec g:Lf_py printf("ctypes.cast(%d, ctypes.py_object).value._getInstance().refreshPopupStatusline()", a:id)
         exec g:Lf_py printf("ctypes.cast(%d, ctypes.py_object).value._previewResult(False)", a:id)
     elseif key ==# "g"
@@ -510,21 +512,23 @@ function! leaderf#NormalModeFilter(id, winid, key) abort
             let g:Lf_{a:id}_is_g_pressed = 1
         else
             let g:Lf_{a:id}_is_g_pressed = 0
-            call win_execute(a:winid, "norm! gg")
+            exec g:Lf_py printf("ctypes.cast(%d, ctypes.py_object).value.jump('gg')", a:id)
             exec g:Lf_py printf("ctypes.cast(%d, ctypes.py_object).value._cli._buildPopupPrompt()", a:id)
             redraw
         endif
     elseif key ==# "G"
-        call win_execute(a:winid, "norm! G")
+        exec g:Lf_py printf("ctypes.cast(%d, ctypes.py_object).value.jump('G')", a:id)
         exec g:Lf_py printf("ctypes.cast(%d, ctypes.py_object).value._cli._buildPopupPrompt()", a:id)
         redraw
     elseif key ==? "<C-U>"
         call win_execute(a:winid, "norm! \<C-U>")
         exec g:Lf_py printf("ctypes.cast(%d, ctypes.py_object).value._cli._buildPopupPrompt()", a:id)
+        exec g:Lf_py printf("ctypes.cast(%d, ctypes.py_object).value._updateViewport()", a:id)
         redraw
     elseif key ==? "<C-D>"
         call win_execute(a:winid, "norm! \<C-D>")
         exec g:Lf_py printf("ctypes.cast(%d, ctypes.py_object).value._cli._buildPopupPrompt()", a:id)
+        exec g:Lf_py printf("ctypes.cast(%d, ctypes.py_object).value._updateViewport()", a:id)
         redraw
     elseif key ==? "<LeftMouse>"
         if exists("*getmousepos")
@@ -550,6 +554,7 @@ function! leaderf#NormalModeFilter(id, winid, key) abort
         if pos.winid == a:winid
             call win_execute(a:winid, "norm! 3\<C-Y>")
             exec g:Lf_py printf("ctypes.cast(%d, ctypes.py_object).value._cli._buildPopupPrompt()", a:id)
+            exec g:Lf_py printf("ctypes.cast(%d, ctypes.py_object).value._updateViewport()", a:id)
             exec g:Lf_py printf("ctypes.cast(%d, ctypes.py_object).value._getInstance().refreshPopupStatusline()", a:id)
             exec g:Lf_py printf("ctypes.cast(%d, ctypes.py_object).value._previewResult(False)", a:id)
             redraw
@@ -562,6 +567,7 @@ function! leaderf#NormalModeFilter(id, winid, key) abort
         if pos.winid == a:winid
             call win_execute(a:winid, "norm! 3\<C-E>")
             exec g:Lf_py printf("ctypes.cast(%d, ctypes.py_object).value._cli._buildPopupPrompt()", a:id)
+            exec g:Lf_py printf("ctypes.cast(%d, ctypes.py_object).value._updateViewport()", a:id)
             exec g:Lf_py printf("ctypes.cast(%d, ctypes.py_object).value._getInstance().refreshPopupStatusline()", a:id)
             exec g:Lf_py printf("ctypes.cast(%d, ctypes.py_object).value._previewResult(False)", a:id)
             redraw
@@ -633,6 +639,38 @@ function! leaderf#matchaddpos(group, pos) abort
     endfor
 endfunction
 
+" Highlight `pos_list` with `group` in the window `winid`, 0 for the current
+" window, `pos_list` is a list of [lnum, col, length] as in matchaddpos().
+" Return the list of the match ids, so that all the highlights of a refresh
+" are added by a single call from python.
+function! leaderf#matchaddposList(winid, group, pos_list) abort
+    if a:winid != 0
+        let s:match_group = a:group
+        let s:match_pos_list = a:pos_list
+        call win_execute(a:winid, 'let s:match_ids = leaderf#matchaddposList(0, s:match_group, s:match_pos_list)')
+        unlet s:match_group s:match_pos_list
+        return s:match_ids
+    endif
+
+    let ids = []
+    " The maximum number of positions is 8 in matchaddpos().
+    for i in range(0, len(a:pos_list) - 1, 8)
+        call add(ids, matchaddpos(a:group, a:pos_list[i : i + 7]))
+    endfor
+    return ids
+endfunction
+
+" Delete the matches `ids` added by leaderf#matchaddposList().
+function! leaderf#matchdeleteList(winid, ids) abort
+    for id in a:ids
+        if a:winid != 0
+            silent! call matchdelete(id, a:winid)
+        else
+            silent! call matchdelete(id)
+        endif
+    endfor
+endfunction
+
 function! leaderf#closeAllFloatwin(input_win_id, content_win_id, statusline_win_id, show_statusline, id) abort
     if winbufnr(a:input_win_id) == -1
         silent! call nvim_win_close(g:Lf_PreviewWindowID[a:id], 0)
@@ -27,6 +27,7 @@
 #include <windows.h>
 #else
 #include <pthread.h>
+#include <time.h>
 #endif
 
 #include "fuzzyEngine.h"
@@ -34,6 +35,15 @@
 
 typedef float weight_t;
 
+/* the phases of a call whose time is reported by getTimings() */
+enum
+{
+    PHASE_CONVERT = 0,
+    PHASE_MATCH,
+    PHASE_SORT,
+    PHASE_COUNT
+};
+
 typedef struct FeString
 {
     char*    str;
@@ -45,6 +55,8 @@ typedef struct TaskItem
     uint32_t function;
     uint32_t offset;
     uint32_t length;
+    /* the items before `next` have been claimed by the workers, see runItemTask() */
+    volatile uint32_t next;
 }TaskItem;
 
 typedef struct FeResult
@@ -68,20 +80,6 @@ typedef struct MergeTaskItem
     FeResult* buffer;
 }MergeTaskItem;
 
-typedef struct PySetTaskItem
-{
-    uint32_t function;
-    uint32_t offset;
-    uint32_t length;
-    union
-    {
-        weight_t* weights;
-        uint32_t* path_weights;
-    };
-    PyObject* text_list;
-    PyObject* py_source;
-}PySetTaskItem;
-
 typedef struct FeCircularQueue
 {
     void**          buffer;
@@ -125,14 +123,86 @@ struct FuzzyEngine
         };
     };
     FeString*       source;
-    union
-    {
-        FeResult*        results;
-        HighlightGroup** highlights;
-    };
+    /* `source` points to it or to the strings of a corpus */
+    FeString*       source_buffer;
+    uint32_t        source_capacity;
+    FeResult*       results;
+    uint32_t        results_capacity;
+    HighlightGroup** highlights;
+    uint32_t        top_k;
     FeCircularQueue task_queue;
+    /* the tasks being put by putItemTask(), whose items can be stolen */
+    TaskItem*       tasks;
+    volatile uint32_t put_count;
+    volatile uint32_t steal_count;
+    double          start_time;
+    double          join_time;
+    double          timings[PHASE_COUNT];
+};
+
+#define ARENA_BLOCK_SIZE (1 << 20)
+
+typedef struct FeArenaBlock
+{
+    struct FeArenaBlock* next;
+    uint32_t capacity;
+    uint32_t size;
+    char     data[1];
+}FeArenaBlock;
+
+typedef struct FeDigest
+{
+    uint32_t offset;
+    uint32_t len;
+}FeDigest;
+
+/**
+ * A corpus keeps the items of a list converted to C strings in arena blocks,
+ * so that a list that only grows need not be converted again on every match.
+ * `items` is a list of the converted items, which is used to detect whether
+ * the list has been modified, the ResultViews of the matched items refer to it.
+ * The digests of the first `digest_count` strings, calculated with `digest_param`
+ * by fuzzyMatchPart(), are kept in `digests`, which has the same capacity as `strings`.
+ */
+typedef struct FeCorpus
+{
+    PyObject*     items;
+    FeString*     strings;
+    uint32_t      size;
+    uint32_t      capacity;
+    FeArenaBlock* blocks;   /* the block being filled is the head */
+    FeDigest*     digests;
+    uint32_t      digest_count;
+    uint32_t      digest_category;
+    PyObject*     digest_param;
+}FeCorpus;
+
+/**
+ * A ResultView is a read-only sequence of the items of `py_list` at `indices`,
+ * the results of matching are returned as a ResultView instead of a list,
+ * so that no reference to the items is created until they are accessed.
+ * Slicing a ResultView returns a list, view() returns a ResultView of a part of it.
+ */
+typedef struct ResultView
+{
+    PyObject_HEAD
+    PyObject* py_list;
+    uint32_t* indices;
+    uint32_t  size;
+}ResultView;
+
+static PyTypeObject ResultView_Type =
+{
+    PyVarObject_HEAD_INIT(NULL, 0)
+    "fuzzyEngine.ResultView",   /* tp_name */
+    sizeof(ResultView)          /* tp_basicsize */
 };
 
+#define ResultView_Check(op) (Py_TYPE(op) == &ResultView_Type)
+
+/* the index in the list of the `i`th item of a source, `indices` is NULL if the source is a list */
+#define SOURCE_INDEX(indices, i) ((indices) ? (indices)[i] : (uint32_t)(i))
+
 #if defined(_MSC_VER)
 
 #define QUEUE_INIT(queue, queue_capacity, ret_val)                                  \
@@ -323,6 +393,36 @@ struct FuzzyEngine
 
 #define MAX_TASK_COUNT(cpu_count) ((cpu_count) << 3)
 
+#if defined(_MSC_VER)
+    #define ATOMIC_FETCH_ADD(ptr, value) ((uint32_t)InterlockedExchangeAdd((volatile LONG*)(ptr), (LONG)(value)))
+#else
+    #define ATOMIC_FETCH_ADD(ptr, value) __sync_fetch_and_add((ptr), (value))
+#endif
+
+/**
+ * the items of a task are claimed in batches, the size of a batch is adjusted
+ * to the measured time per item, so that a batch takes about BATCH_TIME seconds.
+ */
+#define BATCH_TIME      0.0002
+#define MIN_BATCH_SIZE  16
+#define MAX_BATCH_SIZE  4096
+
+/* return the time in seconds from an arbitrary point, which never goes back */
+static double getTime(void)
+{
+#if defined(_MSC_VER)
+    LARGE_INTEGER frequency;
+    LARGE_INTEGER counter;
+    QueryPerformanceFrequency(&frequency);
+    QueryPerformanceCounter(&counter);
+    return (double)counter.QuadPart / (double)frequency.QuadPart;
+#else
+    struct timespec ts;
+    clock_gettime(CLOCK_MONOTONIC, &ts);
+    return (double)ts.tv_sec + (double)ts.tv_nsec * 1e-9;
+#endif
+}
+
 enum
 {
     GET_WEIGHT = 0,
@@ -332,8 +432,7 @@ enum
     Q_SORT_2,
     MERGE,
     MERGE_2,
-    PY_SET_ITEM,
-    PY_SET_ITEM_2
+    TOP_K
 };
 
 /* sort in descending order */
@@ -353,6 +452,131 @@ static int compare2(const void* a, const void* b)
     return (int)wb - (int)wa;
 }
 
+static void selectTopK(FeResult* results, uint32_t length, uint32_t k);
+
+static void processItems(FuzzyEngine* pEngine, uint32_t function, uint32_t offset, uint32_t length)
+{
+    switch ( function )
+    {
+    case GET_WEIGHT:
+        {
+            FeString* tasks = pEngine->source + offset;
+            FeResult* results = pEngine->results + offset;
+            uint32_t i = 0;
+            for ( ; i < length; ++i )
+            {
+                results[i].weight = getWeight(tasks[i].str, tasks[i].len,
+                                              pEngine->pPattern_ctxt, pEngine->is_name_only);
+                results[i].index = offset + i;
+            }
+        }
+        break;
+    case GET_HIGHLIGHTS:
+        {
+            FeString* tasks = pEngine->source + offset;
+            HighlightGroup** results = pEngine->highlights + offset;
+            uint32_t i = 0;
+            for ( ; i < length; ++i )
+            {
+                results[i] = getHighlights(tasks[i].str, tasks[i].len,
+                                           pEngine->pPattern_ctxt, pEngine->is_name_only);
+            }
+        }
+        break;
+    case GET_PATH_WEIGHT:
+        {
+            FeString* tasks = pEngine->source + offset;
+            FeResult* results = pEngine->results + offset;
+            uint32_t i = 0;
+            for ( ; i < length; ++i )
+            {
+                results[i].path_weight = getPathWeight(pEngine->filename, pEngine->suffix, pEngine->dirname, tasks[i].str, tasks[i].len);
+                results[i].index = offset + i;
+            }
+        }
+        break;
+    }
+}
+
+/**
+ * claim at most `count` items of `pTask` that are not claimed yet,
+ * return the number of the claimed items, the index of the first one is saved in `first`.
+ */
+static uint32_t claimItems(TaskItem* pTask, uint32_t count, uint32_t* first)
+{
+    if ( pTask->next >= pTask->length )
+        return 0;
+
+    uint32_t next = ATOMIC_FETCH_ADD(&pTask->next, count);
+    if ( next >= pTask->length )
+        return 0;
+
+    *first = next;
+    return MIN(count, pTask->length - next);
+}
+
+/**
+ * return the task that has the most unclaimed items among those that have been put,
+ * or NULL if all their items are claimed.
+ */
+static TaskItem* findVictim(FuzzyEngine* pEngine)
+{
+    uint32_t put_count = ATOMIC_FETCH_ADD(&pEngine->put_count, 0);
+    TaskItem* pVictim = NULL;
+    uint32_t max_rest = 0;
+    uint32_t i = 0;
+    for ( ; i < put_count; ++i )
+    {
+        TaskItem* pTask = pEngine->tasks + i;
+        uint32_t next = pTask->next;
+        if ( next < pTask->length && pTask->length - next > max_rest )
+        {
+            max_rest = pTask->length - next;
+            pVictim = pTask;
+        }
+    }
+
+    return pVictim;
+}
+
+/**
+ * a worker claims the items of its task a batch at a time, and when they are all claimed,
+ * it steals the items of the other tasks, so that no worker is idle while some items are left,
+ * e.g., when some lines are much longer than the others.
+ * `pTask` is marked as done only after that, so joining the tasks waits for the stolen items too.
+ */
+static void runItemTask(FuzzyEngine* pEngine, TaskItem* pTask)
+{
+    TaskItem* pVictim = pTask;
+    uint32_t batch_size = MIN_BATCH_SIZE;
+    while ( 1 )
+    {
+        uint32_t first = 0;
+        uint32_t count = claimItems(pVictim, batch_size, &first);
+        if ( count == 0 )
+        {
+            pVictim = findVictim(pEngine);
+            if ( !pVictim )
+                break;
+            continue;
+        }
+
+        if ( pVictim != pTask )
+            ATOMIC_FETCH_ADD(&pEngine->steal_count, 1);
+
+        double start_time = getTime();
+        processItems(pEngine, pTask->function, pVictim->offset + first, count);
+        double elapsed = getTime() - start_time;
+
+        if ( count == batch_size )
+        {
+            double size = elapsed > 0 ? BATCH_TIME * count / elapsed : MAX_BATCH_SIZE;
+            batch_size = size < MIN_BATCH_SIZE ? MIN_BATCH_SIZE
+                         : (size > MAX_BATCH_SIZE ? MAX_BATCH_SIZE : (uint32_t)size);
+        }
+    }
+}
+
 #if defined(_MSC_VER)
 static DWORD WINAPI _worker(LPVOID pParam)
 #else
@@ -371,44 +595,9 @@ static void* _worker(void* pParam)
             switch ( pTask->function )
             {
             case GET_WEIGHT:
-                {
-                    FeString* tasks = pEngine->source + pTask->offset;
-                    FeResult* results = pEngine->results + pTask->offset;
-                    uint32_t length = pTask->length;
-                    uint32_t i = 0;
-                    for ( ; i < length; ++i )
-                    {
-                        results[i].weight = getWeight(tasks[i].str, tasks[i].len,
-                                                      pEngine->pPattern_ctxt, pEngine->is_name_only);
-                        results[i].index = pTask->offset + i;
-                    }
-                }
-                break;
             case GET_HIGHLIGHTS:
-                {
-                    FeString* tasks = pEngine->source + pTask->offset;
-                    HighlightGroup** results = pEngine->highlights + pTask->offset;
-                    uint32_t length = pTask->length;
-                    uint32_t i = 0;
-                    for ( ; i < length; ++i )
-                    {
-                        results[i] = getHighlights(tasks[i].str, tasks[i].len,
-                                                   pEngine->pPattern_ctxt, pEngine->is_name_only);
-                    }
-                }
-                break;
             case GET_PATH_WEIGHT:
-                {
-                    FeString* tasks = pEngine->source + pTask->offset;
-                    FeResult* results = pEngine->results + pTask->offset;
-                    uint32_t length = pTask->length;
-                    uint32_t i = 0;
-                    for ( ; i < length; ++i )
-                    {
-                        results[i].path_weight = getPathWeight(pEngine->filename, pEngine->suffix, pEngine->dirname, tasks[i].str, tasks[i].len);
-                        results[i].index = pTask->offset + i;
-                    }
-                }
+                runItemTask(pEngine, pTask);
                 break;
             case Q_SORT:
                 {
@@ -476,44 +665,9 @@ static void* _worker(void* pParam)
                     }
                 }
                 break;
-            case PY_SET_ITEM:
-                {
-                    PySetTaskItem* pPySetTask = (PySetTaskItem*)pTask;
-                    weight_t* weights = pPySetTask->weights + pPySetTask->offset;
-                    FeResult* results = pEngine->results + pPySetTask->offset;
-                    PyObject* text_list = pPySetTask->text_list;
-                    PyObject* py_source = pPySetTask->py_source;
-                    uint32_t i = 0;
-                    uint32_t length = pPySetTask->length;
-
-                    for ( i = 0; i < length; ++i )
-                    {
-                        weights[i] = results[i].weight;
-                        PyObject* item = PyList_GET_ITEM(py_source, results[i].index);
-                        Py_INCREF(item);
-                        /* PyList_SET_ITEM() steals a reference to item.     */
-                        PyList_SET_ITEM(text_list, pPySetTask->offset + i, item);
-                    }
-                }
-                break;
-            case PY_SET_ITEM_2:
+            case TOP_K:
                 {
-                    PySetTaskItem* pPySetTask = (PySetTaskItem*)pTask;
-                    uint32_t* path_weights = pPySetTask->path_weights + pPySetTask->offset;
-                    FeResult* results = pEngine->results + pPySetTask->offset;
-                    PyObject* text_list = pPySetTask->text_list;
-                    PyObject* py_source = pPySetTask->py_source;
-                    uint32_t i = 0;
-                    uint32_t length = pPySetTask->length;
-
-                    for ( i = 0; i < length; ++i )
-                    {
-                        path_weights[i] = results[i].path_weight;
-                        PyObject* item = PyList_GET_ITEM(py_source, results[i].index);
-                        Py_INCREF(item);
-                        /* PyList_SET_ITEM() steals a reference to item.     */
-                        PyList_SET_ITEM(text_list, pPySetTask->offset + i, item);
-                    }
+                    selectTopK(pEngine->results + pTask->offset, pTask->length, pEngine->top_k);
                 }
                 break;
             }
@@ -545,6 +699,17 @@ FuzzyEngine* createFuzzyEngine(uint32_t cpu_count)
     pEngine->threads = NULL;
     pEngine->pPattern_ctxt = NULL;
     pEngine->source = NULL;
+    pEngine->source_buffer = NULL;
+    pEngine->source_capacity = 0;
+    pEngine->results = NULL;
+    pEngine->results_capacity = 0;
+    pEngine->highlights = NULL;
+    pEngine->tasks = NULL;
+    pEngine->put_count = 0;
+    pEngine->steal_count = 0;
+    pEngine->start_time = 0;
+    pEngine->join_time = 0;
+    memset(pEngine->timings, 0, sizeof(pEngine->timings));
 
     int32_t ret = 0;
     QUEUE_INIT(pEngine->task_queue, MAX_TASK_COUNT(cpu_count) + cpu_count + 1, ret);
@@ -590,140 +755,1190 @@ void closeFuzzyEngine(FuzzyEngine* pEngine)
     }
 
     QUEUE_DESTROY(pEngine->task_queue);
+    free(pEngine->source_buffer);
+    free(pEngine->results);
     free(pEngine);
 }
 
-static int32_t pyObject_ToStringAndSize(PyObject* obj, char** buffer, uint32_t* size)
+/**
+ * start the worker threads if they have not been started,
+ * they are kept in the engine and used by all the later calls.
+ */
+static int32_t startWorkers(FuzzyEngine* pEngine)
 {
-    Py_ssize_t length = 0;
-#if PY_MAJOR_VERSION >= 3
-    *buffer = (char*)PyUnicode_AsUTF8AndSize(obj, &length);
-    *size = (uint32_t)length;
-    if ( buffer )
+    if ( pEngine->threads )
         return 0;
-    else
-        return -1;
+
+#if defined(_MSC_VER)
+    pEngine->threads = (HANDLE*)malloc(pEngine->cpu_count * sizeof(HANDLE));
 #else
-    int ret = PyString_AsStringAndSize(obj, buffer, &length);
-    *size = (uint32_t)length;
-    if ( ret >= 0 )
-        return 0;
-    else
+    pEngine->threads = (pthread_t*)malloc(pEngine->cpu_count * sizeof(pthread_t));
+#endif
+    if ( !pEngine->threads )
+    {
+        fprintf(stderr, "Out of memory at %s:%d\n", __FILE__, __LINE__);
         return -1;
+    }
+
+    uint32_t i = 0;
+    for ( ; i < pEngine->cpu_count; ++i)
+    {
+#if defined(_MSC_VER)
+        pEngine->threads[i] = CreateThread(NULL, 0, _worker, pEngine, 0, NULL);
+        if ( !pEngine->threads[i] )
+#else
+        int ret = pthread_create(&pEngine->threads[i], NULL, _worker, pEngine);
+        if ( ret != 0 )
 #endif
-}
+        {
+            free(pEngine->threads);
+            pEngine->threads = NULL;
+            fprintf(stderr, "pthread_create error!\n");
+            return -1;
+        }
+    }
 
-static void delFuzzyEngine(PyObject* obj)
-{
-    closeFuzzyEngine((FuzzyEngine*)PyCapsule_GetPointer(obj, NULL));
+    return 0;
 }
 
 /**
- * createFuzzyEngine(cpu_count, auto_free=False)
- *
- * `auto_free` is optional that specifies whether auto free the fuzzyEngine object.
- *      It defaults to `False`, which means do not auto free the fuzzyEngine object,
- *      so that you should call closeFuzzyEngine() manually.
- *  return a fuzzyEngine object
+ * the tasks of GET_WEIGHT, GET_HIGHLIGHTS and GET_PATH_WEIGHT are put in order by putItemTask()
+ * after beginItemTasks(tasks), and waited for by joinItemTasks().
  */
-static PyObject* fuzzyEngine_createFuzzyEngine(PyObject* self, PyObject* args, PyObject* kwargs)
+static void beginItemTasks(FuzzyEngine* pEngine, TaskItem* tasks)
 {
-    uint32_t cpu_count;
-    uint8_t  auto_free = 0;
-    static char* kwlist[] = {"cpu_count", "auto_free", NULL};
-
-    if ( !PyArg_ParseTupleAndKeywords(args, kwargs, "I|b:createFuzzyEngine", kwlist, &cpu_count, &auto_free) )
-        return NULL;
-
-    FuzzyEngine* pEngine = createFuzzyEngine(cpu_count);
-
-    return PyCapsule_New(pEngine, NULL, auto_free ? delFuzzyEngine : NULL);
+    pEngine->tasks = tasks;
+    pEngine->put_count = 0;
+    pEngine->steal_count = 0;
+    memset(pEngine->timings, 0, sizeof(pEngine->timings));
+    pEngine->start_time = getTime();
 }
 
-/**
- * closeFuzzyEngine(engine)
- */
-static PyObject* fuzzyEngine_closeFuzzyEngine(PyObject* self, PyObject* args)
+static void putItemTask(FuzzyEngine* pEngine, TaskItem* pTask)
 {
-    PyObject* engine = NULL;
-    if ( !PyArg_ParseTuple(args, "O:closeFuzzyEngine", &engine) )
-        return NULL;
-
-    closeFuzzyEngine((FuzzyEngine*)PyCapsule_GetPointer(engine, NULL));
-
-    Py_RETURN_NONE;
+    pTask->next = 0;
+    ATOMIC_FETCH_ADD(&pEngine->put_count, 1);
+    QUEUE_PUT(pEngine->task_queue, pTask);
 }
 
-static void delPatternContext(PyObject* obj)
+static void joinItemTasks(FuzzyEngine* pEngine)
 {
-    free(PyCapsule_GetPointer(obj, NULL));
+    double put_time = getTime();
+    QUEUE_JOIN(pEngine->task_queue);    /* blocks until all tasks have finished */
+    pEngine->join_time = getTime();
+    pEngine->timings[PHASE_CONVERT] = put_time - pEngine->start_time;
+    pEngine->timings[PHASE_MATCH] = pEngine->join_time - pEngine->start_time;
+    pEngine->put_count = 0;
+    pEngine->tasks = NULL;
 }
 
 /**
- * initPattern(pattern)
+ * called instead of joinItemTasks() if the tasks can not all be put,
+ * it waits for the tasks already put, for the workers may still be running them.
  */
-static PyObject* fuzzyEngine_initPattern(PyObject* self, PyObject* args)
-{
-    const char* pattern;
-    Py_ssize_t pattern_len;
-
-    if ( !PyArg_ParseTuple(args, "s#:initPattern", &pattern, &pattern_len) )
-        return NULL;
-
-    PatternContext* pCtxt = initPattern(pattern, (uint16_t)pattern_len);
-
-    return PyCapsule_New(pCtxt, NULL, delPatternContext);
-}
-
-static void delWeights(PyObject* obj)
-{
-    free(PyCapsule_GetPointer(obj, NULL));
-}
-
-static PyObject* createWeights(void* weights)
+static void abortItemTasks(FuzzyEngine* pEngine)
 {
-    return PyCapsule_New(weights, NULL, delWeights);
+    uint32_t put_count = ATOMIC_FETCH_ADD(&pEngine->put_count, 0);
+    if ( put_count > 0 )
+    {
+#if defined(_MSC_VER)
+        /* the tasks not put will never be done */
+        EnterCriticalSection(&pEngine->task_queue.cs);
+        pEngine->task_queue.task_count = put_count;
+        if ( pEngine->task_queue.done_num >= put_count )
+            SetEvent(pEngine->task_queue.all_done_event);
+        LeaveCriticalSection(&pEngine->task_queue.cs);
+#endif
+        joinItemTasks(pEngine);
+    }
+    else
+    {
+#if defined(_MSC_VER)
+        QUEUE_SET_TASK_COUNT(pEngine->task_queue, 0);
+#endif
+        pEngine->tasks = NULL;
+    }
 }
 
 /**
- * fuzzyMatch(engine, source, pattern, is_name_only=False, sort_results=True)
- *
- * `is_name_only` is optional, it defaults to `False`, which indicates using the full path matching algorithm.
- * `sort_results` is optional, it defaults to `True`, which indicates whether to sort the results.
- *
- * return a tuple, (a list of corresponding weight, a sorted list of items from `source` that match `pattern`).
+ * the buffers are kept in the engine and only grow,
+ * so that matching as the user types does not allocate them again and again.
  */
-static PyObject* fuzzyEngine_fuzzyMatch(PyObject* self, PyObject* args, PyObject* kwargs)
+static int32_t reserveSource(FuzzyEngine* pEngine, uint32_t size)
 {
-    PyObject* py_engine = NULL;
-    PyObject* py_source = NULL;
-    PyObject* py_patternCtxt = NULL;
-    uint8_t is_name_only = 0;
-    uint8_t sort_results = 1;
-    static char* kwlist[] = {"engine", "source", "pattern", "is_name_only", "sort_results", NULL};
+    if ( size > pEngine->source_capacity )
+    {
+        uint32_t capacity = size + (size >> 1);
+        free(pEngine->source_buffer);
+        pEngine->source_buffer = (FeString*)malloc(capacity * sizeof(FeString));
+        if ( !pEngine->source_buffer )
+        {
+            pEngine->source_capacity = 0;
+            fprintf(stderr, "Out of memory at %s:%d\n", __FILE__, __LINE__);
+            return -1;
+        }
+        pEngine->source_capacity = capacity;
+    }
 
-    if ( !PyArg_ParseTupleAndKeywords(args, kwargs, "OOO|bb:fuzzyMatch", kwlist, &py_engine,
-                                      &py_source, &py_patternCtxt, &is_name_only, &sort_results) )
-        return NULL;
+    pEngine->source = pEngine->source_buffer;
 
-    FuzzyEngine* pEngine = (FuzzyEngine*)PyCapsule_GetPointer(py_engine, NULL);
-    if ( !pEngine )
-        return NULL;
+    return 0;
+}
 
-    if ( !PyList_Check(py_source) )
+static int32_t reserveResults(FuzzyEngine* pEngine, uint32_t size)
+{
+    if ( size > pEngine->results_capacity )
     {
-        PyErr_SetString(PyExc_TypeError, "parameter `source` must be a list.");
-        return NULL;
+        uint32_t capacity = size + (size >> 1);
+        free(pEngine->results);
+        pEngine->results = (FeResult*)malloc(capacity * sizeof(FeResult));
+        if ( !pEngine->results )
+        {
+            pEngine->results_capacity = 0;
+            fprintf(stderr, "Out of memory at %s:%d\n", __FILE__, __LINE__);
+            return -1;
+        }
+        pEngine->results_capacity = capacity;
     }
 
-    uint32_t source_size = (uint32_t)PyList_Size(py_source);
-    if ( source_size == 0 )
-    {
-        return Py_BuildValue("([],[])");
-    }
+    return 0;
+}
 
-    pEngine->pPattern_ctxt = (PatternContext*)PyCapsule_GetPointer(py_patternCtxt, NULL);
-    if ( !pEngine->pPattern_ctxt )
+static int32_t pyObject_ToStringAndSize(PyObject* obj, char** buffer, uint32_t* size)
+{
+    Py_ssize_t length = 0;
+#if PY_MAJOR_VERSION >= 3
+    *buffer = (char*)PyUnicode_AsUTF8AndSize(obj, &length);
+    *size = (uint32_t)length;
+    if ( *buffer )
+        return 0;
+    else
+        return -1;
+#else
+    int ret = PyString_AsStringAndSize(obj, buffer, &length);
+    *size = (uint32_t)length;
+    if ( ret >= 0 )
+        return 0;
+    else
+        return -1;
+#endif
+}
+
+enum
+{
+    Category_Rg = 0,
+    Category_Tag,
+    Category_File,
+    Category_Gtags,
+    Category_Line,
+};
+
+typedef struct RgParameter
+{
+    uint32_t display_multi;
+    const char* separator;
+    uint32_t separator_len;
+    uint32_t has_column;
+}RgParameter;
+
+typedef struct Parameter
+{
+    uint32_t mode;
+}Parameter;
+
+typedef struct GtagsParameter
+{
+    uint32_t mode;
+    uint32_t format;
+    uint32_t match_path;
+}GtagsParameter;
+
+static void rg_getDigest(char** str, uint32_t* length, RgParameter* param)
+{
+    char* s = *str;
+    uint32_t len = *length;
+    char* p = NULL;
+
+    if ( param->display_multi )
+    {
+        if ( len == param->separator_len && strncmp(s, param->separator, len) == 0 )
+        {
+            *length = 0;
+            return;
+        }
+        else
+        {
+            uint8_t colon = 0;
+            uint8_t minus = 0;
+            for ( p = s; p < s + len; ++p )
+            {
+                if ( *p == ':' )
+                {
+                    minus = 0;
+                    ++colon;
+                    if ( (colon == 2 && !param->has_column) || colon == 3 )
+                    {
+                        *str = p + 1;
+                        *length -= (uint32_t)(*str - s);
+                        return;
+                    }
+                }
+                else if ( *p == '-' )
+                {
+                    colon = 0;
+                    ++minus;
+                    if ( minus == 2 )
+                    {
+                        *str = p + 1;
+                        *length -= (uint32_t)(*str - s);
+                        return;
+                    }
+                }
+                else if ( !isdigit(*p) && colon + minus > 0 )
+                {
+                    colon = 0;
+                    minus = 0;
+                }
+            }
+        }
+    }
+    else
+    {
+        uint8_t colon = 0;
+        for ( p = s; p < s + len; ++p )
+        {
+            if ( *p == ':' )
+            {
+                ++colon;
+                if ( (colon == 2 && !param->has_column) || colon == 3 )
+                {
+                    *str = p + 1;
+                    *length -= (uint32_t)(*str - s);
+                    return;
+                }
+            }
+            else if ( !isdigit(*p) && colon > 0 )
+            {
+                colon = 0;
+            }
+        }
+    }
+}
+
+static void tag_getDigest(char** str, uint32_t* length, Parameter* param)
+{
+    char* s = *str;
+    uint32_t len = *length;
+    char* p = s;
+    for ( ; p < s + len; ++p )
+    {
+        if ( *p == '\t' )
+        {
+            *length = (uint32_t)(p - s);
+            return;
+        }
+    }
+    /* if there is no '\t', the text is invalid */
+    *length = 0;
+}
+
+static void file_getDigest(char** str, uint32_t* length, Parameter* param)
+{
+    char* s = *str;
+    char *p = s + *length - 1;
+    for ( ; p >= s; --p )
+    {
+        if ( *p == '/' || *p == '\\' )
+        {
+            *str = p + 1;
+            *length -= (uint32_t)(*str - s);
+            return;
+        }
+    }
+}
+
+static void gtags_getDigest(char** str, uint32_t* length, GtagsParameter* param)
+{
+    char* s = *str;
+    uint32_t len = *length;
+    char* p = NULL;
+
+    if ( param->match_path )
+        return;
+
+    if ( param->format == 0 ) /* ctags-mod */
+    {
+        uint8_t tab = 0;
+        for ( p = s; p < s + len; ++p )
+        {
+            if ( *p == '\t' )
+            {
+                ++tab;
+                if ( tab == 2 )
+                {
+                    *str = p + 1;
+                    *length -= (uint32_t)(*str - s);
+                    return;
+                }
+            }
+        }
+    }
+    else if ( param->format == 1 ) /* ctags */
+    {
+        for ( p = s; p < s + len; ++p )
+        {
+            if ( *p == '\t' )
+            {
+                *length = (uint32_t)(p - s);
+                return;
+            }
+        }
+    }
+    else if ( param->format == 2 ) /* ctags-x */
+    {
+        for ( p = s; p < s + len; ++p )
+        {
+            if ( *p == ' ' )
+            {
+                *length = (uint32_t)(p - s);
+                return;
+            }
+        }
+    }
+}
+
+static void line_getDigest(char** str, uint32_t* length, Parameter* param)
+{
+    char* s = *str;
+    char *p = s + *length - 1;
+    for ( ; p >= s; --p )
+    {
+        if ( *p == '\t' )
+        {
+            *length = (uint32_t)(p - s);
+            return;
+        }
+    }
+}
+
+/**
+ * make `s` its digest, i.e., the part of the text that is matched in `category`,
+ * `param` is created by createRgParameter(), createParameter() or createGtagsParameter().
+ */
+static void getDigest(FeString* s, uint32_t category, void* param)
+{
+    switch ( category )
+    {
+    case Category_Rg:
+        rg_getDigest(&s->str, &s->len, (RgParameter*)param);
+        break;
+    case Category_Tag:
+        tag_getDigest(&s->str, &s->len, (Parameter*)param);
+        break;
+    case Category_File:
+        file_getDigest(&s->str, &s->len, (Parameter*)param);
+        break;
+    case Category_Gtags:
+        gtags_getDigest(&s->str, &s->len, (GtagsParameter*)param);
+        break;
+    case Category_Line:
+        line_getDigest(&s->str, &s->len, (Parameter*)param);
+        break;
+    }
+}
+
+static char* arenaAlloc(FeCorpus* pCorpus, uint32_t size)
+{
+    FeArenaBlock* pBlock = pCorpus->blocks;
+    if ( !pBlock || pBlock->capacity - pBlock->size < size )
+    {
+        uint32_t capacity = size > ARENA_BLOCK_SIZE ? size : ARENA_BLOCK_SIZE;
+        pBlock = (FeArenaBlock*)malloc(sizeof(FeArenaBlock) + capacity);
+        if ( !pBlock )
+        {
+            fprintf(stderr, "Out of memory at %s:%d\n", __FILE__, __LINE__);
+            return NULL;
+        }
+        pBlock->next = pCorpus->blocks;
+        pBlock->capacity = capacity;
+        pBlock->size = 0;
+        pCorpus->blocks = pBlock;
+    }
+
+    char* p = pBlock->data + pBlock->size;
+    pBlock->size += size;
+
+    return p;
+}
+
+static void freeArena(FeCorpus* pCorpus)
+{
+    while ( pCorpus->blocks )
+    {
+        FeArenaBlock* pBlock = pCorpus->blocks;
+        pCorpus->blocks = pBlock->next;
+        free(pBlock);
+    }
+}
+
+static int32_t truncateCorpus(FeCorpus* pCorpus, uint32_t size)
+{
+    if ( Py_REFCNT(pCorpus->items) > 1 )
+    {
+        /* the list is referred to by some ResultViews, so it is not changed but copied */
+        PyObject* items = PyList_GetSlice(pCorpus->items, 0, size);
+        if ( !items )
+            return -1;
+        Py_DECREF(pCorpus->items);
+        pCorpus->items = items;
+    }
+    else if ( PyList_SetSlice(pCorpus->items, size, PyList_GET_SIZE(pCorpus->items), NULL) < 0 )
+    {
+        return -1;
+    }
+    pCorpus->size = size;
+    if ( pCorpus->digest_count > size )
+    {
+        pCorpus->digest_count = size;
+    }
+
+    /* the space of the truncated strings is not reused until the corpus is empty */
+    if ( size == 0 )
+    {
+        freeArena(pCorpus);
+    }
+
+    return 0;
+}
+
+/**
+ * make the strings of the corpus in [begin, end) correspond to source[begin:end],
+ * only the items that are not in the corpus or have been changed are converted.
+ */
+static int32_t updateCorpus(FeCorpus* pCorpus, PyObject* py_source, uint32_t begin, uint32_t end)
+{
+    PyObject** items = PySequence_Fast_ITEMS(py_source);
+    PyObject** corpus_items = PySequence_Fast_ITEMS(pCorpus->items);
+    uint32_t n = MIN(end, pCorpus->size);
+    if ( begin < n && memcmp(corpus_items + begin, items + begin, (n - begin) * sizeof(PyObject*)) != 0 )
+    {
+        uint32_t i = begin;
+        while ( corpus_items[i] == items[i] )
+        {
+            ++i;
+        }
+        if ( truncateCorpus(pCorpus, i) < 0 )
+            return -1;
+    }
+
+    if ( end <= pCorpus->size )
+        return 0;
+
+    if ( end > pCorpus->capacity )
+    {
+        uint32_t capacity = end + (end >> 1);
+        FeString* new_strings = (FeString*)realloc(pCorpus->strings, capacity * sizeof(FeString));
+        if ( !new_strings )
+        {
+            fprintf(stderr, "Out of memory at %s:%d\n", __FILE__, __LINE__);
+            return -1;
+        }
+        pCorpus->strings = new_strings;
+
+        FeDigest* new_digests = (FeDigest*)realloc(pCorpus->digests, capacity * sizeof(FeDigest));
+        if ( !new_digests )
+        {
+            fprintf(stderr, "Out of memory at %s:%d\n", __FILE__, __LINE__);
+            return -1;
+        }
+        pCorpus->digests = new_digests;
+        pCorpus->capacity = capacity;
+    }
+
+    uint32_t i = pCorpus->size;
+    for ( ; i < end; ++i )
+    {
+        char* str = NULL;
+        uint32_t len = 0;
+        if ( pyObject_ToStringAndSize(items[i], &str, &len) < 0 )
+        {
+            fprintf(stderr, "pyObject_ToStringAndSize error!\n");
+            return -1;
+        }
+
+        char* p = arenaAlloc(pCorpus, len + 1);
+        if ( !p )
+            return -1;
+
+        memcpy(p, str, len);
+        p[len] = '\0';
+        pCorpus->strings[i].str = p;
+        pCorpus->strings[i].len = len;
+
+        if ( PyList_Append(pCorpus->items, items[i]) < 0 )
+            return -1;
+        pCorpus->size = i + 1;
+    }
+
+    return 0;
+}
+
+/**
+ * calculate the digests of the strings of the corpus that have none yet,
+ * all of them are calculated again if `py_param` is not the one they were calculated with.
+ * `py_param` is referred to by the corpus, so that another parameter never takes its address.
+ */
+static void updateDigests(FeCorpus* pCorpus, uint32_t category, PyObject* py_param, void* param)
+{
+    if ( pCorpus->digest_param != py_param || pCorpus->digest_category != category )
+    {
+        Py_INCREF(py_param);
+        Py_XDECREF(pCorpus->digest_param);
+        pCorpus->digest_param = py_param;
+        pCorpus->digest_category = category;
+        pCorpus->digest_count = 0;
+    }
+
+    uint32_t i = pCorpus->digest_count;
+    for ( ; i < pCorpus->size; ++i )
+    {
+        FeString digest = pCorpus->strings[i];
+        getDigest(&digest, category, param);
+        pCorpus->digests[i].offset = (uint32_t)(digest.str - pCorpus->strings[i].str);
+        pCorpus->digests[i].len = digest.len;
+    }
+    pCorpus->digest_count = pCorpus->size;
+}
+
+/**
+ * `source` is a list or a ResultView, get the list that the items of `source` are in,
+ * `indices` is set to the indices of the items in the list if `source` is a ResultView, otherwise NULL.
+ */
+static int32_t getSourceList(PyObject* py_source, PyObject** py_list, uint32_t** indices, Py_ssize_t* size)
+{
+    if ( PyList_Check(py_source) )
+    {
+        *py_list = py_source;
+        *indices = NULL;
+        *size = PyList_GET_SIZE(py_source);
+    }
+    else if ( ResultView_Check(py_source) )
+    {
+        ResultView* pView = (ResultView*)py_source;
+        *py_list = pView->py_list;
+        *indices = pView->indices;
+        *size = pView->size;
+    }
+    else
+    {
+        PyErr_SetString(PyExc_TypeError, "parameter `source` must be a list or a ResultView.");
+        return -1;
+    }
+
+    return 0;
+}
+
+/**
+ * get the range [begin, end) of a source of `size` items to match from the arguments,
+ * `end` less than 0 means the end of the source.
+ */
+static void getSourceRange(Py_ssize_t size, Py_ssize_t* begin, Py_ssize_t* end)
+{
+    if ( *end < 0 || *end > size )
+        *end = size;
+
+    if ( *begin < 0 )
+        *begin = 0;
+    else if ( *begin > *end )
+        *begin = *end;
+}
+
+/**
+ * steals `indices`, which is allocated by malloc().
+ */
+static PyObject* createResultView(PyObject* py_list, uint32_t* indices, uint32_t size)
+{
+    ResultView* pView = PyObject_New(ResultView, &ResultView_Type);
+    if ( !pView )
+    {
+        free(indices);
+        return NULL;
+    }
+
+    Py_INCREF(py_list);
+    pView->py_list = py_list;
+    pView->indices = indices;
+    pView->size = size;
+
+    return (PyObject*)pView;
+}
+
+static void resultView_dealloc(PyObject* self)
+{
+    ResultView* pView = (ResultView*)self;
+    Py_XDECREF(pView->py_list);
+    free(pView->indices);
+    PyObject_Del(self);
+}
+
+static Py_ssize_t resultView_length(PyObject* self)
+{
+    return ((ResultView*)self)->size;
+}
+
+static PyObject* resultView_item(PyObject* self, Py_ssize_t i)
+{
+    ResultView* pView = (ResultView*)self;
+    if ( i < 0 || i >= (Py_ssize_t)pView->size || pView->indices[i] >= PyList_GET_SIZE(pView->py_list) )
+    {
+        PyErr_SetString(PyExc_IndexError, "ResultView index out of range");
+        return NULL;
+    }
+
+    PyObject* item = PyList_GET_ITEM(pView->py_list, pView->indices[i]);
+    Py_INCREF(item);
+
+    return item;
+}
+
+static PyObject* resultView_subscript(PyObject* self, PyObject* key)
+{
+    ResultView* pView = (ResultView*)self;
+    if ( PyIndex_Check(key) )
+    {
+        Py_ssize_t i = PyNumber_AsSsize_t(key, PyExc_IndexError);
+        if ( i == -1 && PyErr_Occurred() )
+            return NULL;
+
+        if ( i < 0 )
+            i += pView->size;
+
+        return resultView_item(self, i);
+    }
+    else if ( PySlice_Check(key) )
+    {
+        Py_ssize_t start, stop, step, length;
+#if PY_MAJOR_VERSION >= 3
+        if ( PySlice_GetIndicesEx(key, pView->size, &start, &stop, &step, &length) < 0 )
+#else
+        if ( PySlice_GetIndicesEx((PySliceObject*)key, pView->size, &start, &stop, &step, &length) < 0 )
+#endif
+            return NULL;
+
+        PyObject* list = PyList_New(length);
+        if ( !list )
+            return NULL;
+
+        Py_ssize_t i = 0;
+        for ( ; i < length; ++i, start += step )
+        {
+            PyObject* item = resultView_item(self, start);
+            if ( !item )
+            {
+                Py_DECREF(list);
+                return NULL;
+            }
+            PyList_SET_ITEM(list, i, item);
+        }
+
+        return list;
+    }
+    else
+    {
+        PyErr_SetString(PyExc_TypeError, "ResultView indices must be integers or slices");
+        return NULL;
+    }
+}
+
+/**
+ * the concatenation of two ResultViews of the same list is a ResultView, otherwise it is a list.
+ */
+static PyObject* resultView_concat(PyObject* self, PyObject* other)
+{
+    ResultView* pView = (ResultView*)self;
+    if ( ResultView_Check(other) && ((ResultView*)other)->py_list == pView->py_list )
+    {
+        ResultView* pOther = (ResultView*)other;
+        uint32_t size = pView->size + pOther->size;
+        uint32_t* indices = (uint32_t*)malloc((size > 0 ? size : 1) * sizeof(uint32_t));
+        if ( !indices )
+        {
+            fprintf(stderr, "Out of memory at %s:%d\n", __FILE__, __LINE__);
+            return PyErr_NoMemory();
+        }
+        memcpy(indices, pView->indices, pView->size * sizeof(uint32_t));
+        memcpy(indices + pView->size, pOther->indices, pOther->size * sizeof(uint32_t));
+
+        return createResultView(pView->py_list, indices, size);
+    }
+
+    PyObject* list = PySequence_List(self);
+    if ( !list )
+        return NULL;
+
+    PyObject* result = PySequence_InPlaceConcat(list, other);
+    Py_DECREF(list);
+
+    return result;
+}
+
+/**
+ * view(start=0, stop=-1)
+ *
+ * return a ResultView of the items in [start, stop) of this one, no reference to the items is created,
+ * `stop` less than 0 means the end.
+ */
+static PyObject* resultView_view(PyObject* self, PyObject* args)
+{
+    ResultView* pView = (ResultView*)self;
+    Py_ssize_t start = 0;
+    Py_ssize_t stop = -1;
+    if ( !PyArg_ParseTuple(args, "|nn:view", &start, &stop) )
+        return NULL;
+
+    getSourceRange(pView->size, &start, &stop);
+    uint32_t size = (uint32_t)(stop - start);
+    uint32_t* indices = (uint32_t*)malloc((size > 0 ? size : 1) * sizeof(uint32_t));
+    if ( !indices )
+    {
+        fprintf(stderr, "Out of memory at %s:%d\n", __FILE__, __LINE__);
+        return PyErr_NoMemory();
+    }
+    memcpy(indices, pView->indices + start, size * sizeof(uint32_t));
+
+    return createResultView(pView->py_list, indices, size);
+}
+
+static PySequenceMethods resultView_as_sequence;
+static PyMappingMethods resultView_as_mapping;
+
+static PyMethodDef resultView_methods[] =
+{
+    { "view", (PyCFunction)resultView_view, METH_VARARGS, "" },
+    { NULL, NULL, 0, NULL }
+};
+
+static int32_t initResultViewType(void)
+{
+    resultView_as_sequence.sq_length = resultView_length;
+    resultView_as_sequence.sq_concat = resultView_concat;
+    resultView_as_sequence.sq_item = resultView_item;
+    resultView_as_mapping.mp_length = resultView_length;
+    resultView_as_mapping.mp_subscript = resultView_subscript;
+
+    ResultView_Type.tp_dealloc = resultView_dealloc;
+    ResultView_Type.tp_as_sequence = &resultView_as_sequence;
+    ResultView_Type.tp_as_mapping = &resultView_as_mapping;
+    ResultView_Type.tp_methods = resultView_methods;
+    ResultView_Type.tp_flags = Py_TPFLAGS_DEFAULT;
+    ResultView_Type.tp_doc = "a read-only sequence of the matched items";
+
+    return PyType_Ready(&ResultView_Type);
+}
+
+static void delFuzzyEngine(PyObject* obj)
+{
+    closeFuzzyEngine((FuzzyEngine*)PyCapsule_GetPointer(obj, NULL));
+}
+
+/**
+ * createFuzzyEngine(cpu_count, auto_free=False)
+ *
+ * `auto_free` is optional that specifies whether auto free the fuzzyEngine object.
+ *      It defaults to `False`, which means do not auto free the fuzzyEngine object,
+ *      so that you should call closeFuzzyEngine() manually.
+ *  return a fuzzyEngine object
+ */
+static PyObject* fuzzyEngine_createFuzzyEngine(PyObject* self, PyObject* args, PyObject* kwargs)
+{
+    uint32_t cpu_count;
+    uint8_t  auto_free = 0;
+    static char* kwlist[] = {"cpu_count", "auto_free", NULL};
+
+    if ( !PyArg_ParseTupleAndKeywords(args, kwargs, "I|b:createFuzzyEngine", kwlist, &cpu_count, &auto_free) )
+        return NULL;
+
+    FuzzyEngine* pEngine = createFuzzyEngine(cpu_count);
+
+    return PyCapsule_New(pEngine, NULL, auto_free ? delFuzzyEngine : NULL);
+}
+
+/**
+ * closeFuzzyEngine(engine)
+ */
+static PyObject* fuzzyEngine_closeFuzzyEngine(PyObject* self, PyObject* args)
+{
+    PyObject* engine = NULL;
+    if ( !PyArg_ParseTuple(args, "O:closeFuzzyEngine", &engine) )
+        return NULL;
+
+    closeFuzzyEngine((FuzzyEngine*)PyCapsule_GetPointer(engine, NULL));
+
+    Py_RETURN_NONE;
+}
+
+/**
+ * getTimings(engine)
+ *
+ * return a dict of the seconds spent in the phases of the last call of fuzzyMatch(), fuzzyMatchEx(),
+ * fuzzyMatchPart(), guessMatch() or getHighlights(), and the number of the batches stolen by the workers,
+ * e.g., {"convert": 0.002, "match": 0.015, "sort": 0.004, "steals": 12}
+ * "convert" is the time spent converting the source, which overlaps with "match".
+ */
+static PyObject* fuzzyEngine_getTimings(PyObject* self, PyObject* args)
+{
+    PyObject* engine = NULL;
+    if ( !PyArg_ParseTuple(args, "O:getTimings", &engine) )
+        return NULL;
+
+    FuzzyEngine* pEngine = (FuzzyEngine*)PyCapsule_GetPointer(engine, NULL);
+    if ( !pEngine )
+        return NULL;
+
+    return Py_BuildValue("{s:d,s:d,s:d,s:I}",
+                         "convert", pEngine->timings[PHASE_CONVERT],
+                         "match", pEngine->timings[PHASE_MATCH],
+                         "sort", pEngine->timings[PHASE_SORT],
+                         "steals", (unsigned int)pEngine->steal_count);
+}
+
+static void delCorpus(PyObject* obj)
+{
+    FeCorpus* pCorpus = (FeCorpus*)PyCapsule_GetPointer(obj, NULL);
+    if ( !pCorpus )
+        return;
+
+    freeArena(pCorpus);
+    Py_DECREF(pCorpus->items);
+    Py_XDECREF(pCorpus->digest_param);
+    free(pCorpus->strings);
+    free(pCorpus->digests);
+    free(pCorpus);
+}
+
+/**
+ * createCorpus()
+ *
+ * return a corpus object, which is freed automatically.
+ * Pass it to fuzzyMatch() or fuzzyMatchPart() together with a list that only grows,
+ * so that the items of the list are converted to C strings only once.
+ */
+static PyObject* fuzzyEngine_createCorpus(PyObject* self, PyObject* args)
+{
+    FeCorpus* pCorpus = (FeCorpus*)malloc(sizeof(FeCorpus));
+    if ( !pCorpus )
+    {
+        fprintf(stderr, "Out of memory at %s:%d\n", __FILE__, __LINE__);
+        return NULL;
+    }
+
+    pCorpus->items = PyList_New(0);
+    if ( !pCorpus->items )
+    {
+        free(pCorpus);
+        return NULL;
+    }
+    pCorpus->strings = NULL;
+    pCorpus->size = 0;
+    pCorpus->capacity = 0;
+    pCorpus->blocks = NULL;
+    pCorpus->digests = NULL;
+    pCorpus->digest_count = 0;
+    pCorpus->digest_category = 0;
+    pCorpus->digest_param = NULL;
+
+    return PyCapsule_New(pCorpus, NULL, delCorpus);
+}
+
+static void delPatternContext(PyObject* obj)
+{
+    free(PyCapsule_GetPointer(obj, NULL));
+}
+
+/**
+ * initPattern(pattern)
+ */
+static PyObject* fuzzyEngine_initPattern(PyObject* self, PyObject* args)
+{
+    const char* pattern;
+    Py_ssize_t pattern_len;
+
+    if ( !PyArg_ParseTuple(args, "s#:initPattern", &pattern, &pattern_len) )
+        return NULL;
+
+    PatternContext* pCtxt = initPattern(pattern, (uint16_t)pattern_len);
+    if ( !pCtxt )
+    {
+        PyErr_SetString(PyExc_ValueError, "the pattern can not be matched, e.g., it has too many non-ASCII characters.");
+        return NULL;
+    }
+
+    return PyCapsule_New(pCtxt, NULL, delPatternContext);
+}
+
+static void delWeights(PyObject* obj)
+{
+    free(PyCapsule_GetPointer(obj, NULL));
+}
+
+static PyObject* createWeights(void* weights)
+{
+    return PyCapsule_New(weights, NULL, delWeights);
+}
+
+/* results[0] is the one with the smallest weight in the heap */
+static void siftDown(FeResult* results, uint32_t length, uint32_t i)
+{
+    FeResult t = results[i];
+    uint32_t child = (i << 1) + 1;
+    while ( child < length )
+    {
+        if ( child + 1 < length && results[child + 1].weight < results[child].weight )
+        {
+            ++child;
+        }
+
+        if ( results[child].weight < t.weight )
+        {
+            results[i] = results[child];
+            i = child;
+            child = (i << 1) + 1;
+        }
+        else
+        {
+            break;
+        }
+    }
+    results[i] = t;
+}
+
+/**
+ * move the `k` results with the biggest weights to the front of `results`,
+ * they form a min-heap, the rest are left where they were swapped to.
+ */
+static void selectTopK(FeResult* results, uint32_t length, uint32_t k)
+{
+    if ( length <= k )
+        return;
+
+    uint32_t i = k >> 1;
+    while ( i > 0 )
+    {
+        --i;
+        siftDown(results, k, i);
+    }
+
+    for ( i = k; i < length; ++i )
+    {
+        if ( results[i].weight > results[0].weight )
+        {
+            FeResult t = results[0];
+            results[0] = results[i];
+            results[i] = t;
+            siftDown(results, k, 0);
+        }
+    }
+}
+
+/**
+ * sort the best `top_k` ones of pEngine->results in parallel instead of sorting all of them,
+ * the results that are not sorted are moved after them.
+ * return the number of results at the front that are in their final order, it is at least `top_k`.
+ */
+static uint32_t sortTopK(FuzzyEngine* pEngine, TaskItem* tasks, uint32_t task_count,
+                         uint32_t results_count, uint32_t top_k)
+{
+    FeResult* results = pEngine->results;
+    uint32_t chunk_size = results_count;
+    if ( task_count > 1 && results_count >= 20000 )
+    {
+        chunk_size = (results_count + task_count - 1) / task_count;
+        if ( chunk_size < (top_k << 2) )
+        {
+            chunk_size = top_k << 2;
+        }
+    }
+    task_count = (results_count + chunk_size - 1) / chunk_size;
+
+    pEngine->top_k = top_k;
+    uint32_t i = 0;
+    if ( task_count == 1 )
+    {
+        selectTopK(results, results_count, top_k);
+    }
+    else
+    {
+#if defined(_MSC_VER)
+        QUEUE_SET_TASK_COUNT(pEngine->task_queue, task_count);
+#endif
+        for ( i = 0; i < task_count; ++i )
+        {
+            uint32_t offset = i * chunk_size;
+            uint32_t length = MIN(chunk_size, results_count - offset);
+
+            tasks[i].function = TOP_K;
+            tasks[i].offset = offset;
+            tasks[i].length = length;
+            QUEUE_PUT(pEngine->task_queue, tasks + i);
+        }
+
+        QUEUE_JOIN(pEngine->task_queue);    /* blocks until all tasks have finished */
+    }
+
+    /* gather the candidates of every chunk to the front */
+    weight_t threshold = MIN_WEIGHT;
+    uint32_t candidate_count = 0;
+    for ( i = 0; i < task_count; ++i )
+    {
+        uint32_t offset = i * chunk_size;
+        uint32_t length = MIN(chunk_size, results_count - offset);
+        if ( length > top_k )
+        {
+            /* the rest of this chunk are not better than the top of the heap */
+            if ( results[offset].weight > threshold )
+            {
+                threshold = results[offset].weight;
+            }
+            length = top_k;
+        }
+
+        uint32_t j = 0;
+        for ( ; j < length; ++j )
+        {
+            FeResult t = results[candidate_count];
+            results[candidate_count] = results[offset + j];
+            results[offset + j] = t;
+            ++candidate_count;
+        }
+    }
+
+    qsort(results, candidate_count, sizeof(FeResult), compare);
+
+    uint32_t sorted_count = top_k;
+    while ( sorted_count < candidate_count && results[sorted_count].weight >= threshold )
+    {
+        ++sorted_count;
+    }
+
+    return sorted_count;
+}
+
+/**
+ * the number of sorted results is saved in the context of the capsule if not all the results are sorted.
+ */
+static void setSortedCount(PyObject* py_weights, uint32_t sorted_count, uint32_t results_count)
+{
+    if ( sorted_count < results_count )
+    {
+        PyCapsule_SetContext(py_weights, (void*)(size_t)sorted_count);
+    }
+}
+
+static uint32_t getSortedCount(PyObject* py_weights, uint32_t results_count)
+{
+    /* e.g., ([], []) when nothing matches */
+    if ( !PyCapsule_CheckExact(py_weights) )
+        return results_count;
+
+    uint32_t sorted_count = (uint32_t)(size_t)PyCapsule_GetContext(py_weights);
+    return sorted_count == 0 ? results_count : sorted_count;
+}
+
+/**
+ * get the weights and the indices in `py_list` of the first `results_count` ones of pEngine->results,
+ * `source_indices` and `begin` are what the indices of pEngine->results are relative to.
+ */
+static int32_t createResults(FuzzyEngine* pEngine, PyObject* py_list, uint32_t* source_indices, uint32_t begin,
+                             uint32_t results_count, weight_t** weights, uint32_t** indices)
+{
+    *weights = (weight_t*)malloc(results_count * sizeof(weight_t));
+    if ( !*weights )
+    {
+        fprintf(stderr, "Out of memory at %s:%d\n", __FILE__, __LINE__);
+        return -1;
+    }
+
+    *indices = (uint32_t*)malloc(results_count * sizeof(uint32_t));
+    if ( !*indices )
+    {
+        free(*weights);
+        fprintf(stderr, "Out of memory at %s:%d\n", __FILE__, __LINE__);
+        return -1;
+    }
+
+    FeResult* results = pEngine->results;
+    uint32_t i = 0;
+    for ( ; i < results_count; ++i )
+    {
+        (*weights)[i] = results[i].weight;
+        (*indices)[i] = SOURCE_INDEX(source_indices, begin + results[i].index);
+    }
+
+    return 0;
+}
+
+/**
+ * fuzzyMatch(engine, source, pattern, is_name_only=False, sort_results=True, corpus=None, begin=0, end=-1, top_k=0)
+ *
+ * `source` is a list or a ResultView returned by a previous call.
+ * `is_name_only` is optional, it defaults to `False`, which indicates using the full path matching algorithm.
+ * `sort_results` is optional, it defaults to `True`, which indicates whether to sort the results.
+ * `corpus` is optional, it is an object returned by createCorpus(), if specified,
+ *      the strings of `source` are taken from the corpus instead of being converted every time,
+ *      if `source` is a ResultView, they are taken from the corpus only if its items are in the corpus.
+ * `begin` and `end` are optional, only source[begin:end] is matched,
+ *      `end` defaults to -1, which means the end of `source`.
+ * `top_k` is optional, it defaults to 0. If it is greater than 0, only the best `top_k` results(maybe a few more)
+ *      are sorted and put at the beginning, the rest follow in no particular order, call sortRest() to sort them.
+ *
+ * return a tuple, (a list of corresponding weight, a sorted ResultView of items from `source` that match `pattern`).
+ */
+static PyObject* fuzzyEngine_fuzzyMatch(PyObject* self, PyObject* args, PyObject* kwargs)
+{
+    PyObject* py_engine = NULL;
+    PyObject* py_source = NULL;
+    PyObject* py_patternCtxt = NULL;
+    uint8_t is_name_only = 0;
+    uint8_t sort_results = 1;
+    PyObject* py_corpus = NULL;
+    Py_ssize_t begin = 0;
+    Py_ssize_t end = -1;
+    uint32_t top_k = 0;
+    static char* kwlist[] = {"engine", "source", "pattern", "is_name_only", "sort_results",
+                             "corpus", "begin", "end", "top_k", NULL};
+
+    if ( !PyArg_ParseTupleAndKeywords(args, kwargs, "OOO|bbOnnI:fuzzyMatch", kwlist, &py_engine,
+                                      &py_source, &py_patternCtxt, &is_name_only, &sort_results,
+                                      &py_corpus, &begin, &end, &top_k) )
+        return NULL;
+
+    FuzzyEngine* pEngine = (FuzzyEngine*)PyCapsule_GetPointer(py_engine, NULL);
+    if ( !pEngine )
+        return NULL;
+
+    PyObject* py_list = NULL;
+    uint32_t* source_indices = NULL;
+    Py_ssize_t size = 0;
+    if ( getSourceList(py_source, &py_list, &source_indices, &size) < 0 )
+        return NULL;
+
+    FeCorpus* pCorpus = NULL;
+    if ( py_corpus && py_corpus != Py_None )
+    {
+        pCorpus = (FeCorpus*)PyCapsule_GetPointer(py_corpus, NULL);
+        if ( !pCorpus )
+            return NULL;
+    }
+
+    getSourceRange(size, &begin, &end);
+    uint32_t source_size = (uint32_t)(end - begin);
+    if ( source_size == 0 )
+    {
+        return Py_BuildValue("([],[])");
+    }
+
+    pEngine->pPattern_ctxt = (PatternContext*)PyCapsule_GetPointer(py_patternCtxt, NULL);
+    if ( !pEngine->pPattern_ctxt )
         return NULL;
 
     pEngine->is_name_only = is_name_only;
@@ -736,74 +1951,52 @@ static PyObject* fuzzyEngine_fuzzyMatch(PyObject* self, PyObject* args, PyObject
         chunk_size = source_size;
         task_count = 1;
     }
-
-    pEngine->source = (FeString*)malloc(source_size * sizeof(FeString));
-    if ( !pEngine->source )
+
+    /* the strings of the corpus can be used only if the items of `source` are in it */
+    if ( pCorpus && source_indices && py_list != pCorpus->items )
+    {
+        pCorpus = NULL;
+    }
+
+    if ( pCorpus && !source_indices )
+    {
+        if ( updateCorpus(pCorpus, py_source, (uint32_t)begin, (uint32_t)end) < 0 )
+            return NULL;
+        py_list = pCorpus->items;
+        pEngine->source = pCorpus->strings + begin;
+    }
+    else if ( reserveSource(pEngine, source_size) < 0 )
     {
-        fprintf(stderr, "Out of memory at %s:%d\n", __FILE__, __LINE__);
         return NULL;
     }
 
     TaskItem* tasks = (TaskItem*)malloc(task_count * sizeof(TaskItem));
     if ( !tasks )
     {
-        free(pEngine->source);
         fprintf(stderr, "Out of memory at %s:%d\n", __FILE__, __LINE__);
         return NULL;
     }
 
-    pEngine->results = (FeResult*)malloc(source_size * sizeof(FeResult));
-    if ( !pEngine->results )
+    if ( reserveResults(pEngine, source_size) < 0 )
     {
-        free(pEngine->source);
         free(tasks);
-        fprintf(stderr, "Out of memory at %s:%d\n", __FILE__, __LINE__);
         return NULL;
     }
 
     FeResult* results = pEngine->results;
 
-    if ( !pEngine->threads )
+    if ( startWorkers(pEngine) < 0 )
     {
-#if defined(_MSC_VER)
-        pEngine->threads = (HANDLE*)malloc(pEngine->cpu_count * sizeof(HANDLE));
-#else
-        pEngine->threads = (pthread_t*)malloc(pEngine->cpu_count * sizeof(pthread_t));
-#endif
-        if ( !pEngine->threads )
-        {
-            free(pEngine->source);
-            free(tasks);
-            free(results);
-            fprintf(stderr, "Out of memory at %s:%d\n", __FILE__, __LINE__);
-            return NULL;
-        }
-
-        uint32_t i = 0;
-        for ( ; i < pEngine->cpu_count; ++i)
-        {
-#if defined(_MSC_VER)
-            pEngine->threads[i] = CreateThread(NULL, 0, _worker, pEngine, 0, NULL);
-            if ( !pEngine->threads[i] )
-#else
-            int ret = pthread_create(&pEngine->threads[i], NULL, _worker, pEngine);
-            if ( ret != 0 )
-#endif
-            {
-                free(pEngine->source);
-                free(tasks);
-                free(results);
-                free(pEngine->threads);
-                fprintf(stderr, "pthread_create error!\n");
-                return NULL;
-            }
-        }
+        free(tasks);
+        return NULL;
     }
 
 #if defined(_MSC_VER)
     QUEUE_SET_TASK_COUNT(pEngine->task_queue, task_count);
 #endif
 
+    beginItemTasks(pEngine, tasks);
+
     uint32_t i = 0;
     for ( ; i < task_count; ++i )
     {
@@ -815,24 +2008,27 @@ static PyObject* fuzzyEngine_fuzzyMatch(PyObject* self, PyObject* args, PyObject
         tasks[i].length = length;
 
         uint32_t j = 0;
-        for ( ; j < length; ++j )
+        for ( ; (!pCorpus || source_indices) && j < length; ++j )
         {
             FeString *s = pEngine->source + offset + j;
-            PyObject* item = PyList_GET_ITEM(py_source, offset + j);
-            if ( pyObject_ToStringAndSize(item, &s->str, &s->len) < 0 )
+            uint32_t index = SOURCE_INDEX(source_indices, begin + offset + j);
+            if ( pCorpus )
+            {
+                *s = pCorpus->strings[index];
+            }
+            else if ( pyObject_ToStringAndSize(PyList_GET_ITEM(py_list, index), &s->str, &s->len) < 0 )
             {
-                free(pEngine->source);
+                abortItemTasks(pEngine);
                 free(tasks);
-                free(results);
                 fprintf(stderr, "pyObject_ToStringAndSize error!\n");
                 return NULL;
             }
         }
 
-        QUEUE_PUT(pEngine->task_queue, tasks + i);
+        putItemTask(pEngine, tasks + i);
     }
 
-    QUEUE_JOIN(pEngine->task_queue);    /* blocks until all tasks have finished */
+    joinItemTasks(pEngine);
 
     uint32_t results_count = 0;
     for ( i = 0; i < source_size; ++i )
@@ -849,15 +2045,18 @@ static PyObject* fuzzyEngine_fuzzyMatch(PyObject* self, PyObject* args, PyObject
 
     if ( results_count == 0 )
     {
-        free(pEngine->source);
         free(tasks);
-        free(results);
         return Py_BuildValue("([],[])");
     }
 
+    uint32_t sorted_count = results_count;
     if ( sort_results )
     {
-        if ( task_count == 1 || results_count < 60000 )
+        if ( top_k > 0 && top_k < results_count )
+        {
+            sorted_count = sortTopK(pEngine, tasks, task_count, results_count, top_k);
+        }
+        else if ( task_count == 1 || results_count < 60000 )
         {
             qsort(results, results_count, sizeof(FeResult), compare);
         }
@@ -872,9 +2071,7 @@ static PyObject* fuzzyEngine_fuzzyMatch(PyObject* self, PyObject* args, PyObject
             FeResult* buffer = (FeResult*)malloc(chunk_size * (task_count >> 1) * sizeof(FeResult));
             if ( !buffer )
             {
-                free(pEngine->source);
                 free(tasks);
-                free(results);
                 fprintf(stderr, "Out of memory at %s:%d\n", __FILE__, __LINE__);
                 return NULL;
             }
@@ -898,9 +2095,7 @@ static PyObject* fuzzyEngine_fuzzyMatch(PyObject* self, PyObject* args, PyObject
             merge_tasks = (MergeTaskItem*)malloc(task_count * sizeof(MergeTaskItem));
             if ( !merge_tasks )
             {
-                free(pEngine->source);
                 free(tasks);
-                free(results);
                 free(buffer);
                 fprintf(stderr, "Out of memory at %s:%d\n", __FILE__, __LINE__);
                 return NULL;
@@ -943,80 +2138,26 @@ static PyObject* fuzzyEngine_fuzzyMatch(PyObject* self, PyObject* args, PyObject
         }
     }
 
-    weight_t* weights = (weight_t*)malloc(results_count * sizeof(weight_t));
-    if ( !weights )
-    {
-        free(pEngine->source);
-        free(tasks);
-        free(results);
-        fprintf(stderr, "Out of memory at %s:%d\n", __FILE__, __LINE__);
-        return NULL;
-    }
-
-    PyObject* text_list = PyList_New(results_count);
-    if ( task_count == 1 || results_count < 40000 )
-    {
-        for ( i = 0; i < results_count; ++i )
-        {
-            weights[i] = results[i].weight;
-            /* PyList_SET_ITEM() steals a reference to item.     */
-            /* PySequence_ITEM() return value: New reference. */
-            PyList_SET_ITEM(text_list, i, PySequence_ITEM(py_source, results[i].index));
-        }
-    }
-    else
-    {
-        chunk_size = (results_count + task_count - 1) / task_count;
-        if ( chunk_size < 8000 )
-        {
-            chunk_size = (results_count + (task_count >> 1) - 1) / (task_count >> 1);
-        }
-        task_count = (results_count + chunk_size - 1) / chunk_size;
-
-        PySetTaskItem* py_set_tasks = NULL;
-        py_set_tasks = (PySetTaskItem*)malloc(task_count * sizeof(PySetTaskItem));
-        if ( !py_set_tasks )
-        {
-            free(pEngine->source);
-            free(tasks);
-            free(results);
-            fprintf(stderr, "Out of memory at %s:%d\n", __FILE__, __LINE__);
-            return NULL;
-        }
-
-#if defined(_MSC_VER)
-        QUEUE_SET_TASK_COUNT(pEngine->task_queue, task_count);
-#endif
-        for ( i = 0; i < task_count; ++i )
-        {
-            uint32_t offset = i * chunk_size;
-            uint32_t length = MIN(chunk_size, results_count - offset);
-
-            py_set_tasks[i].function = PY_SET_ITEM;
-            py_set_tasks[i].offset = offset;
-            py_set_tasks[i].length = length;
-            py_set_tasks[i].weights = weights;
-            py_set_tasks[i].text_list = text_list;
-            py_set_tasks[i].py_source = py_source;
-            QUEUE_PUT(pEngine->task_queue, py_set_tasks + i);
-        }
+    pEngine->timings[PHASE_SORT] = getTime() - pEngine->join_time;
 
-        QUEUE_JOIN(pEngine->task_queue);    /* blocks until all tasks have finished */
+    free(tasks);
 
-        free(py_set_tasks);
-    }
+    weight_t* weights = NULL;
+    uint32_t* indices = NULL;
+    if ( createResults(pEngine, py_list, source_indices, (uint32_t)begin, results_count, &weights, &indices) < 0 )
+        return NULL;
 
-    free(pEngine->source);
-    free(tasks);
-    free(results);
+    PyObject* py_weights = createWeights(weights);
+    setSortedCount(py_weights, sorted_count, results_count);
 
-    return Py_BuildValue("(NN)", createWeights(weights), text_list);
+    return Py_BuildValue("(NN)", py_weights, createResultView(py_list, indices, results_count));
 }
 
 /**
- * fuzzyMatchEx(engine, source, pattern, is_name_only=False, sort_results=True, is_and_mode=False)
+ * fuzzyMatchEx(engine, source, pattern, is_name_only=False, sort_results=True, is_and_mode=False, top_k=0)
  *
  * same as fuzzyMatch(), the only difference is the return value.
+ * `top_k` is ignored if `is_and_mode` is True.
  * return a tuple, (a list of corresponding weight, a sorted list of index to items from `source` that match `pattern`).
  */
 static PyObject* fuzzyEngine_fuzzyMatchEx(PyObject* self, PyObject* args, PyObject* kwargs)
@@ -1027,12 +2168,17 @@ static PyObject* fuzzyEngine_fuzzyMatchEx(PyObject* self, PyObject* args, PyObje
     uint8_t is_name_only = 0;
     uint8_t sort_results = 1;
     uint8_t is_and_mode = 0;
-    static char* kwlist[] = {"engine", "source", "pattern", "is_name_only", "sort_results", "is_and_mode", NULL};
+    uint32_t top_k = 0;
+    static char* kwlist[] = {"engine", "source", "pattern", "is_name_only", "sort_results", "is_and_mode", "top_k", NULL};
 
-    if ( !PyArg_ParseTupleAndKeywords(args, kwargs, "OOO|bbb:fuzzyMatch", kwlist, &py_engine,
-                                      &py_source, &py_patternCtxt, &is_name_only, &sort_results, &is_and_mode) )
+    if ( !PyArg_ParseTupleAndKeywords(args, kwargs, "OOO|bbbI:fuzzyMatch", kwlist, &py_engine,
+                                      &py_source, &py_patternCtxt, &is_name_only, &sort_results, &is_and_mode, &top_k) )
         return NULL;
 
+    /* the weights are returned as a list in and mode, which can not carry the number of sorted results */
+    if ( is_and_mode )
+        top_k = 0;
+
     FuzzyEngine* pEngine = (FuzzyEngine*)PyCapsule_GetPointer(py_engine, NULL);
     if ( !pEngine )
         return NULL;
@@ -1064,73 +2210,36 @@ static PyObject* fuzzyEngine_fuzzyMatchEx(PyObject* self, PyObject* args, PyObje
         task_count = 1;
     }
 
-    pEngine->source = (FeString*)malloc(source_size * sizeof(FeString));
-    if ( !pEngine->source )
-    {
-        fprintf(stderr, "Out of memory at %s:%d\n", __FILE__, __LINE__);
+    if ( reserveSource(pEngine, source_size) < 0 )
         return NULL;
-    }
 
     TaskItem* tasks = (TaskItem*)malloc(task_count * sizeof(TaskItem));
     if ( !tasks )
     {
-        free(pEngine->source);
         fprintf(stderr, "Out of memory at %s:%d\n", __FILE__, __LINE__);
         return NULL;
     }
 
-    pEngine->results = (FeResult*)malloc(source_size * sizeof(FeResult));
-    if ( !pEngine->results )
+    if ( reserveResults(pEngine, source_size) < 0 )
     {
-        free(pEngine->source);
         free(tasks);
-        fprintf(stderr, "Out of memory at %s:%d\n", __FILE__, __LINE__);
         return NULL;
     }
 
     FeResult* results = pEngine->results;
 
-    if ( !pEngine->threads )
+    if ( startWorkers(pEngine) < 0 )
     {
-#if defined(_MSC_VER)
-        pEngine->threads = (HANDLE*)malloc(pEngine->cpu_count * sizeof(HANDLE));
-#else
-        pEngine->threads = (pthread_t*)malloc(pEngine->cpu_count * sizeof(pthread_t));
-#endif
-        if ( !pEngine->threads )
-        {
-            free(pEngine->source);
-            free(tasks);
-            free(results);
-            fprintf(stderr, "Out of memory at %s:%d\n", __FILE__, __LINE__);
-            return NULL;
-        }
-
-        uint32_t i = 0;
-        for ( ; i < pEngine->cpu_count; ++i)
-        {
-#if defined(_MSC_VER)
-            pEngine->threads[i] = CreateThread(NULL, 0, _worker, pEngine, 0, NULL);
-            if ( !pEngine->threads[i] )
-#else
-            int ret = pthread_create(&pEngine->threads[i], NULL, _worker, pEngine);
-            if ( ret != 0 )
-#endif
-            {
-                free(pEngine->source);
-                free(tasks);
-                free(results);
-                free(pEngine->threads);
-                fprintf(stderr, "pthread_create error!\n");
-                return NULL;
-            }
-        }
+        free(tasks);
+        return NULL;
     }
 
 #if defined(_MSC_VER)
     QUEUE_SET_TASK_COUNT(pEngine->task_queue, task_count);
 #endif
 
+    beginItemTasks(pEngine, tasks);
+
     uint32_t i = 0;
     for ( ; i < task_count; ++i )
     {
@@ -1148,18 +2257,17 @@ static PyObject* fuzzyEngine_fuzzyMatchEx(PyObject* self, PyObject* args, PyObje
             PyObject* item = PyList_GET_ITEM(py_source, offset + j);
             if ( pyObject_ToStringAndSize(item, &s->str, &s->len) < 0 )
             {
-                free(pEngine->source);
+                abortItemTasks(pEngine);
                 free(tasks);
-                free(results);
                 fprintf(stderr, "pyObject_ToStringAndSize error!\n");
                 return NULL;
             }
         }
 
-        QUEUE_PUT(pEngine->task_queue, tasks + i);
+        putItemTask(pEngine, tasks + i);
     }
 
-    QUEUE_JOIN(pEngine->task_queue);    /* blocks until all tasks have finished */
+    joinItemTasks(pEngine);
 
     uint32_t results_count = 0;
     for ( i = 0; i < source_size; ++i )
@@ -1176,15 +2284,18 @@ static PyObject* fuzzyEngine_fuzzyMatchEx(PyObject* self, PyObject* args, PyObje
 
     if ( results_count == 0 )
     {
-        free(pEngine->source);
         free(tasks);
-        free(results);
         return Py_BuildValue("([],[])");
     }
 
+    uint32_t sorted_count = results_count;
     if ( sort_results )
     {
-        if ( task_count == 1 || results_count < 60000 )
+        if ( top_k > 0 && top_k < results_count )
+        {
+            sorted_count = sortTopK(pEngine, tasks, task_count, results_count, top_k);
+        }
+        else if ( task_count == 1 || results_count < 60000 )
         {
             qsort(results, results_count, sizeof(FeResult), compare);
         }
@@ -1199,9 +2310,7 @@ static PyObject* fuzzyEngine_fuzzyMatchEx(PyObject* self, PyObject* args, PyObje
             FeResult* buffer = (FeResult*)malloc(chunk_size * (task_count >> 1) * sizeof(FeResult));
             if ( !buffer )
             {
-                free(pEngine->source);
                 free(tasks);
-                free(results);
                 fprintf(stderr, "Out of memory at %s:%d\n", __FILE__, __LINE__);
                 return NULL;
             }
@@ -1225,9 +2334,7 @@ static PyObject* fuzzyEngine_fuzzyMatchEx(PyObject* self, PyObject* args, PyObje
             merge_tasks = (MergeTaskItem*)malloc(task_count * sizeof(MergeTaskItem));
             if ( !merge_tasks )
             {
-                free(pEngine->source);
                 free(tasks);
-                free(results);
                 free(buffer);
                 fprintf(stderr, "Out of memory at %s:%d\n", __FILE__, __LINE__);
                 return NULL;
@@ -1270,6 +2377,8 @@ static PyObject* fuzzyEngine_fuzzyMatchEx(PyObject* self, PyObject* args, PyObje
         }
     }
 
+    pEngine->timings[PHASE_SORT] = getTime() - pEngine->join_time;
+
     if ( is_and_mode )
     {
         PyObject* weight_list = PyList_New(results_count);
@@ -1281,9 +2390,7 @@ static PyObject* fuzzyEngine_fuzzyMatchEx(PyObject* self, PyObject* args, PyObje
             PyList_SET_ITEM(index_list, i, Py_BuildValue("I", results[i].index));
         }
 
-        free(pEngine->source);
         free(tasks);
-        free(results);
 
         return Py_BuildValue("(NN)", weight_list, index_list);
     }
@@ -1292,9 +2399,7 @@ static PyObject* fuzzyEngine_fuzzyMatchEx(PyObject* self, PyObject* args, PyObje
         weight_t* weights = (weight_t*)malloc(results_count * sizeof(weight_t));
         if ( !weights )
         {
-            free(pEngine->source);
             free(tasks);
-            free(results);
             fprintf(stderr, "Out of memory at %s:%d\n", __FILE__, __LINE__);
             return NULL;
         }
@@ -1308,17 +2413,22 @@ static PyObject* fuzzyEngine_fuzzyMatchEx(PyObject* self, PyObject* args, PyObje
             PyList_SET_ITEM(index_list, i, Py_BuildValue("I", results[i].index));
         }
 
-        free(pEngine->source);
         free(tasks);
-        free(results);
 
-        return Py_BuildValue("(NN)", createWeights(weights), index_list);
+        PyObject* py_weights = createWeights(weights);
+        setSortedCount(py_weights, sorted_count, results_count);
+
+        return Py_BuildValue("(NN)", py_weights, index_list);
     }
 }
 
 /**
  * merge(tuple_a, tuple_b)
  * tuple_a, tuple_b are the return value of fuzzyEngine_fuzzyMatch
+ * if only the top results of a tuple are sorted(see `top_k` of fuzzyMatch()),
+ * the sorted ones are merged and the rest are appended.
+ * If the items of both tuples are ResultViews of the same list, only their indices are merged
+ * and the merged items are a ResultView, otherwise they are a list.
  */
 static PyObject* fuzzyEngine_merge(PyObject* self, PyObject* args)
 {
@@ -1329,17 +2439,23 @@ static PyObject* fuzzyEngine_merge(PyObject* self, PyObject* args)
     if ( !PyArg_ParseTuple(args, "(OO)(OO):merge", &weight_list_a, &text_list_a,  &weight_list_b, &text_list_b) )
         return NULL;
 
-    uint32_t size_a = (uint32_t)PyList_Size(text_list_a);
-    if ( size_a == 0 )
+    Py_ssize_t length_a = PySequence_Size(text_list_a);
+    if ( length_a < 0 )
+        return NULL;
+    if ( length_a == 0 )
     {
         return Py_BuildValue("(OO)", weight_list_b, text_list_b);
     }
-    uint32_t size_b = (uint32_t)PyList_Size(text_list_b);
-    if ( size_b == 0 )
+    Py_ssize_t length_b = PySequence_Size(text_list_b);
+    if ( length_b < 0 )
+        return NULL;
+    if ( length_b == 0 )
     {
         return Py_BuildValue("(OO)", weight_list_a, text_list_a);
     }
 
+    uint32_t size_a = (uint32_t)length_a;
+    uint32_t size_b = (uint32_t)length_b;
     weight_t* weights = (weight_t*)malloc((size_a + size_b) * sizeof(weight_t));
     if ( !weights )
     {
@@ -1347,21 +2463,32 @@ static PyObject* fuzzyEngine_merge(PyObject* self, PyObject* args)
         return NULL;
     }
 
-    PyObject* text_list = PyList_New(size_a + size_b);
+    /* order[k] is i if the kth merged one is the ith of tuple_a, size_a + j if it is the jth of tuple_b */
+    uint32_t* order = (uint32_t*)malloc((size_a + size_b) * sizeof(uint32_t));
+    if ( !order )
+    {
+        free(weights);
+        fprintf(stderr, "Out of memory at %s:%d\n", __FILE__, __LINE__);
+        return NULL;
+    }
 
     uint32_t i = 0;
     uint32_t j = 0;
+    uint32_t k = 0;
 
     weight_t* weights_a = (weight_t*)PyCapsule_GetPointer(weight_list_a, NULL);
     weight_t w_a = weights_a[i];
     weight_t* weights_b = (weight_t*)PyCapsule_GetPointer(weight_list_b, NULL);
     weight_t w_b = weights_b[j];
-    while ( i < size_a && j < size_b )
+    uint32_t sorted_a = getSortedCount(weight_list_a, size_a);
+    uint32_t sorted_b = getSortedCount(weight_list_b, size_b);
+    while ( i < sorted_a && j < sorted_b )
     {
         if ( w_a > w_b )
         {
-            weights[i + j] = weights_a[i];
-            PyList_SET_ITEM(text_list, i + j, PySequence_ITEM(text_list_a, i));
+            weights[k] = weights_a[i];
+            order[k] = i;
+            ++k;
             ++i;
             if ( i < size_a )
             {
@@ -1370,8 +2497,9 @@ static PyObject* fuzzyEngine_merge(PyObject* self, PyObject* args)
         }
         else
         {
-            weights[i + j] = weights_b[j];
-            PyList_SET_ITEM(text_list, i + j, PySequence_ITEM(text_list_b, j));
+            weights[k] = weights_b[j];
+            order[k] = size_a + j;
+            ++k;
             ++j;
             if ( j < size_b )
             {
@@ -1379,24 +2507,199 @@ static PyObject* fuzzyEngine_merge(PyObject* self, PyObject* args)
             }
         }
     }
-    while ( i < size_a )
+    while ( i < sorted_a )
     {
-        weights[i + j] = weights_a[i];
-        PyList_SET_ITEM(text_list, i + j, PySequence_ITEM(text_list_a, i));
+        weights[k] = weights_a[i];
+        order[k] = i;
+        ++k;
         ++i;
     }
-    while ( j < size_b )
+    while ( j < sorted_b )
     {
-        weights[i + j] = weights_b[j];
-        PyList_SET_ITEM(text_list, i + j, PySequence_ITEM(text_list_b, j));
+        weights[k] = weights_b[j];
+        order[k] = size_a + j;
+        ++k;
         ++j;
     }
-    return Py_BuildValue("(NN)", createWeights(weights), text_list);
+
+    /* the results that are not sorted are not better than the last sorted one of each tuple */
+    weight_t threshold = MIN_WEIGHT;
+    if ( sorted_a < size_a )
+    {
+        threshold = weights_a[sorted_a - 1];
+    }
+    if ( sorted_b < size_b && weights_b[sorted_b - 1] > threshold )
+    {
+        threshold = weights_b[sorted_b - 1];
+    }
+
+    uint32_t sorted_count = 0;
+    while ( sorted_count < k && weights[sorted_count] >= threshold )
+    {
+        ++sorted_count;
+    }
+
+    for ( ; i < size_a; ++i, ++k )
+    {
+        weights[k] = weights_a[i];
+        order[k] = i;
+    }
+    for ( ; j < size_b; ++j, ++k )
+    {
+        weights[k] = weights_b[j];
+        order[k] = size_a + j;
+    }
+
+    PyObject* py_text = NULL;
+    if ( ResultView_Check(text_list_a) && ResultView_Check(text_list_b)
+         && ((ResultView*)text_list_a)->py_list == ((ResultView*)text_list_b)->py_list )
+    {
+        uint32_t* indices_a = ((ResultView*)text_list_a)->indices;
+        uint32_t* indices_b = ((ResultView*)text_list_b)->indices;
+        /* the indices are put in `order`, which is taken by the ResultView */
+        for ( k = 0; k < size_a + size_b; ++k )
+        {
+            order[k] = order[k] < size_a ? indices_a[order[k]] : indices_b[order[k] - size_a];
+        }
+        py_text = createResultView(((ResultView*)text_list_a)->py_list, order, size_a + size_b);
+    }
+    else
+    {
+        py_text = PyList_New(size_a + size_b);
+        for ( k = 0; py_text && k < size_a + size_b; ++k )
+        {
+            PyObject* item = NULL;
+            if ( order[k] < size_a )
+                item = PySequence_GetItem(text_list_a, order[k]);
+            else
+                item = PySequence_GetItem(text_list_b, order[k] - size_a);
+
+            if ( !item )
+            {
+                Py_CLEAR(py_text);
+                break;
+            }
+            /* PyList_SET_ITEM() steals a reference to item. */
+            PyList_SET_ITEM(py_text, k, item);
+        }
+        free(order);
+    }
+
+    if ( !py_text )
+    {
+        free(weights);
+        return NULL;
+    }
+
+    PyObject* py_weights = createWeights(weights);
+    setSortedCount(py_weights, sorted_count, size_a + size_b);
+
+    return Py_BuildValue("(NN)", py_weights, py_text);
+}
+
+/**
+ * sortRest(tuple)
+ * tuple is the return value of fuzzyEngine_fuzzyMatch,
+ * sort the results that are left unsorted because of `top_k` in place.
+ */
+static PyObject* fuzzyEngine_sortRest(PyObject* self, PyObject* args)
+{
+    PyObject* weight_list = NULL;
+    PyObject* text_list = NULL;
+    if ( !PyArg_ParseTuple(args, "(OO):sortRest", &weight_list, &text_list) )
+        return NULL;
+
+    /* the texts are sorted in place */
+    if ( !PyList_Check(text_list) && !ResultView_Check(text_list) )
+    {
+        PyErr_SetString(PyExc_TypeError, "the texts must be a list or a ResultView.");
+        return NULL;
+    }
+
+    Py_ssize_t length = PySequence_Size(text_list);
+    if ( length < 0 )
+        return NULL;
+
+    uint32_t size = (uint32_t)length;
+    uint32_t sorted_count = getSortedCount(weight_list, size);
+    if ( sorted_count >= size )
+    {
+        Py_RETURN_NONE;
+    }
+
+    weight_t* weights = (weight_t*)PyCapsule_GetPointer(weight_list, NULL);
+    if ( !weights )
+        return NULL;
+
+    uint32_t rest_count = size - sorted_count;
+    FeResult* results = (FeResult*)malloc(rest_count * sizeof(FeResult));
+    if ( !results )
+    {
+        fprintf(stderr, "Out of memory at %s:%d\n", __FILE__, __LINE__);
+        return NULL;
+    }
+
+    uint32_t i = 0;
+    for ( ; i < rest_count; ++i )
+    {
+        results[i].weight = weights[sorted_count + i];
+        results[i].index = i;
+    }
+
+    qsort(results, rest_count, sizeof(FeResult), compare);
+
+    if ( ResultView_Check(text_list) )
+    {
+        uint32_t* indices = ((ResultView*)text_list)->indices + sorted_count;
+        /* results[i].index is no longer needed after the ith index is moved */
+        for ( i = 0; i < rest_count; ++i )
+        {
+            results[i].index = indices[results[i].index];
+        }
+        for ( i = 0; i < rest_count; ++i )
+        {
+            indices[i] = results[i].index;
+        }
+    }
+    else
+    {
+        PyObject** items = (PyObject**)malloc(rest_count * sizeof(PyObject*));
+        if ( !items )
+        {
+            free(results);
+            fprintf(stderr, "Out of memory at %s:%d\n", __FILE__, __LINE__);
+            return NULL;
+        }
+
+        /* only the order of the items is changed, so the references are moved as they are */
+        PyObject** list_items = PySequence_Fast_ITEMS(text_list) + sorted_count;
+        memcpy(items, list_items, rest_count * sizeof(PyObject*));
+        for ( i = 0; i < rest_count; ++i )
+        {
+            list_items[i] = items[results[i].index];
+        }
+
+        free(items);
+    }
+
+    for ( i = 0; i < rest_count; ++i )
+    {
+        weights[sorted_count + i] = results[i].weight;
+    }
+
+    free(results);
+
+    PyCapsule_SetContext(weight_list, NULL);
+
+    Py_RETURN_NONE;
 }
+
 /**
- * getHighlights(engine, source, pattern, is_name_only=False)
+ * getHighlights(engine, source, pattern, is_name_only=False, category=0, param=None)
  *
  * `is_name_only` is optional, it defaults to `False`, which indicates using the full path matching algorithm.
+ * `category` and `param` are optional, if `param` is specified, only the digest of each text is highlighted
+ * as in fuzzyMatchPart(), and the columns returned are still those in the whole text.
  *
  * return a list of list of pair [col, length], where `col` is the column number(start from 1, the value must
  * correspond to the byte index of `text`) and `length` is the length of the highlight in bytes.
@@ -1406,7 +2709,7 @@ static PyObject* fuzzyEngine_merge(PyObject* self, PyObject* args)
  *          ...
  *       ]
  *  NOTE: this function must be called after fuzzyMatch() is called, because this function assume that all the
- *  texts in `source` match `pattern` and all the threads in FuzzyEngine have already been started.
+ *  texts in `source` match `pattern`.
  */
 static PyObject* fuzzyEngine_getHighlights(PyObject* self, PyObject* args, PyObject* kwargs)
 {
@@ -1414,10 +2717,12 @@ static PyObject* fuzzyEngine_getHighlights(PyObject* self, PyObject* args, PyObj
     PyObject* py_patternCtxt = NULL;
     PyObject* py_engine = NULL;
     uint8_t is_name_only = 0;
-    static char* kwlist[] = {"engine", "source", "pattern", "is_name_only", NULL};
+    uint32_t category = 0;
+    PyObject* py_param = NULL;
+    static char* kwlist[] = {"engine", "source", "pattern", "is_name_only", "category", "param", NULL};
 
-    if ( !PyArg_ParseTupleAndKeywords(args, kwargs, "OOO|b:fuzzyMatch", kwlist, &py_engine,
-                                      &py_source, &py_patternCtxt, &is_name_only) )
+    if ( !PyArg_ParseTupleAndKeywords(args, kwargs, "OOO|bIO:fuzzyMatch", kwlist, &py_engine,
+                                      &py_source, &py_patternCtxt, &is_name_only, &category, &py_param) )
         return NULL;
 
     FuzzyEngine* pEngine = (FuzzyEngine*)PyCapsule_GetPointer(py_engine, NULL);
@@ -1436,40 +2741,68 @@ static PyObject* fuzzyEngine_getHighlights(PyObject* self, PyObject* args, PyObj
 
     pEngine->is_name_only = is_name_only;
 
+    void* param = NULL;
+    if ( py_param && py_param != Py_None )
+    {
+        param = PyCapsule_GetPointer(py_param, NULL);
+        if ( !param )
+            return NULL;
+    }
+
     uint32_t source_size = (uint32_t)PyList_Size(py_source);
+    if ( source_size == 0 )
+    {
+        return PyList_New(0);
+    }
 
     uint32_t max_task_count  = MAX_TASK_COUNT(pEngine->cpu_count);
     uint32_t chunk_size = (source_size + max_task_count - 1) / max_task_count;
     uint32_t task_count = (source_size + chunk_size - 1) / chunk_size;
 
-    pEngine->source = (FeString*)malloc(source_size * sizeof(FeString));
-    if ( !pEngine->source )
-    {
-        fprintf(stderr, "Out of memory at %s:%d\n", __FILE__, __LINE__);
+    if ( reserveSource(pEngine, source_size) < 0 )
         return NULL;
-    }
 
     TaskItem* tasks = (TaskItem*)malloc(task_count * sizeof(TaskItem));
     if ( !tasks )
     {
-        free(pEngine->source);
         fprintf(stderr, "Out of memory at %s:%d\n", __FILE__, __LINE__);
         return NULL;
     }
 
+    if ( startWorkers(pEngine) < 0 )
+    {
+        free(tasks);
+        return NULL;
+    }
+
     pEngine->highlights = (HighlightGroup**)malloc(source_size * sizeof(HighlightGroup*));
     if ( !pEngine->highlights )
     {
-        free(pEngine->source);
         free(tasks);
         fprintf(stderr, "Out of memory at %s:%d\n", __FILE__, __LINE__);
         return NULL;
     }
 
+    /* the byte offset of the digest of each text */
+    uint32_t* digest_offsets = NULL;
+    if ( param )
+    {
+        digest_offsets = (uint32_t*)malloc(source_size * sizeof(uint32_t));
+        if ( !digest_offsets )
+        {
+            free(tasks);
+            free(pEngine->highlights);
+            fprintf(stderr, "Out of memory at %s:%d\n", __FILE__, __LINE__);
+            return NULL;
+        }
+    }
+
 #if defined(_MSC_VER)
     QUEUE_SET_TASK_COUNT(pEngine->task_queue, task_count);
 #endif
 
+    beginItemTasks(pEngine, tasks);
+
     uint32_t i = 0;
     for ( ; i < task_count; ++i )
     {
@@ -1487,18 +2820,26 @@ static PyObject* fuzzyEngine_getHighlights(PyObject* self, PyObject* args, PyObj
             PyObject* item = PyList_GET_ITEM(py_source, offset + j);
             if ( pyObject_ToStringAndSize(item, &s->str, &s->len) < 0 )
             {
-                free(pEngine->source);
+                abortItemTasks(pEngine);
                 free(tasks);
                 free(pEngine->highlights);
+                free(digest_offsets);
                 fprintf(stderr, "pyObject_ToStringAndSize error!\n");
                 return NULL;
             }
+
+            if ( param )
+            {
+                char* str = s->str;
+                getDigest(s, category, param);
+                digest_offsets[offset + j] = (uint32_t)(s->str - str);
+            }
         }
 
-        QUEUE_PUT(pEngine->task_queue, tasks + i);
+        putItemTask(pEngine, tasks + i);
     }
 
-    QUEUE_JOIN(pEngine->task_queue);    /* blocks until all tasks have finished */
+    joinItemTasks(pEngine);
 
     PyObject* res = PyList_New(source_size);
     for ( i = 0; i < source_size; ++i )
@@ -1506,39 +2847,42 @@ static PyObject* fuzzyEngine_getHighlights(PyObject* self, PyObject* args, PyObj
         HighlightGroup* pGroup = pEngine->highlights[i];
         if ( !pGroup )
         {
-            free(pEngine->source);
             free(tasks);
             free(pEngine->highlights);
+            free(digest_offsets);
             Py_XDECREF(res);
             return NULL;
         }
 
+        uint32_t digest_offset = digest_offsets ? digest_offsets[i] : 0;
         PyObject* list = PyList_New(pGroup->end_index);
         uint16_t j;
         for ( j = 0; j < pGroup->end_index; ++j )
         {
-            PyList_SetItem(list, j, Py_BuildValue("[H,H]", pGroup->positions[j].col, pGroup->positions[j].len));
+            PyList_SetItem(list, j, Py_BuildValue("[I,I]", pGroup->positions[j].col + digest_offset,
+                                                  pGroup->positions[j].len));
         }
         PyList_SetItem(res, i, list);
         free(pGroup);
     }
 
-    free(pEngine->source);
     free(tasks);
     free(pEngine->highlights);
+    free(digest_offsets);
 
     return res;
 }
 
 /**
- * guessMatch(engine, source, filename, suffix, dirname, icon, sort_results=True)
+ * guessMatch(engine, source, filename, suffix, dirname, icon, sort_results=True, corpus=None, begin=0, end=-1)
  *
  * e.g., /usr/src/example.tar.gz
  * `filename` is "example.tar"
  * `suffix` is ".gz"
  * `dirname` is "/usr/src"
+ * `source`, `corpus`, `begin` and `end`, see fuzzyMatch().
  *
- * return a tuple, (a list of corresponding weight, a sorted list of items from `source` that match `pattern`).
+ * return a tuple, (a list of corresponding weight, a sorted ResultView of items from `source`).
  */
 static PyObject* fuzzyEngine_guessMatch(PyObject* self, PyObject* args, PyObject* kwargs)
 {
@@ -1549,23 +2893,37 @@ static PyObject* fuzzyEngine_guessMatch(PyObject* self, PyObject* args, PyObject
     const char* dirname = NULL;
     PyObject* py_icon = NULL;
     uint8_t sort_results = 1;
-    static char* kwlist[] = {"engine", "source", "filename", "suffix", "dirname", "icon", "sort_results", NULL};
-
-    if ( !PyArg_ParseTupleAndKeywords(args, kwargs, "OOsssO|b:guessMatch", kwlist, &py_engine,
-                                      &py_source, &filename, &suffix, &dirname, &py_icon, &sort_results) )
+    PyObject* py_corpus = NULL;
+    Py_ssize_t begin = 0;
+    Py_ssize_t end = -1;
+    static char* kwlist[] = {"engine", "source", "filename", "suffix", "dirname", "icon", "sort_results",
+                             "corpus", "begin", "end", NULL};
+
+    if ( !PyArg_ParseTupleAndKeywords(args, kwargs, "OOsssO|bOnn:guessMatch", kwlist, &py_engine,
+                                      &py_source, &filename, &suffix, &dirname, &py_icon, &sort_results,
+                                      &py_corpus, &begin, &end) )
         return NULL;
 
     FuzzyEngine* pEngine = (FuzzyEngine*)PyCapsule_GetPointer(py_engine, NULL);
     if ( !pEngine )
         return NULL;
 
-    if ( !PyList_Check(py_source) )
-    {
-        PyErr_SetString(PyExc_TypeError, "parameter `source` must be a list.");
+    PyObject* py_list = NULL;
+    uint32_t* source_indices = NULL;
+    Py_ssize_t size = 0;
+    if ( getSourceList(py_source, &py_list, &source_indices, &size) < 0 )
         return NULL;
+
+    FeCorpus* pCorpus = NULL;
+    if ( py_corpus && py_corpus != Py_None )
+    {
+        pCorpus = (FeCorpus*)PyCapsule_GetPointer(py_corpus, NULL);
+        if ( !pCorpus )
+            return NULL;
     }
 
-    uint32_t source_size = (uint32_t)PyList_Size(py_source);
+    getSourceRange(size, &begin, &end);
+    uint32_t source_size = (uint32_t)(end - begin);
     if ( source_size == 0 )
     {
         return Py_BuildValue("([],[])");
@@ -1584,67 +2942,41 @@ static PyObject* fuzzyEngine_guessMatch(PyObject* self, PyObject* args, PyObject
         task_count = 1;
     }
 
-    pEngine->source = (FeString*)malloc(source_size * sizeof(FeString));
-    if ( !pEngine->source )
-    {
-        fprintf(stderr, "Out of memory at %s:%d\n", __FILE__, __LINE__);
+    if ( reserveSource(pEngine, source_size) < 0 )
         return NULL;
+
+    /* the strings of the corpus can be used only if the items of `source` are in it */
+    if ( pCorpus && source_indices && py_list != pCorpus->items )
+    {
+        pCorpus = NULL;
+    }
+
+    if ( pCorpus && !source_indices )
+    {
+        if ( updateCorpus(pCorpus, py_source, (uint32_t)begin, (uint32_t)end) < 0 )
+            return NULL;
+        py_list = pCorpus->items;
     }
 
     TaskItem* tasks = (TaskItem*)malloc(task_count * sizeof(TaskItem));
     if ( !tasks )
     {
-        free(pEngine->source);
         fprintf(stderr, "Out of memory at %s:%d\n", __FILE__, __LINE__);
         return NULL;
     }
 
-    pEngine->results = (FeResult*)malloc(source_size * sizeof(FeResult));
-    if ( !pEngine->results )
+    if ( reserveResults(pEngine, source_size) < 0 )
     {
-        free(pEngine->source);
         free(tasks);
-        fprintf(stderr, "Out of memory at %s:%d\n", __FILE__, __LINE__);
         return NULL;
     }
 
     FeResult* results = pEngine->results;
 
-    if ( !pEngine->threads )
+    if ( startWorkers(pEngine) < 0 )
     {
-#if defined(_MSC_VER)
-        pEngine->threads = (HANDLE*)malloc(pEngine->cpu_count * sizeof(HANDLE));
-#else
-        pEngine->threads = (pthread_t*)malloc(pEngine->cpu_count * sizeof(pthread_t));
-#endif
-        if ( !pEngine->threads )
-        {
-            free(pEngine->source);
-            free(tasks);
-            free(results);
-            fprintf(stderr, "Out of memory at %s:%d\n", __FILE__, __LINE__);
-            return NULL;
-        }
-
-        uint32_t i = 0;
-        for ( ; i < pEngine->cpu_count; ++i)
-        {
-#if defined(_MSC_VER)
-            pEngine->threads[i] = CreateThread(NULL, 0, _worker, pEngine, 0, NULL);
-            if ( !pEngine->threads[i] )
-#else
-            int ret = pthread_create(&pEngine->threads[i], NULL, _worker, pEngine);
-            if ( ret != 0 )
-#endif
-            {
-                free(pEngine->source);
-                free(tasks);
-                free(results);
-                free(pEngine->threads);
-                fprintf(stderr, "pthread_create error!\n");
-                return NULL;
-            }
-        }
+        free(tasks);
+        return NULL;
     }
 
 #if defined(_MSC_VER)
@@ -1655,13 +2987,13 @@ static PyObject* fuzzyEngine_guessMatch(PyObject* self, PyObject* args, PyObject
     uint32_t icon_len = 0;
     if ( pyObject_ToStringAndSize(py_icon, &icon_str, &icon_len) < 0 )
     {
-        free(pEngine->source);
         free(tasks);
-        free(results);
         fprintf(stderr, "pyObject_ToStringAndSize error!\n");
         return NULL;
     }
 
+    beginItemTasks(pEngine, tasks);
+
     uint32_t i = 0;
     for ( ; i < task_count; ++i )
     {
@@ -1676,12 +3008,15 @@ static PyObject* fuzzyEngine_guessMatch(PyObject* self, PyObject* args, PyObject
         for ( ; j < length; ++j )
         {
             FeString *s = pEngine->source + offset + j;
-            PyObject* item = PyList_GET_ITEM(py_source, offset + j);
-            if ( pyObject_ToStringAndSize(item, &s->str, &s->len) < 0 )
+            uint32_t index = SOURCE_INDEX(source_indices, begin + offset + j);
+            if ( pCorpus )
+            {
+                *s = pCorpus->strings[index];
+            }
+            else if ( pyObject_ToStringAndSize(PyList_GET_ITEM(py_list, index), &s->str, &s->len) < 0 )
             {
-                free(pEngine->source);
+                abortItemTasks(pEngine);
                 free(tasks);
-                free(results);
                 fprintf(stderr, "pyObject_ToStringAndSize error!\n");
                 return NULL;
             }
@@ -1693,10 +3028,10 @@ static PyObject* fuzzyEngine_guessMatch(PyObject* self, PyObject* args, PyObject
             }
         }
 
-        QUEUE_PUT(pEngine->task_queue, tasks + i);
+        putItemTask(pEngine, tasks + i);
     }
 
-    QUEUE_JOIN(pEngine->task_queue);    /* blocks until all tasks have finished */
+    joinItemTasks(pEngine);
 
     if ( sort_results )
     {
@@ -1715,9 +3050,7 @@ static PyObject* fuzzyEngine_guessMatch(PyObject* self, PyObject* args, PyObject
             FeResult* buffer = (FeResult*)malloc(chunk_size * (task_count >> 1) * sizeof(FeResult));
             if ( !buffer )
             {
-                free(pEngine->source);
                 free(tasks);
-                free(results);
                 fprintf(stderr, "Out of memory at %s:%d\n", __FILE__, __LINE__);
                 return NULL;
             }
@@ -1741,9 +3074,7 @@ static PyObject* fuzzyEngine_guessMatch(PyObject* self, PyObject* args, PyObject
             merge_tasks = (MergeTaskItem*)malloc(task_count * sizeof(MergeTaskItem));
             if ( !merge_tasks )
             {
-                free(pEngine->source);
                 free(tasks);
-                free(results);
                 free(buffer);
                 fprintf(stderr, "Out of memory at %s:%d\n", __FILE__, __LINE__);
                 return NULL;
@@ -1786,357 +3117,126 @@ static PyObject* fuzzyEngine_guessMatch(PyObject* self, PyObject* args, PyObject
         }
     }
 
-    uint32_t* path_weights = (uint32_t*)malloc(source_size * sizeof(uint32_t));
-    if ( !path_weights )
-    {
-        free(pEngine->source);
-        free(tasks);
-        free(results);
-        fprintf(stderr, "Out of memory at %s:%d\n", __FILE__, __LINE__);
-        return NULL;
-    }
-
-    PyObject* text_list = PyList_New(source_size);
-    if ( task_count == 1 || source_size < 40000 )
-    {
-        for ( i = 0; i < source_size; ++i )
-        {
-            path_weights[i] = results[i].path_weight;
-            /* PyList_SET_ITEM() steals a reference to item.     */
-            /* PySequence_ITEM() return value: New reference. */
-            PyList_SET_ITEM(text_list, i, PySequence_ITEM(py_source, results[i].index));
-        }
-    }
-    else
-    {
-        chunk_size = (source_size + task_count - 1) / task_count;
-        if ( chunk_size < 8000 )
-        {
-            chunk_size = (source_size + (task_count >> 1) - 1) / (task_count >> 1);
-        }
-        task_count = (source_size + chunk_size - 1) / chunk_size;
-
-        PySetTaskItem* py_set_tasks = NULL;
-        py_set_tasks = (PySetTaskItem*)malloc(task_count * sizeof(PySetTaskItem));
-        if ( !py_set_tasks )
-        {
-            free(pEngine->source);
-            free(tasks);
-            free(results);
-            fprintf(stderr, "Out of memory at %s:%d\n", __FILE__, __LINE__);
-            return NULL;
-        }
-
-#if defined(_MSC_VER)
-        QUEUE_SET_TASK_COUNT(pEngine->task_queue, task_count);
-#endif
-        for ( i = 0; i < task_count; ++i )
-        {
-            uint32_t offset = i * chunk_size;
-            uint32_t length = MIN(chunk_size, source_size - offset);
-
-            py_set_tasks[i].function = PY_SET_ITEM_2;
-            py_set_tasks[i].offset = offset;
-            py_set_tasks[i].length = length;
-            py_set_tasks[i].path_weights = path_weights;
-            py_set_tasks[i].text_list = text_list;
-            py_set_tasks[i].py_source = py_source;
-            QUEUE_PUT(pEngine->task_queue, py_set_tasks + i);
-        }
-
-        QUEUE_JOIN(pEngine->task_queue);    /* blocks until all tasks have finished */
-
-        free(py_set_tasks);
-    }
+    pEngine->timings[PHASE_SORT] = getTime() - pEngine->join_time;
 
-    free(pEngine->source);
     free(tasks);
-    free(results);
-
-    return Py_BuildValue("(NN)", createWeights(path_weights), text_list);
-}
-
-enum
-{
-    Category_Rg = 0,
-    Category_Tag,
-    Category_File,
-    Category_Gtags,
-    Category_Line,
-};
-
-typedef struct RgParameter
-{
-    uint32_t display_multi;
-    const char* separator;
-    uint32_t separator_len;
-    uint32_t has_column;
-}RgParameter;
-
-typedef struct Parameter
-{
-    uint32_t mode;
-}Parameter;
-
-typedef struct GtagsParameter
-{
-    uint32_t mode;
-    uint32_t format;
-    uint32_t match_path;
-}GtagsParameter;
-
-static void delParamObj(PyObject* obj)
-{
-    free(PyCapsule_GetPointer(obj, NULL));
-}
-
-/**
- * createRgParameter(display_multi, separator, has_column)
- */
-static PyObject* fuzzyEngine_createRgParameter(PyObject* self, PyObject* args)
-{
-    uint32_t display_multi = 0;
-    const char* separator;
-    Py_ssize_t separator_len;
-    uint32_t has_column = 0;
-
-    if ( !PyArg_ParseTuple(args, "Is#I:createRgParameter", &display_multi, &separator, &separator_len, &has_column) )
-        return NULL;
-
-    RgParameter* param = (RgParameter*)malloc(sizeof(RgParameter));
-    if ( !param )
-    {
-        return NULL;
-    }
-    param->display_multi = display_multi;
-    param->separator = separator;
-    param->separator_len = (uint32_t)separator_len;
-    param->has_column = has_column;
-
-    return PyCapsule_New(param, NULL, delParamObj);
-}
-
-/**
- * createParameter(mode)
- */
-static PyObject* fuzzyEngine_createParameter(PyObject* self, PyObject* args)
-{
-    uint32_t mode = 0;
 
-    if ( !PyArg_ParseTuple(args, "I:createParameter", &mode) )
-        return NULL;
-
-    Parameter* param = (Parameter*)malloc(sizeof(Parameter));
-    if ( !param )
+    uint32_t* path_weights = (uint32_t*)malloc(source_size * sizeof(uint32_t));
+    if ( !path_weights )
     {
+        fprintf(stderr, "Out of memory at %s:%d\n", __FILE__, __LINE__);
         return NULL;
     }
 
-    param->mode = mode;
-
-    return PyCapsule_New(param, NULL, delParamObj);
-}
-
-/**
- * createGtagsParameter(mode, format, match_path)
- */
-static PyObject* fuzzyEngine_createGtagsParameter(PyObject* self, PyObject* args)
-{
-    uint32_t mode;
-    uint32_t format;
-    uint32_t match_path;
-
-    if ( !PyArg_ParseTuple(args, "III:createGtagsParameter", &mode, &format, &match_path) )
-        return NULL;
-
-    GtagsParameter* param = (GtagsParameter*)malloc(sizeof(GtagsParameter));
-    if ( !param )
+    uint32_t* indices = (uint32_t*)malloc(source_size * sizeof(uint32_t));
+    if ( !indices )
     {
+        free(path_weights);
+        fprintf(stderr, "Out of memory at %s:%d\n", __FILE__, __LINE__);
         return NULL;
     }
 
-    param->mode = mode;
-    param->format = format;
-    param->match_path = match_path;
-
-    return PyCapsule_New(param, NULL, delParamObj);
-}
-
-static void rg_getDigest(char** str, uint32_t* length, RgParameter* param)
-{
-    char* s = *str;
-    uint32_t len = *length;
-    char* p = NULL;
-
-    if ( param->display_multi )
-    {
-        if ( len == param->separator_len && strncmp(s, param->separator, len) == 0 )
-        {
-            *length = 0;
-            return;
-        }
-        else
-        {
-            uint8_t colon = 0;
-            uint8_t minus = 0;
-            for ( p = s; p < s + len; ++p )
-            {
-                if ( *p == ':' )
-                {
-                    minus = 0;
-                    ++colon;
-                    if ( (colon == 2 && !param->has_column) || colon == 3 )
-                    {
-                        *str = p + 1;
-                        *length -= (uint32_t)(*str - s);
-                        return;
-                    }
-                }
-                else if ( *p == '-' )
-                {
-                    colon = 0;
-                    ++minus;
-                    if ( minus == 2 )
-                    {
-                        *str = p + 1;
-                        *length -= (uint32_t)(*str - s);
-                        return;
-                    }
-                }
-                else if ( !isdigit(*p) && colon + minus > 0 )
-                {
-                    colon = 0;
-                    minus = 0;
-                }
-            }
-        }
-    }
-    else
-    {
-        uint8_t colon = 0;
-        for ( p = s; p < s + len; ++p )
-        {
-            if ( *p == ':' )
-            {
-                ++colon;
-                if ( (colon == 2 && !param->has_column) || colon == 3 )
-                {
-                    *str = p + 1;
-                    *length -= (uint32_t)(*str - s);
-                    return;
-                }
-            }
-            else if ( !isdigit(*p) && colon > 0 )
-            {
-                colon = 0;
-            }
-        }
-    }
-}
-
-static void tag_getDigest(char** str, uint32_t* length, Parameter* param)
-{
-    char* s = *str;
-    uint32_t len = *length;
-    char* p = s;
-    for ( ; p < s + len; ++p )
-    {
-        if ( *p == '\t' )
-        {
-            *length = (uint32_t)(p - s);
-            return;
-        }
+    for ( i = 0; i < source_size; ++i )
+    {
+        path_weights[i] = results[i].path_weight;
+        indices[i] = SOURCE_INDEX(source_indices, begin + results[i].index);
     }
-    /* if there is no '\t', the text is invalid */
-    *length = 0;
+
+    return Py_BuildValue("(NN)", createWeights(path_weights), createResultView(py_list, indices, source_size));
 }
 
-static void file_getDigest(char** str, uint32_t* length, Parameter* param)
+static void delParamObj(PyObject* obj)
 {
-    char* s = *str;
-    char *p = s + *length - 1;
-    for ( ; p >= s; --p )
-    {
-        if ( *p == '/' || *p == '\\' )
-        {
-            *str = p + 1;
-            *length -= (uint32_t)(*str - s);
-            return;
-        }
-    }
+    free(PyCapsule_GetPointer(obj, NULL));
 }
 
-static void gtags_getDigest(char** str, uint32_t* length, GtagsParameter* param)
+/**
+ * createRgParameter(display_multi, separator, has_column)
+ */
+static PyObject* fuzzyEngine_createRgParameter(PyObject* self, PyObject* args)
 {
-    char* s = *str;
-    uint32_t len = *length;
-    char* p = NULL;
+    uint32_t display_multi = 0;
+    const char* separator;
+    Py_ssize_t separator_len;
+    uint32_t has_column = 0;
 
-    if ( param->match_path )
-        return;
+    if ( !PyArg_ParseTuple(args, "Is#I:createRgParameter", &display_multi, &separator, &separator_len, &has_column) )
+        return NULL;
 
-    if ( param->format == 0 ) /* ctags-mod */
-    {
-        uint8_t tab = 0;
-        for ( p = s; p < s + len; ++p )
-        {
-            if ( *p == '\t' )
-            {
-                ++tab;
-                if ( tab == 2 )
-                {
-                    *str = p + 1;
-                    *length -= (uint32_t)(*str - s);
-                    return;
-                }
-            }
-        }
-    }
-    else if ( param->format == 1 ) /* ctags */
+    /* the separator is copied, because the string it points to may be freed before `param` */
+    RgParameter* param = (RgParameter*)malloc(sizeof(RgParameter) + separator_len + 1);
+    if ( !param )
     {
-        for ( p = s; p < s + len; ++p )
-        {
-            if ( *p == '\t' )
-            {
-                *length = (uint32_t)(p - s);
-                return;
-            }
-        }
+        return NULL;
     }
-    else if ( param->format == 2 ) /* ctags-x */
+    char* separator_copy = (char*)(param + 1);
+    memcpy(separator_copy, separator, separator_len);
+    separator_copy[separator_len] = '\0';
+    param->display_multi = display_multi;
+    param->separator = separator_copy;
+    param->separator_len = (uint32_t)separator_len;
+    param->has_column = has_column;
+
+    return PyCapsule_New(param, NULL, delParamObj);
+}
+
+/**
+ * createParameter(mode)
+ */
+static PyObject* fuzzyEngine_createParameter(PyObject* self, PyObject* args)
+{
+    uint32_t mode = 0;
+
+    if ( !PyArg_ParseTuple(args, "I:createParameter", &mode) )
+        return NULL;
+
+    Parameter* param = (Parameter*)malloc(sizeof(Parameter));
+    if ( !param )
     {
-        for ( p = s; p < s + len; ++p )
-        {
-            if ( *p == ' ' )
-            {
-                *length = (uint32_t)(p - s);
-                return;
-            }
-        }
+        return NULL;
     }
+
+    param->mode = mode;
+
+    return PyCapsule_New(param, NULL, delParamObj);
 }
 
-static void line_getDigest(char** str, uint32_t* length, Parameter* param)
+/**
+ * createGtagsParameter(mode, format, match_path)
+ */
+static PyObject* fuzzyEngine_createGtagsParameter(PyObject* self, PyObject* args)
 {
-    char* s = *str;
-    char *p = s + *length - 1;
-    for ( ; p >= s; --p )
+    uint32_t mode;
+    uint32_t format;
+    uint32_t match_path;
+
+    if ( !PyArg_ParseTuple(args, "III:createGtagsParameter", &mode, &format, &match_path) )
+        return NULL;
+
+    GtagsParameter* param = (GtagsParameter*)malloc(sizeof(GtagsParameter));
+    if ( !param )
     {
-        if ( *p == '\t' )
-        {
-            *length = (uint32_t)(p - s);
-            return;
-        }
+        return NULL;
     }
+
+    param->mode = mode;
+    param->format = format;
+    param->match_path = match_path;
+
+    return PyCapsule_New(param, NULL, delParamObj);
 }
 
 /**
- * fuzzyMatchPart(engine, source, pattern, category, param, is_name_only=False, sort_results=True)
+ * fuzzyMatchPart(engine, source, pattern, category, param, is_name_only=False, sort_results=True,
+ *                corpus=None, begin=0, end=-1, top_k=0)
  *
  * `is_name_only` is optional, it defaults to `False`, which indicates using the full path matching algorithm.
  * `sort_results` is optional, it defaults to `True`, which indicates whether to sort the results.
+ * `source`, `corpus`, `begin`, `end` and `top_k`, see fuzzyMatch().
+ * If `corpus` is specified, the digests of its strings are kept in it and reused as long as the same
+ * `param` object is passed, so pass the same object as long as the parameters do not change.
  *
- * return a tuple, (a list of corresponding weight, a sorted list of items from `source` that match `pattern`).
+ * return a tuple, (a list of corresponding weight, a sorted ResultView of items from `source` that match `pattern`).
  */
 static PyObject* fuzzyEngine_fuzzyMatchPart(PyObject* self, PyObject* args, PyObject* kwargs)
 {
@@ -2147,23 +3247,38 @@ static PyObject* fuzzyEngine_fuzzyMatchPart(PyObject* self, PyObject* args, PyOb
     uint32_t category;
     uint8_t is_name_only = 0;
     uint8_t sort_results = 1;
-    static char* kwlist[] = {"engine", "source", "pattern", "category", "param", "is_name_only", "sort_results", NULL};
-
-    if ( !PyArg_ParseTupleAndKeywords(args, kwargs, "OOOIO|bb:fuzzyMatch", kwlist, &py_engine, &py_source,
-                                      &py_patternCtxt, &category, &py_param, &is_name_only, &sort_results) )
+    PyObject* py_corpus = NULL;
+    Py_ssize_t begin = 0;
+    Py_ssize_t end = -1;
+    uint32_t top_k = 0;
+    static char* kwlist[] = {"engine", "source", "pattern", "category", "param", "is_name_only", "sort_results",
+                             "corpus", "begin", "end", "top_k", NULL};
+
+    if ( !PyArg_ParseTupleAndKeywords(args, kwargs, "OOOIO|bbOnnI:fuzzyMatch", kwlist, &py_engine, &py_source,
+                                      &py_patternCtxt, &category, &py_param, &is_name_only, &sort_results,
+                                      &py_corpus, &begin, &end, &top_k) )
         return NULL;
 
     FuzzyEngine* pEngine = (FuzzyEngine*)PyCapsule_GetPointer(py_engine, NULL);
     if ( !pEngine )
         return NULL;
 
-    if ( !PyList_Check(py_source) )
-    {
-        PyErr_SetString(PyExc_TypeError, "parameter `source` must be a list.");
+    PyObject* py_list = NULL;
+    uint32_t* source_indices = NULL;
+    Py_ssize_t size = 0;
+    if ( getSourceList(py_source, &py_list, &source_indices, &size) < 0 )
         return NULL;
+
+    FeCorpus* pCorpus = NULL;
+    if ( py_corpus && py_corpus != Py_None )
+    {
+        pCorpus = (FeCorpus*)PyCapsule_GetPointer(py_corpus, NULL);
+        if ( !pCorpus )
+            return NULL;
     }
 
-    uint32_t source_size = (uint32_t)PyList_Size(py_source);
+    getSourceRange(size, &begin, &end);
+    uint32_t source_size = (uint32_t)(end - begin);
     if ( source_size == 0 )
     {
         return Py_BuildValue("([],[])");
@@ -2175,6 +3290,10 @@ static PyObject* fuzzyEngine_fuzzyMatchPart(PyObject* self, PyObject* args, PyOb
 
     pEngine->is_name_only = is_name_only;
 
+    void* param = PyCapsule_GetPointer(py_param, NULL);
+    if ( !param )
+        return NULL;
+
     uint32_t max_task_count  = MAX_TASK_COUNT(pEngine->cpu_count);
     uint32_t chunk_size = (source_size + max_task_count - 1) / max_task_count;
     uint32_t task_count = (source_size + chunk_size - 1) / chunk_size;
@@ -2184,73 +3303,55 @@ static PyObject* fuzzyEngine_fuzzyMatchPart(PyObject* self, PyObject* args, PyOb
         task_count = 1;
     }
 
-    pEngine->source = (FeString*)malloc(source_size * sizeof(FeString));
-    if ( !pEngine->source )
-    {
-        fprintf(stderr, "Out of memory at %s:%d\n", __FILE__, __LINE__);
+    /* the digests are calculated in the buffer, so the strings of the corpus are not changed */
+    if ( reserveSource(pEngine, source_size) < 0 )
         return NULL;
+
+    /* the strings of the corpus can be used only if the items of `source` are in it */
+    if ( pCorpus && source_indices && py_list != pCorpus->items )
+    {
+        pCorpus = NULL;
+    }
+
+    if ( pCorpus && !source_indices )
+    {
+        if ( updateCorpus(pCorpus, py_source, (uint32_t)begin, (uint32_t)end) < 0 )
+            return NULL;
+        py_list = pCorpus->items;
+    }
+
+    if ( pCorpus )
+    {
+        updateDigests(pCorpus, category, py_param, param);
     }
 
     TaskItem* tasks = (TaskItem*)malloc(task_count * sizeof(TaskItem));
     if ( !tasks )
     {
-        free(pEngine->source);
         fprintf(stderr, "Out of memory at %s:%d\n", __FILE__, __LINE__);
         return NULL;
     }
 
-    pEngine->results = (FeResult*)malloc(source_size * sizeof(FeResult));
-    if ( !pEngine->results )
+    if ( reserveResults(pEngine, source_size) < 0 )
     {
-        free(pEngine->source);
         free(tasks);
-        fprintf(stderr, "Out of memory at %s:%d\n", __FILE__, __LINE__);
         return NULL;
     }
 
     FeResult* results = pEngine->results;
 
-    if ( !pEngine->threads )
+    if ( startWorkers(pEngine) < 0 )
     {
-#if defined(_MSC_VER)
-        pEngine->threads = (HANDLE*)malloc(pEngine->cpu_count * sizeof(HANDLE));
-#else
-        pEngine->threads = (pthread_t*)malloc(pEngine->cpu_count * sizeof(pthread_t));
-#endif
-        if ( !pEngine->threads )
-        {
-            free(pEngine->source);
-            free(tasks);
-            free(results);
-            fprintf(stderr, "Out of memory at %s:%d\n", __FILE__, __LINE__);
-            return NULL;
-        }
-
-        uint32_t i = 0;
-        for ( ; i < pEngine->cpu_count; ++i)
-        {
-#if defined(_MSC_VER)
-            pEngine->threads[i] = CreateThread(NULL, 0, _worker, pEngine, 0, NULL);
-            if ( !pEngine->threads[i] )
-#else
-            int ret = pthread_create(&pEngine->threads[i], NULL, _worker, pEngine);
-            if ( ret != 0 )
-#endif
-            {
-                free(pEngine->source);
-                free(tasks);
-                free(results);
-                free(pEngine->threads);
-                fprintf(stderr, "pthread_create error!\n");
-                return NULL;
-            }
-        }
+        free(tasks);
+        return NULL;
     }
 
 #if defined(_MSC_VER)
     QUEUE_SET_TASK_COUNT(pEngine->task_queue, task_count);
 #endif
 
+    beginItemTasks(pEngine, tasks);
+
     uint32_t i = 0;
     for ( ; i < task_count; ++i )
     {
@@ -2265,62 +3366,30 @@ static PyObject* fuzzyEngine_fuzzyMatchPart(PyObject* self, PyObject* args, PyOb
         for ( ; j < length; ++j )
         {
             FeString *s = pEngine->source + offset + j;
-            PyObject* item = PyList_GET_ITEM(py_source, offset + j);
-            if ( pyObject_ToStringAndSize(item, &s->str, &s->len) < 0 )
-            {
-                free(pEngine->source);
-                free(tasks);
-                free(results);
-                fprintf(stderr, "pyObject_ToStringAndSize error!\n");
-                return NULL;
-            }
-
-            switch ( category )
-            {
-            case Category_Rg:
+            uint32_t index = SOURCE_INDEX(source_indices, begin + offset + j);
+            if ( pCorpus )
             {
-                RgParameter* param = (RgParameter*)PyCapsule_GetPointer(py_param, NULL);
-                if ( !param )
-                {
-                    free(pEngine->source);
-                    free(tasks);
-                    free(results);
-                    fprintf(stderr, "PyCapsule_GetPointer error!\n");
-                    return NULL;
-                }
-                rg_getDigest(&s->str, &s->len, param);
-                break;
+                FeDigest* pDigest = pCorpus->digests + index;
+                s->str = pCorpus->strings[index].str + pDigest->offset;
+                s->len = pDigest->len;
             }
-            case Category_Tag:
-                tag_getDigest(&s->str, &s->len, (Parameter*)PyCapsule_GetPointer(py_param, NULL));
-                break;
-            case Category_File:
-                file_getDigest(&s->str, &s->len, (Parameter*)PyCapsule_GetPointer(py_param, NULL));
-                break;
-            case Category_Gtags:
+            else
             {
-                GtagsParameter* param = (GtagsParameter*)PyCapsule_GetPointer(py_param, NULL);
-                if ( !param )
+                if ( pyObject_ToStringAndSize(PyList_GET_ITEM(py_list, index), &s->str, &s->len) < 0 )
                 {
-                    free(pEngine->source);
+                    abortItemTasks(pEngine);
                     free(tasks);
-                    free(results);
-                    fprintf(stderr, "PyCapsule_GetPointer error!\n");
+                    fprintf(stderr, "pyObject_ToStringAndSize error!\n");
                     return NULL;
                 }
-                gtags_getDigest(&s->str, &s->len, param);
-                break;
-            }
-            case Category_Line:
-                line_getDigest(&s->str, &s->len, (Parameter*)PyCapsule_GetPointer(py_param, NULL));
-                break;
+                getDigest(s, category, param);
             }
         }
 
-        QUEUE_PUT(pEngine->task_queue, tasks + i);
+        putItemTask(pEngine, tasks + i);
     }
 
-    QUEUE_JOIN(pEngine->task_queue);    /* blocks until all tasks have finished */
+    joinItemTasks(pEngine);
 
     uint32_t results_count = 0;
     for ( i = 0; i < source_size; ++i )
@@ -2337,15 +3406,18 @@ static PyObject* fuzzyEngine_fuzzyMatchPart(PyObject* self, PyObject* args, PyOb
 
     if ( results_count == 0 )
     {
-        free(pEngine->source);
         free(tasks);
-        free(results);
         return Py_BuildValue("([],[])");
     }
 
+    uint32_t sorted_count = results_count;
     if ( sort_results )
     {
-        if ( task_count == 1 || results_count < 60000 )
+        if ( top_k > 0 && top_k < results_count )
+        {
+            sorted_count = sortTopK(pEngine, tasks, task_count, results_count, top_k);
+        }
+        else if ( task_count == 1 || results_count < 60000 )
         {
             qsort(results, results_count, sizeof(FeResult), compare);
         }
@@ -2360,9 +3432,7 @@ static PyObject* fuzzyEngine_fuzzyMatchPart(PyObject* self, PyObject* args, PyOb
             FeResult* buffer = (FeResult*)malloc(chunk_size * (task_count >> 1) * sizeof(FeResult));
             if ( !buffer )
             {
-                free(pEngine->source);
                 free(tasks);
-                free(results);
                 fprintf(stderr, "Out of memory at %s:%d\n", __FILE__, __LINE__);
                 return NULL;
             }
@@ -2386,9 +3456,7 @@ static PyObject* fuzzyEngine_fuzzyMatchPart(PyObject* self, PyObject* args, PyOb
             merge_tasks = (MergeTaskItem*)malloc(task_count * sizeof(MergeTaskItem));
             if ( !merge_tasks )
             {
-                free(pEngine->source);
                 free(tasks);
-                free(results);
                 free(buffer);
                 fprintf(stderr, "Out of memory at %s:%d\n", __FILE__, __LINE__);
                 return NULL;
@@ -2431,87 +3499,35 @@ static PyObject* fuzzyEngine_fuzzyMatchPart(PyObject* self, PyObject* args, PyOb
         }
     }
 
-    weight_t* weights = (weight_t*)malloc(results_count * sizeof(weight_t));
-    if ( !weights )
-    {
-        free(pEngine->source);
-        free(tasks);
-        free(results);
-        fprintf(stderr, "Out of memory at %s:%d\n", __FILE__, __LINE__);
-        return NULL;
-    }
-
-    PyObject* text_list = PyList_New(results_count);
-    if ( task_count == 1 || results_count < 40000 )
-    {
-        for ( i = 0; i < results_count; ++i )
-        {
-            weights[i] = results[i].weight;
-            /* PyList_SET_ITEM() steals a reference to item.     */
-            /* PySequence_ITEM() return value: New reference. */
-            PyList_SET_ITEM(text_list, i, PySequence_ITEM(py_source, results[i].index));
-        }
-    }
-    else
-    {
-        chunk_size = (results_count + task_count - 1) / task_count;
-        if ( chunk_size < 8000 )
-        {
-            chunk_size = (results_count + (task_count >> 1) - 1) / (task_count >> 1);
-        }
-        task_count = (results_count + chunk_size - 1) / chunk_size;
-
-        PySetTaskItem* py_set_tasks = NULL;
-        py_set_tasks = (PySetTaskItem*)malloc(task_count * sizeof(PySetTaskItem));
-        if ( !py_set_tasks )
-        {
-            free(pEngine->source);
-            free(tasks);
-            free(results);
-            fprintf(stderr, "Out of memory at %s:%d\n", __FILE__, __LINE__);
-            return NULL;
-        }
-
-#if defined(_MSC_VER)
-        QUEUE_SET_TASK_COUNT(pEngine->task_queue, task_count);
-#endif
-        for ( i = 0; i < task_count; ++i )
-        {
-            uint32_t offset = i * chunk_size;
-            uint32_t length = MIN(chunk_size, results_count - offset);
-
-            py_set_tasks[i].function = PY_SET_ITEM;
-            py_set_tasks[i].offset = offset;
-            py_set_tasks[i].length = length;
-            py_set_tasks[i].weights = weights;
-            py_set_tasks[i].text_list = text_list;
-            py_set_tasks[i].py_source = py_source;
-            QUEUE_PUT(pEngine->task_queue, py_set_tasks + i);
-        }
+    pEngine->timings[PHASE_SORT] = getTime() - pEngine->join_time;
 
-        QUEUE_JOIN(pEngine->task_queue);    /* blocks until all tasks have finished */
+    free(tasks);
 
-        free(py_set_tasks);
-    }
+    weight_t* weights = NULL;
+    uint32_t* indices = NULL;
+    if ( createResults(pEngine, py_list, source_indices, (uint32_t)begin, results_count, &weights, &indices) < 0 )
+        return NULL;
 
-    free(pEngine->source);
-    free(tasks);
-    free(results);
+    PyObject* py_weights = createWeights(weights);
+    setSortedCount(py_weights, sorted_count, results_count);
 
-    return Py_BuildValue("(NN)", createWeights(weights), text_list);
+    return Py_BuildValue("(NN)", py_weights, createResultView(py_list, indices, results_count));
 }
 
 static PyMethodDef fuzzyEngine_Methods[] =
 {
     { "createFuzzyEngine", (PyCFunction)fuzzyEngine_createFuzzyEngine, METH_VARARGS | METH_KEYWORDS, "" },
     { "closeFuzzyEngine", (PyCFunction)fuzzyEngine_closeFuzzyEngine, METH_VARARGS, "" },
+    { "getTimings", (PyCFunction)fuzzyEngine_getTimings, METH_VARARGS, "" },
     { "initPattern", (PyCFunction)fuzzyEngine_initPattern, METH_VARARGS, "initialize the pattern." },
+    { "createCorpus", (PyCFunction)fuzzyEngine_createCorpus, METH_NOARGS, "" },
     { "fuzzyMatch", (PyCFunction)fuzzyEngine_fuzzyMatch, METH_VARARGS | METH_KEYWORDS, "" },
     { "fuzzyMatchEx", (PyCFunction)fuzzyEngine_fuzzyMatchEx, METH_VARARGS | METH_KEYWORDS, "" },
     { "fuzzyMatchPart", (PyCFunction)fuzzyEngine_fuzzyMatchPart, METH_VARARGS | METH_KEYWORDS, "" },
     { "getHighlights", (PyCFunction)fuzzyEngine_getHighlights, METH_VARARGS | METH_KEYWORDS, "" },
     { "guessMatch", (PyCFunction)fuzzyEngine_guessMatch, METH_VARARGS | METH_KEYWORDS, "" },
     { "merge", (PyCFunction)fuzzyEngine_merge, METH_VARARGS, "" },
+    { "sortRest", (PyCFunction)fuzzyEngine_sortRest, METH_VARARGS, "" },
     { "createRgParameter", (PyCFunction)fuzzyEngine_createRgParameter, METH_VARARGS, "" },
     { "createParameter", (PyCFunction)fuzzyEngine_createParameter, METH_VARARGS, "" },
     { "createGtagsParameter", (PyCFunction)fuzzyEngine_createGtagsParameter, METH_VARARGS, "" },
@@ -2537,6 +3553,19 @@ PyMODINIT_FUNC PyInit_fuzzyEngine(void)
     if ( !module )
         return NULL;
 
+    if ( initResultViewType() < 0 )
+    {
+        Py_DECREF(module);
+        return NULL;
+    }
+
+    Py_INCREF(&ResultView_Type);
+    if ( PyModule_AddObject(module, "ResultView", (PyObject*)&ResultView_Type) )
+    {
+        Py_DECREF(module);
+        return NULL;
+    }
+
     if ( PyModule_AddObject(module, "Category_Rg", Py_BuildValue("I", Category_Rg)) )
     {
         Py_DECREF(module);
@@ -2580,6 +3609,19 @@ PyMODINIT_FUNC initfuzzyEngine(void)
     if ( !module )
         return;
 
+    if ( initResultViewType() < 0 )
+    {
+        Py_DECREF(module);
+        return;
+    }
+
+    Py_INCREF(&ResultView_Type);
+    if ( PyModule_AddObject(module, "ResultView", (PyObject*)&ResultView_Type) )
+    {
+        Py_DECREF(module);
+        return;
+    }
+
     if ( PyModule_AddObject(module, "Category_Rg", Py_BuildValue("I", Category_Rg)) )
     {
         Py_DECREF(module);
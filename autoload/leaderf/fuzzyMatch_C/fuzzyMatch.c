@@ -23,8 +23,22 @@
 #include <stdlib.h>
 #include <string.h>
 #include <ctype.h>
+#include <time.h>
 #include "fuzzyMatch.h"
 
+#if defined(__SSE2__) || defined(_M_AMD64) || defined(_M_X64) || (defined(_M_IX86_FP) && _M_IX86_FP >= 2)
+
+    #define FM_SSE2
+    #include <emmintrin.h>
+
+    /* AVX2 is used if the CPU supports it, see selectCharMask() */
+    #if defined(__GNUC__) && defined(__x86_64__) && defined(__linux__)
+        #define FM_AVX2
+        #include <immintrin.h>
+    #endif
+
+#endif
+
 
 #if defined(_MSC_VER) && \
     (defined(_M_IX86) || defined(_M_AMD64) || defined(_M_X64))
@@ -132,7 +146,7 @@ static uint8_t MultiplyDeBruijnBitPosition[64] =
 
 #define FM_CTZ(x) MultiplyDeBruijnBitPosition[((uint64_t)((x) & -(int64_t)(x)) * deBruijn) >> 58]
 
-static uint16_t valTable[64] =
+static uint16_t valTable[66] =
 {
     0,   1,   4,   7,   13,  19,  25,  31,
     37,  43,  49,  55,  61,  67,  73,  79,
@@ -141,52 +155,544 @@ static uint16_t valTable[64] =
     181, 187, 193, 199, 205, 211, 217, 223,
     229, 235, 241, 247, 253, 259, 265, 271,
     277, 283, 289, 295, 301, 307, 313, 319,
-    325, 331, 337, 343, 349, 355, 361, 367
+    325, 331, 337, 343, 349, 355, 361, 367,
+    373, 379
 };
 
+/**
+ * the evaluation tries the ways a pattern can be split into substrings, which may be exponential
+ * in the length of the pattern, so for a pattern longer than 63 characters, at most
+ * MAX_EVALUATIONS of them are tried, after that only the first one of each substring is taken,
+ * i.e., the rest of the pattern is matched greedily.
+ */
+#define MAX_EVALUATIONS 1000
+
 typedef struct TextContext
 {
     const char* text;
     uint64_t* text_mask;
-    uint16_t text_len;
-    uint16_t col_num;
-    uint16_t offset;
+    uint32_t text_len;
+    uint32_t col_num;
+    uint32_t offset;
+    uint32_t budget;    /* the number of evaluations left, see MAX_EVALUATIONS */
 }TextContext;
 
 typedef struct ValueElements
 {
     float score;
-    uint16_t beg;
-    uint16_t end;
+    uint32_t beg;
+    uint32_t end;
 }ValueElements;
 
+/**
+ * return the simple case folding of the code point `cp`,
+ * the letters of Latin, Greek, Cyrillic, Armenian and fullwidth Latin are folded.
+ */
+static uint32_t foldCase(uint32_t cp)
+{
+    if ( cp < 0x80 )
+    {
+        return (uint32_t)tolower((int)cp);
+    }
+    else if ( cp < 0x100 )
+    {
+        if ( cp >= 0xC0 && cp <= 0xDE && cp != 0xD7 )
+            return cp + 0x20;
+    }
+    else if ( cp < 0x180 )
+    {
+        /* 0x130 and 0x131 are the Turkish dotted and dotless i */
+        if ( ((cp < 0x130 || (cp >= 0x132 && cp < 0x138) || (cp >= 0x14A && cp < 0x178)) && (cp & 1) == 0)
+             || (((cp >= 0x139 && cp < 0x149) || (cp >= 0x179 && cp < 0x17F)) && (cp & 1) == 1) )
+            return cp + 1;
+        else if ( cp == 0x178 )
+            return 0xFF;
+    }
+    else if ( cp >= 0x386 && cp < 0x3B0 )
+    {
+        if ( cp >= 0x391 && cp <= 0x3AB && cp != 0x3A2 )
+            return cp + 0x20;
+        else if ( cp == 0x386 )
+            return 0x3AC;
+        else if ( cp >= 0x388 && cp <= 0x38A )
+            return cp + 0x25;
+        else if ( cp == 0x38C )
+            return 0x3CC;
+        else if ( cp == 0x38E || cp == 0x38F )
+            return cp + 0x3F;
+    }
+    else if ( cp >= 0x400 && cp < 0x500 )
+    {
+        if ( cp < 0x410 )
+            return cp + 0x50;
+        else if ( cp < 0x430 )
+            return cp + 0x20;
+        else if ( ((cp >= 0x460 && cp < 0x482) || (cp >= 0x48A && cp < 0x4C0) || cp >= 0x4D0) && (cp & 1) == 0 )
+            return cp + 1;
+        else if ( cp >= 0x4C1 && cp < 0x4CF && (cp & 1) == 1 )
+            return cp + 1;
+        else if ( cp == 0x4C0 )
+            return 0x4CF;
+    }
+    else if ( cp >= 0x531 && cp <= 0x556 )
+    {
+        return cp + 0x30;
+    }
+    else if ( cp >= 0x1E00 && cp < 0x1F00 )
+    {
+        if ( (cp < 0x1E96 || cp >= 0x1EA0) && (cp & 1) == 0 )
+            return cp + 1;
+    }
+    else if ( cp >= 0xFF21 && cp <= 0xFF3A )
+    {
+        return cp + 0x20;
+    }
+
+    return cp;
+}
+
+/**
+ * decode the UTF-8 character at the beginning of `s` and save its code point in `cp`,
+ * return the length of the character in bytes, an invalid byte is taken as a character.
+ */
+static uint32_t decodeUtf8(const uint8_t* s, uint32_t len, uint32_t* cp)
+{
+    uint8_t c = s[0];
+    uint16_t n = 0;
+    uint32_t value = 0;
+
+    if ( c < 0x80 )
+    {
+        *cp = c;
+        return 1;
+    }
+    else if ( c >= 0xC2 && c < 0xE0 )
+    {
+        n = 2;
+        value = c & 0x1F;
+    }
+    else if ( c >= 0xE0 && c < 0xF0 )
+    {
+        n = 3;
+        value = c & 0x0F;
+    }
+    else if ( c >= 0xF0 && c < 0xF5 )
+    {
+        n = 4;
+        value = c & 0x07;
+    }
+
+    if ( n == 0 || n > len )
+    {
+        *cp = 0xFFFD;
+        return 1;
+    }
+
+    uint16_t i;
+    for ( i = 1; i < n; ++i )
+    {
+        if ( (s[i] & 0xC0) != 0x80 )
+        {
+            *cp = 0xFFFD;
+            return 1;
+        }
+        value = (value << 6) | (s[i] & 0x3F);
+    }
+
+    *cp = value;
+    return n;
+}
+
+/**
+ * return the symbol of the non-ASCII code point `cp`, see PatternContext.
+ */
+static char getSymbol(PatternContext* pPattern_ctxt, uint32_t cp)
+{
+    uint8_t i;
+    for ( i = 0; i < pPattern_ctxt->symbol_count; ++i )
+    {
+        if ( pPattern_ctxt->code_points[i] == cp )
+            return (char)(i + 1);
+    }
+
+    return (char)OTHER_SYMBOL;
+}
+
+/**
+ * map each character of `text` to a byte, the printable ASCII characters are kept, the others
+ * are mapped to their symbols, see PatternContext.
+ * the mapped text is saved in `mapped`, and if `offsets` is not NULL, the byte offset of
+ * each character is saved in it, followed by `text_len`.
+ * return the length of the mapped text, i.e., the number of characters.
+ */
+static uint32_t mapText(const char* text,
+                        uint32_t text_len,
+                        PatternContext* pPattern_ctxt,
+                        char* mapped,
+                        uint32_t* offsets)
+{
+    const uint8_t* s = (const uint8_t*)text;
+    uint32_t i = 0;
+    uint32_t n = 0;
+    while ( i < text_len )
+    {
+        if ( offsets )
+            offsets[n] = i;
+
+        if ( s[i] >= 0x20 && s[i] < 0x7F )
+        {
+            mapped[n++] = (char)s[i++];
+        }
+        else if ( s[i] < 0x80 )
+        {
+            mapped[n++] = (char)OTHER_SYMBOL;
+            ++i;
+        }
+        else
+        {
+            uint32_t cp = 0;
+            i += decodeUtf8(s + i, text_len - i, &cp);
+            /* smart case, i.e., a lowercase character of the pattern also matches its uppercase */
+            char symbol = getSymbol(pPattern_ctxt, cp);
+            if ( symbol == (char)OTHER_SYMBOL && foldCase(cp) != cp )
+                symbol = getSymbol(pPattern_ctxt, foldCase(cp));
+            mapped[n++] = symbol;
+        }
+    }
+
+    if ( offsets )
+        offsets[n] = text_len;
+
+    return n;
+}
+
+/**
+ * clear the bit of pattern[i] in the mask of `c`.
+ */
+static void setPatternMask(PatternContext* pPattern_ctxt, uint8_t c, uint16_t i)
+{
+    if ( pPattern_ctxt->mask_row[c] < 0 )
+    {
+        pPattern_ctxt->mask_row[c] = (int16_t)pPattern_ctxt->row_count;
+        pPattern_ctxt->row_chars[pPattern_ctxt->row_count] = c;
+        ++pPattern_ctxt->row_count;
+    }
+
+    if ( pPattern_ctxt->long_mask )
+        pPattern_ctxt->long_mask[c * pPattern_ctxt->mask_words + (i >> 6)] &= (int64_t)~(1ULL << (i & 63));
+    else
+        pPattern_ctxt->pattern_mask[c] &= ~(1LL << i);
+}
+
+/**
+ * return the mask of `c` for the pattern from the k-th character on,
+ * i.e., pattern_mask[c] >> k as if pattern_mask[c] were long enough.
+ */
+static int64_t getLongMask(PatternContext* pPattern_ctxt, uint8_t c, uint16_t k)
+{
+    const int64_t* mask = pPattern_ctxt->long_mask + c * pPattern_ctxt->mask_words + (k >> 6);
+    uint16_t shift = k & 63;
+    if ( shift == 0 )
+        return mask[0];
+    else
+        return (int64_t)(((uint64_t)mask[0] >> shift) | ((uint64_t)mask[1] << (64 - shift)));
+}
+
+#define PATTERN_MASK(c) (long_mask ? getLongMask(pPattern_ctxt, (uint8_t)(c), k) : pattern_mask[(uint8_t)(c)] >> k)
+
+#define IN_PATTERN(c) (pPattern_ctxt->mask_row[(uint8_t)(c)] >= 0)
+
+/* whether to evaluate the rest of the pattern after another substring, see MAX_EVALUATIONS */
+#define CAN_EVALUATE() (pText_ctxt->budget > 0 || max_prefix_score == 0)
+
+/* the size of a HighlightGroup that has `n` positions */
+#define HIGHLIGHT_GROUP_SIZE(n) (sizeof(HighlightGroup) + ((n) - 1) * sizeof(HighlightPos))
+
+#if defined(FM_SSE2)
+
+/**
+ * return the mask of the 64 bytes at `block`, bit i is 1 if block[i] is `c1` or `c2`.
+ */
+static uint64_t getCharMask_sse2(const char* block, char c1, char c2)
+{
+    __m128i v1 = _mm_set1_epi8(c1);
+    __m128i v2 = _mm_set1_epi8(c2);
+    uint64_t mask = 0;
+    int i;
+    for ( i = 0; i < 64; i += 16 )
+    {
+        __m128i x = _mm_loadu_si128((const __m128i*)(block + i));
+        __m128i eq = _mm_or_si128(_mm_cmpeq_epi8(x, v1), _mm_cmpeq_epi8(x, v2));
+        mask |= (uint64_t)(uint32_t)_mm_movemask_epi8(eq) << i;
+    }
+
+    return mask;
+}
+
+#if defined(FM_AVX2)
+
+__attribute__((target("avx2")))
+static uint64_t getCharMask_avx2(const char* block, char c1, char c2)
+{
+    __m256i v1 = _mm256_set1_epi8(c1);
+    __m256i v2 = _mm256_set1_epi8(c2);
+    __m256i lo = _mm256_loadu_si256((const __m256i*)block);
+    __m256i hi = _mm256_loadu_si256((const __m256i*)(block + 32));
+    uint32_t lo_mask = (uint32_t)_mm256_movemask_epi8(_mm256_or_si256(_mm256_cmpeq_epi8(lo, v1),
+                                                                      _mm256_cmpeq_epi8(lo, v2)));
+    uint32_t hi_mask = (uint32_t)_mm256_movemask_epi8(_mm256_or_si256(_mm256_cmpeq_epi8(hi, v1),
+                                                                      _mm256_cmpeq_epi8(hi, v2)));
+
+    return ((uint64_t)hi_mask << 32) | lo_mask;
+}
+
+#endif
+
+static uint64_t (*getCharMask)(const char* block, char c1, char c2) = getCharMask_sse2;
+
+#endif
+
+/**
+ * choose the implementation of getCharMask() the CPU supports, it is called in initPattern().
+ */
+static void selectCharMask(void)
+{
+#if defined(FM_AVX2)
+    static int selected = 0;
+    if ( !selected )
+    {
+        if ( __builtin_cpu_supports("avx2") )
+            getCharMask = getCharMask_avx2;
+        selected = 1;
+    }
+#endif
+}
+
+/* the texts whose text masks are not larger than this do not allocate them */
+#define TEXT_MASK_BUFFER_SIZE 256
+
+/**
+ * build the text mask of `text`, i.e., uint64_t text_mask[row_count][col_num], bit i of the row
+ * of c is 1 if text[i] is c, or c is lowercase and text[i] is its uppercase.
+ * only the bits from the first character of the pattern to the last one are kept.
+ * return 0 if `text` does not contain all the characters of the pattern in order.
+ */
+static int buildTextMask(const char* text,
+                         uint32_t text_len,
+                         PatternContext* pPattern_ctxt,
+                         uint64_t* text_mask,
+                         uint32_t col_num)
+{
+    const char* pattern = pPattern_ctxt->pattern;
+    uint16_t pattern_len = pPattern_ctxt->pattern_len;
+    int16_t* mask_row = pPattern_ctxt->mask_row;
+    uint16_t row_count = pPattern_ctxt->row_count;
+    uint32_t col = 0;
+    uint16_t r = 0;
+
+#if defined(FM_SSE2)
+    /* a block of 64 bytes at a time */
+    for ( col = 0; col < col_num; ++col )
+    {
+        const char* block = text + (col << 6);
+        uint32_t len = text_len - (col << 6);
+        uint64_t valid = ~0ULL;
+        char tail[64];
+        if ( len < 64 )
+        {
+            memset(tail, 0, sizeof(tail));
+            memcpy(tail, block, len);
+            block = tail;
+            valid = (1ULL << len) - 1;
+        }
+        for ( r = 0; r < row_count; ++r )
+        {
+            char c = (char)pPattern_ctxt->row_chars[r];
+            text_mask[r * col_num + col] = getCharMask(block, c, (char)pPattern_ctxt->upper_chars[(uint8_t)c]) & valid;
+        }
+    }
+#else
+    uint32_t i;
+    memset(text_mask, 0, (size_t)row_count * col_num * sizeof(uint64_t));
+    for ( i = 0; i < text_len; ++i )
+    {
+        char c = text[i];
+        /* c in pattern */
+        if ( IN_PATTERN(c) )
+            text_mask[mask_row[(uint8_t)c] * col_num + (i >> 6)] |= 1ULL << (i & 63);
+        if ( isupper(c) && IN_PATTERN(tolower(c)) )
+            text_mask[mask_row[(uint8_t)tolower(c)] * col_num + (i >> 6)] |= 1ULL << (i & 63);
+        /* c is the uppercase of a symbol */
+        else if ( c > 0 && (uint8_t)c <= pPattern_ctxt->symbol_count )
+        {
+            uint8_t k;
+            for ( k = 1; k <= pPattern_ctxt->symbol_count; ++k )
+            {
+                if ( k != (uint8_t)c && pPattern_ctxt->upper_chars[k] == (uint8_t)c )
+                    text_mask[mask_row[k] * col_num + (i >> 6)] |= 1ULL << (i & 63);
+            }
+        }
+    }
+#endif
+
+    /* each character of the pattern is searched from the one after the previous */
+    uint32_t first_char_pos = 0;
+    uint32_t pos = 0;
+    uint16_t j;
+    for ( j = 0; j < pattern_len; ++j )
+    {
+        const uint64_t* row = text_mask + mask_row[(uint8_t)pattern[j]] * col_num;
+        uint64_t bits = 0;
+        col = pos >> 6;
+        if ( col < col_num )
+            bits = row[col] & (~0ULL << (pos & 63));
+        while ( bits == 0 && ++col < col_num )
+            bits = row[col];
+        if ( bits == 0 )
+            return 0;
+
+        pos = (col << 6) + FM_CTZ(bits);
+        if ( j == 0 )
+            first_char_pos = pos;
+        ++pos;
+    }
+
+    const uint64_t* last_row = text_mask + mask_row[(uint8_t)pattern[pattern_len - 1]] * col_num;
+    for ( col = col_num - 1; last_row[col] == 0; --col )
+        ;
+    uint32_t last_char_pos = (col << 6) + FM_BIT_LENGTH(last_row[col]) - 1;
+
+    uint32_t first_col = first_char_pos >> 6;
+    uint32_t last_col = last_char_pos >> 6;
+    for ( r = 0; r < row_count; ++r )
+    {
+        uint64_t* row = text_mask + r * col_num;
+        for ( col = 0; col < first_col; ++col )
+            row[col] = 0;
+        row[first_col] &= ~0ULL << (first_char_pos & 63);
+        row[last_col] &= ~0ULL >> (63 - (last_char_pos & 63));
+        for ( col = last_col + 1; col < col_num; ++col )
+            row[col] = 0;
+    }
+
+    return 1;
+}
+
 PatternContext* initPattern(const char* pattern, uint16_t pattern_len)
 {
-    PatternContext* pPattern_ctxt = (PatternContext*)malloc(sizeof(PatternContext));
+    /* the masks of a long pattern follow the pattern, see PatternContext */
+    size_t mask_offset = (sizeof(PatternContext) + pattern_len + 7) & ~(size_t)7;
+    uint16_t mask_words = pattern_len < 64 ? 0 : ((pattern_len + 63) >> 6) + 1;
+    PatternContext* pPattern_ctxt = (PatternContext*)malloc(mask_offset + ((size_t)mask_words << 8) * sizeof(int64_t));
     if ( !pPattern_ctxt )
     {
         fprintf(stderr, "Out of memory in initPattern()!\n");
         return NULL;
     }
-    pPattern_ctxt->actual_pattern_len = pattern_len;
-    if ( pattern_len >= 64 )
+
+    /* the pattern is copied, if it is not ASCII, it is mapped as the texts will be */
+    const uint8_t* s = (const uint8_t*)pattern;
+    char* symbols = pPattern_ctxt->symbols;
+    uint16_t n = 0;
+    uint16_t i = 0;
+    pPattern_ctxt->symbol_count = 0;
+    while ( i < pattern_len && s[i] < 0x80 )
+        ++i;
+    if ( i == pattern_len )
     {
-        pattern_len = 63;
+        memcpy(symbols, pattern, pattern_len);
+        n = pattern_len;
+    }
+    i = n;
+    while ( i < pattern_len )
+    {
+        if ( s[i] >= 0x20 && s[i] < 0x7F )
+        {
+            symbols[n++] = (char)s[i++];
+        }
+        else if ( s[i] < 0x80 )
+        {
+            symbols[n++] = (char)OTHER_SYMBOL;
+            ++i;
+        }
+        else
+        {
+            uint32_t cp = 0;
+            i += decodeUtf8(s + i, pattern_len - i, &cp);
+            char symbol = getSymbol(pPattern_ctxt, cp);
+            if ( symbol == (char)OTHER_SYMBOL )
+            {
+                /* the rest would match any character that is not a symbol */
+                if ( pPattern_ctxt->symbol_count == MAX_SYMBOL_COUNT )
+                {
+                    free(pPattern_ctxt);
+                    fprintf(stderr, "More than %d non-ASCII characters in initPattern()!\n", MAX_SYMBOL_COUNT);
+                    return NULL;
+                }
+                pPattern_ctxt->code_points[pPattern_ctxt->symbol_count] = cp;
+                ++pPattern_ctxt->symbol_count;
+                symbol = (char)pPattern_ctxt->symbol_count;
+            }
+            symbols[n++] = symbol;
+        }
     }
+    symbols[n] = '\0';
+    pattern = symbols;
+    pattern_len = n;
+
     pPattern_ctxt->pattern = pattern;
     pPattern_ctxt->pattern_len = pattern_len;
+    pPattern_ctxt->long_mask = NULL;
+    pPattern_ctxt->mask_words = 1;
+    pPattern_ctxt->row_count = 0;
     memset(pPattern_ctxt->pattern_mask, -1, sizeof(pPattern_ctxt->pattern_mask));
+    memset(pPattern_ctxt->mask_row, -1, sizeof(pPattern_ctxt->mask_row));
+    if ( pattern_len >= 64 )
+    {
+        pPattern_ctxt->long_mask = (int64_t*)((char*)pPattern_ctxt + mask_offset);
+        pPattern_ctxt->mask_words = ((pattern_len + 63) >> 6) + 1;
+        memset(pPattern_ctxt->long_mask, -1, (pPattern_ctxt->mask_words << 8) * sizeof(int64_t));
+    }
 
-    uint16_t i;
     for ( i = 0; i < pattern_len; ++i )
     {
-        pPattern_ctxt->pattern_mask[(uint8_t)pattern[i]] ^= (1LL << i);
-        if ( islower(pattern[i]) && pPattern_ctxt->pattern_mask[(uint8_t)toupper(pattern[i])] != -1 )
+        setPatternMask(pPattern_ctxt, (uint8_t)pattern[i], i);
+        if ( islower(pattern[i]) && pPattern_ctxt->mask_row[(uint8_t)toupper(pattern[i])] >= 0 )
+        {
+            setPatternMask(pPattern_ctxt, (uint8_t)toupper(pattern[i]), i);
+        }
+        else if ( (uint8_t)pattern[i] <= pPattern_ctxt->symbol_count && pattern[i] > 0 )
+        {
+            /* the same for the symbols, the uppercase ones seen so far */
+            uint32_t cp = pPattern_ctxt->code_points[pattern[i] - 1];
+            uint8_t j;
+            for ( j = 0; j < pPattern_ctxt->symbol_count; ++j )
+            {
+                uint32_t upper_cp = pPattern_ctxt->code_points[j];
+                if ( upper_cp != cp && foldCase(upper_cp) == cp && pPattern_ctxt->mask_row[j + 1] >= 0 )
+                    setPatternMask(pPattern_ctxt, j + 1, i);
+            }
+        }
+    }
+
+    for ( i = 0; i < 256; ++i )
+        pPattern_ctxt->upper_chars[i] = islower(i) ? (uint8_t)toupper(i) : (uint8_t)i;
+    for ( i = 0; i < pPattern_ctxt->symbol_count; ++i )
+    {
+        uint8_t j;
+        for ( j = 0; j < pPattern_ctxt->symbol_count; ++j )
         {
-            pPattern_ctxt->pattern_mask[(uint8_t)toupper(pattern[i])] ^= (1LL << i);
+            uint32_t upper_cp = pPattern_ctxt->code_points[j];
+            if ( j != i && foldCase(upper_cp) == pPattern_ctxt->code_points[i] )
+            {
+                pPattern_ctxt->upper_chars[i + 1] = j + 1;
+                break;
+            }
         }
     }
+
     pPattern_ctxt->is_lower = 1;
+    selectCharMask();
 
     for ( i = 0; i < pattern_len; ++i )
     {
@@ -196,6 +702,14 @@ PatternContext* initPattern(const char* pattern, uint16_t pattern_len)
             break;
         }
     }
+    for ( i = 0; i < pPattern_ctxt->symbol_count; ++i )
+    {
+        if ( foldCase(pPattern_ctxt->code_points[i]) != pPattern_ctxt->code_points[i] )
+        {
+            pPattern_ctxt->is_lower = 0;
+            break;
+        }
+    }
 
     return pPattern_ctxt;
 }
@@ -206,18 +720,18 @@ ValueElements* evaluate_nameOnly(TextContext* pText_ctxt,
                                  ValueElements val[])
 {
     uint64_t* text_mask = pText_ctxt->text_mask;
-    uint16_t col_num = pText_ctxt->col_num;
-    uint16_t j = pText_ctxt->offset;
+    uint32_t col_num = pText_ctxt->col_num;
+    uint32_t j = pText_ctxt->offset;
 
     const char* pattern = pPattern_ctxt->pattern;
-    uint16_t base_offset = pattern[k] * col_num;
+    uint32_t base_offset = pPattern_ctxt->mask_row[(uint8_t)pattern[k]] * col_num;
     uint64_t x = text_mask[base_offset + (j >> 6)] >> (j & 63);
-    uint16_t i = 0;
+    uint32_t i = 0;
 
     if ( x == 0 )
     {
         uint64_t bits = 0;
-        uint16_t col = 0;
+        uint32_t col = 0;
         for ( col = (j >> 6) + 1; col < col_num; ++col )
         {
             if ( (bits = text_mask[base_offset + col]) != 0 )
@@ -245,16 +759,17 @@ ValueElements* evaluate_nameOnly(TextContext* pText_ctxt,
     if ( j > 0 && val[k].beg >= j )
         return val + k;
 
-    uint16_t beg = 0;
-    uint16_t end = 0;
+    uint32_t beg = 0;
+    uint32_t end = 0;
 
     uint16_t max_prefix_score = 0;
     float max_score = MIN_WEIGHT;
 
     const char* text = pText_ctxt->text;
-    uint16_t text_len = pText_ctxt->text_len;
+    uint32_t text_len = pText_ctxt->text_len;
     uint16_t pattern_len = pPattern_ctxt->pattern_len - k;
     int64_t* pattern_mask = pPattern_ctxt->pattern_mask;
+    int64_t* long_mask = pPattern_ctxt->long_mask;
 
     uint16_t special = 0;
     if ( i == 0 )
@@ -277,24 +792,24 @@ ValueElements* evaluate_nameOnly(TextContext* pText_ctxt,
         last = d;
         char c = text[i];
         /* c in pattern */
-        if ( pattern_mask[(uint8_t)c] != -1 )
-            d = (d << 1) | (pattern_mask[(uint8_t)c] >> k);
+        if ( IN_PATTERN(c) )
+            d = (d << 1) | PATTERN_MASK(c);
         /**
          * text = 'xxABC', pattern = 'abc'; text[i] == 'B'
          * text = 'xxABC', pattern = 'abc'; text[i] == 'C'
          * NOT text = 'xxABCd', pattern = 'abc'; text[i] == 'C'
          * 'Cd' is considered as a word
          */
-        else if ( isupper(text[i-1]) && pattern_mask[(uint8_t)tolower(c)] != -1
+        else if ( isupper(text[i-1]) && IN_PATTERN(tolower(c))
                   && (i+1 == text_len || !islower(text[i+1])) )
-            d = (d << 1) | (pattern_mask[(uint8_t)tolower(c)] >> k);
+            d = (d << 1) | PATTERN_MASK(tolower(c));
         else
             d = ~0;
 
         if ( d >= last )
         {
             float score = MIN_WEIGHT;
-            uint16_t end_pos = 0;
+            uint32_t end_pos = 0;
             uint16_t n = FM_BIT_LENGTH(~last);
             /* e.g., text = '~~abcd~~~~', pattern = 'abcd' */
             if ( n == pattern_len )
@@ -313,8 +828,10 @@ ValueElements* evaluate_nameOnly(TextContext* pText_ctxt,
             else
             {
                 uint16_t prefix_score = special > 0 ? (n > 1 ? valTable[n+1] : valTable[n]) + special : valTable[n];
-                if ( prefix_score > max_prefix_score )
+                if ( prefix_score > max_prefix_score && CAN_EVALUATE() )
                 {
+                    if ( pText_ctxt->budget > 0 )
+                        --pText_ctxt->budget;
                     max_prefix_score = prefix_score;
                     pText_ctxt->offset = i;
                     ValueElements* pVal = evaluate_nameOnly(pText_ctxt, pPattern_ctxt, k + n, val);
@@ -347,7 +864,7 @@ ValueElements* evaluate_nameOnly(TextContext* pText_ctxt,
             if ( x == 0 )
             {
                 uint64_t bits = 0;
-                uint16_t col = 0;
+                uint32_t col = 0;
                 for ( col = (i >> 6) + 1; col < col_num; ++col )
                 {
                     if ( (bits = text_mask[base_offset + col]) != 0 )
@@ -383,7 +900,8 @@ ValueElements* evaluate_nameOnly(TextContext* pText_ctxt,
     /* e.g., text = '~~~~abcd', pattern = 'abcd' */
     if ( i == text_len )
     {
-        if ( ~d >> (pattern_len - 1) )
+        /* a pattern longer than 64 characters can not be matched in a row */
+        if ( pattern_len <= 64 && ~d >> (pattern_len - 1) )
         {
             float score = (float)(special > 0 ? (pattern_len > 1 ? valTable[pattern_len + 1] : valTable[pattern_len]) + special
                             : valTable[pattern_len]);
@@ -409,18 +927,18 @@ ValueElements* evaluate(TextContext* pText_ctxt,
                         ValueElements val[])
 {
     uint64_t* text_mask = pText_ctxt->text_mask;
-    uint16_t col_num = pText_ctxt->col_num;
-    uint16_t j = pText_ctxt->offset;
+    uint32_t col_num = pText_ctxt->col_num;
+    uint32_t j = pText_ctxt->offset;
 
     const char* pattern = pPattern_ctxt->pattern;
-    uint16_t base_offset = pattern[k] * col_num;
+    uint32_t base_offset = pPattern_ctxt->mask_row[(uint8_t)pattern[k]] * col_num;
     uint64_t x = text_mask[base_offset + (j >> 6)] >> (j & 63);
-    uint16_t i = 0;
+    uint32_t i = 0;
 
     if ( x == 0 )
     {
         uint64_t bits = 0;
-        uint16_t col = 0;
+        uint32_t col = 0;
         for ( col = (j >> 6) + 1; col < col_num; ++col )
         {
             if ( (bits = text_mask[base_offset + col]) != 0 )
@@ -447,16 +965,17 @@ ValueElements* evaluate(TextContext* pText_ctxt,
     if ( j > 0 && val[k].beg >= j )
         return val + k;
 
-    uint16_t beg = 0;
-    uint16_t end = 0;
+    uint32_t beg = 0;
+    uint32_t end = 0;
 
     uint16_t max_prefix_score = 0;
     float max_score = MIN_WEIGHT;
 
     const char* text = pText_ctxt->text;
-    uint16_t text_len = pText_ctxt->text_len;
+    uint32_t text_len = pText_ctxt->text_len;
     uint16_t pattern_len = pPattern_ctxt->pattern_len - k;
     int64_t* pattern_mask = pPattern_ctxt->pattern_mask;
+    int64_t* long_mask = pPattern_ctxt->long_mask;
 
     uint16_t special = 0;
     if ( i == 0 )
@@ -485,25 +1004,25 @@ ValueElements* evaluate(TextContext* pText_ctxt,
         last = d;
         char c = text[i];
         /* c in pattern */
-        if ( pattern_mask[(uint8_t)c] != -1 )
-            d = (d << 1) | (pattern_mask[(uint8_t)c] >> k);
+        if ( IN_PATTERN(c) )
+            d = (d << 1) | PATTERN_MASK(c);
         /**
          * text = 'xxABC', pattern = 'abc'; text[i] == 'B'
          * text = 'xxABC', pattern = 'abc'; text[i] == 'C'
          * NOT text = 'xxABCd', pattern = 'abc'; text[i] == 'C'
          * 'Cd' is considered as a word
          */
-        /* else if ( isupper(text[i-1]) && pattern_mask[(uint8_t)tolower(c)] != -1 */
+        /* else if ( isupper(text[i-1]) && IN_PATTERN(tolower(c)) */
         /*           && (i+1 == text_len || !islower(text[i+1])) )                 */
-        else if ( pattern_mask[(uint8_t)tolower(c)] != -1 )
-            d = (d << 1) | (pattern_mask[(uint8_t)tolower(c)] >> k);
+        else if ( IN_PATTERN(tolower(c)) )
+            d = (d << 1) | PATTERN_MASK(tolower(c));
         else
             d = ~0;
 
         if ( d >= last )
         {
             float score = MIN_WEIGHT;
-            uint16_t end_pos = 0;
+            uint32_t end_pos = 0;
             uint16_t n = FM_BIT_LENGTH(~last);
             /* e.g., text = '~~abcd~~~~', pattern = 'abcd' */
             if ( n == pattern_len )
@@ -526,9 +1045,11 @@ ValueElements* evaluate(TextContext* pText_ctxt,
                  * e.g., text = 'AbcxxAbcyyde', pattern = 'abcde'
                  * prefer matching 'Abcyyde'
                  */
-                if ( prefix_score > max_prefix_score
-                     || (special > 0 && prefix_score == max_prefix_score) )
+                if ( (prefix_score > max_prefix_score
+                      || (special > 0 && prefix_score == max_prefix_score)) && CAN_EVALUATE() )
                 {
+                    if ( pText_ctxt->budget > 0 )
+                        --pText_ctxt->budget;
                     max_prefix_score = prefix_score;
                     pText_ctxt->offset = i;
                     ValueElements* pVal = evaluate(pText_ctxt, pPattern_ctxt, k + n, val);
@@ -566,7 +1087,7 @@ ValueElements* evaluate(TextContext* pText_ctxt,
             if ( x == 0 )
             {
                 uint64_t bits = 0;
-                uint16_t col = 0;
+                uint32_t col = 0;
                 for ( col = (i >> 6) + 1; col < col_num; ++col )
                 {
                     if ( (bits = text_mask[base_offset + col]) != 0 )
@@ -608,7 +1129,8 @@ ValueElements* evaluate(TextContext* pText_ctxt,
     /* e.g., text = '~~~~abcd', pattern = 'abcd' */
     if ( i == text_len )
     {
-        if ( ~d >> (pattern_len - 1) )
+        /* a pattern longer than 64 characters can not be matched in a row */
+        if ( pattern_len <= 64 && ~d >> (pattern_len - 1) )
         {
             float score = (float)(special > 0 ? (pattern_len > 1 ? valTable[pattern_len + 1] : valTable[pattern_len]) + special
                             : valTable[pattern_len]);
@@ -628,35 +1150,23 @@ ValueElements* evaluate(TextContext* pText_ctxt,
     return val + k;
 }
 
-float getWeight(const char* text, uint16_t text_len,
-                PatternContext* pPattern_ctxt,
-                uint8_t is_name_only)
+static float getByteWeight(const char* text, uint32_t text_len,
+                           PatternContext* pPattern_ctxt,
+                           uint8_t is_name_only)
 {
-    if ( !text || !pPattern_ctxt )
-        return MIN_WEIGHT;
-
-    uint16_t j = 0;
-    uint16_t col_num = 0;
+    uint32_t col_num = 0;
     uint64_t* text_mask = NULL;
     const char* pattern = pPattern_ctxt->pattern;
     uint16_t pattern_len = pPattern_ctxt->pattern_len;
-    int64_t* pattern_mask = pPattern_ctxt->pattern_mask;
     char first_char = pattern[0];
-    char last_char = pattern[pattern_len - 1];
-
-    /* maximum number of int16_t is (1 << 15) - 1 */
-    if ( text_len >= (1 << 15) )
-    {
-        text_len = (1 << 15) - 1;
-    }
 
     if ( pattern_len == 1 )
     {
         if ( isupper(first_char) )
         {
-            int16_t first_char_pos = -1;
-            int16_t i;
-            for ( i = 0; i < text_len; ++i )
+            int32_t first_char_pos = -1;
+            int32_t i;
+            for ( i = 0; i < (int32_t)text_len; ++i )
             {
                 if ( text[i] == first_char )
                 {
@@ -671,9 +1181,9 @@ float getWeight(const char* text, uint16_t text_len,
         }
         else
         {
-            int16_t first_char_pos = -1;
-            int16_t i;
-            for ( i = 0; i < text_len; ++i )
+            int32_t first_char_pos = -1;
+            int32_t i;
+            for ( i = 0; i < (int32_t)text_len; ++i )
             {
                 if ( tolower(text[i]) == first_char )
                 {
@@ -691,176 +1201,22 @@ float getWeight(const char* text, uint16_t text_len,
         }
     }
 
-    int16_t first_char_pos = -1;
-    if ( pPattern_ctxt->is_lower )
-    {
-        int16_t i;
-        for ( i = 0; i < text_len; ++i )
-        {
-            if ( tolower(text[i]) == first_char )
-            {
-                first_char_pos = i;
-                break;
-            }
-        }
-        if ( first_char_pos == -1 )
-            return MIN_WEIGHT;
-
-        int16_t last_char_pos = -1;
-        for ( i = text_len - 1; i >= first_char_pos; --i )
-        {
-            if ( tolower(text[i]) == last_char )
-            {
-                last_char_pos = i;
-                break;
-            }
-        }
-        if ( last_char_pos == -1 )
-            return MIN_WEIGHT;
-
-        col_num = (text_len + 63) >> 6;     /* (text_len + 63)/64 */
-        /* uint64_t text_mask[256][col_num] */
-        text_mask = (uint64_t*)calloc(col_num << 8, sizeof(uint64_t));
-        if ( !text_mask )
-        {
-            fprintf(stderr, "Out of memory in getWeight()!\n");
-            return MIN_WEIGHT;
-        }
-        char c;
-        for ( i = first_char_pos; i <= last_char_pos; ++i )
-        {
-            c = tolower(text[i]);
-            /* c in pattern */
-            if ( pattern_mask[(uint8_t)c] != -1 )
-            {
-                text_mask[(uint8_t)c * col_num + (i >> 6)] |= 1ULL << (i & 63);
-                if ( j < pattern_len && c == pattern[j] )
-                    ++j;
-            }
-        }
-    }
-    else
-    {
-        if ( isupper(first_char) )
-        {
-            int16_t i;
-            for ( i = 0; i < text_len; ++i )
-            {
-                if ( text[i] == first_char )
-                {
-                    first_char_pos = i;
-                    break;
-                }
-            }
-        }
-        else
-        {
-            int16_t i;
-            for ( i = 0; i < text_len; ++i )
-            {
-                if ( tolower(text[i]) == first_char )
-                {
-                    first_char_pos = i;
-                    break;
-                }
-            }
-        }
-        if ( first_char_pos == -1 )
-            return MIN_WEIGHT;
-
-        int16_t last_char_pos = -1;
-        if ( isupper(last_char) )
-        {
-            int16_t i;
-            for ( i = text_len - 1; i >= first_char_pos; --i )
-            {
-                if ( text[i] == last_char )
-                {
-                    last_char_pos = i;
-                    break;
-                }
-            }
-        }
-        else
-        {
-            int16_t i;
-            for ( i = text_len - 1; i >= first_char_pos; --i )
-            {
-                if ( tolower(text[i]) == last_char )
-                {
-                    last_char_pos = i;
-                    break;
-                }
-            }
-        }
-        if ( last_char_pos == -1 )
-            return MIN_WEIGHT;
-
-        col_num = (text_len + 63) >> 6;
-        /* uint64_t text_mask[256][col_num] */
-        text_mask = (uint64_t*)calloc(col_num << 8, sizeof(uint64_t));
-        if ( !text_mask )
-        {
-            fprintf(stderr, "Out of memory in getWeight()!\n");
-            return MIN_WEIGHT;
-        }
-        char c;
-        int16_t i;
-        for ( i = first_char_pos; i <= last_char_pos; ++i )
-        {
-            c = text[i];
-            if ( isupper(c) )
-            {
-                /* c in pattern */
-                if ( pattern_mask[(uint8_t)c] != -1 )
-                    text_mask[(uint8_t)c * col_num + (i >> 6)] |= 1ULL << (i & 63);
-                if ( pattern_mask[(uint8_t)tolower(c)] != -1 )
-                    text_mask[(uint8_t)tolower(c) * col_num + (i >> 6)] |= 1ULL << (i & 63);
-                if ( j < pattern_len && c == toupper(pattern[j]) )
-                    ++j;
-            }
-            else
-            {
-                /* c in pattern */
-                if ( pattern_mask[(uint8_t)c] != -1 )
-                {
-                    text_mask[(uint8_t)c * col_num + (i >> 6)] |= 1ULL << (i & 63);
-                    if ( j < pattern_len && c == pattern[j] )
-                        ++j;
-                }
-            }
-        }
-    }
-
-    if ( j < pattern_len )
+    col_num = (text_len + 63) >> 6;     /* (text_len + 63)/64 */
+    /* uint64_t text_mask[row_count][col_num] */
+    uint64_t mask_buffer[TEXT_MASK_BUFFER_SIZE];
+    size_t mask_size = (size_t)pPattern_ctxt->row_count * col_num;
+    text_mask = mask_size <= TEXT_MASK_BUFFER_SIZE ? mask_buffer : (uint64_t*)malloc(mask_size * sizeof(uint64_t));
+    if ( !text_mask )
     {
-        free(text_mask);
+        fprintf(stderr, "Out of memory in getWeight()!\n");
         return MIN_WEIGHT;
     }
 
-    if ( pPattern_ctxt->actual_pattern_len >= 64 )
+    if ( !buildTextMask(text, text_len, pPattern_ctxt, text_mask, col_num) )
     {
-        int16_t i;
-        j = 0;
-        for ( i = first_char_pos; i < text_len; ++i )
-        {
-            if ( j < pPattern_ctxt->actual_pattern_len )
-            {
-                if ( (pPattern_ctxt->is_lower && tolower(text[i]) == pattern[j])
-                     || text[i] == pattern[j] )
-                {
-                    ++j;
-                }
-            }
-            else
-                break;
-        }
-
-        if ( j < pPattern_ctxt->actual_pattern_len )
-        {
+        if ( text_mask != mask_buffer )
             free(text_mask);
-            return MIN_WEIGHT;
-        }
+        return MIN_WEIGHT;
     }
 
     TextContext text_ctxt;
@@ -869,30 +1225,48 @@ float getWeight(const char* text, uint16_t text_len,
     text_ctxt.text_mask = text_mask;
     text_ctxt.col_num = col_num;
     text_ctxt.offset = 0;
+    text_ctxt.budget = pPattern_ctxt->long_mask ? MAX_EVALUATIONS : (uint32_t)-1;
+
+    ValueElements val_buffer[64];
+    ValueElements* val = val_buffer;
+    if ( pattern_len > 64 )
+    {
+        val = (ValueElements*)malloc(pattern_len * sizeof(ValueElements));
+        if ( !val )
+        {
+            fprintf(stderr, "Out of memory in getWeight()!\n");
+            if ( text_mask != mask_buffer )
+                free(text_mask);
+            return MIN_WEIGHT;
+        }
+    }
+    memset(val, 0, pattern_len * sizeof(ValueElements));
 
-    ValueElements val[64];
-    memset(val, 0, sizeof(val));
+    float weight = MIN_WEIGHT;
     if ( is_name_only )
     {
         ValueElements* pVal = evaluate_nameOnly(&text_ctxt, pPattern_ctxt, 0, val);
         float score = pVal->score;
-        uint16_t beg = pVal->beg;
-        uint16_t end = pVal->end;
-
-        free(text_mask);
+        uint32_t beg = pVal->beg;
+        uint32_t end = pVal->end;
 
-        return score + (1 >> beg) + 1.0f/(beg + end) + 1.0f/text_len;
+        weight = score + (1 >> beg) + 1.0f/(beg + end) + 1.0f/text_len;
     }
     else
     {
         ValueElements* pVal = evaluate(&text_ctxt, pPattern_ctxt, 0, val);
         float score = pVal->score;
-        uint16_t beg = pVal->beg;
+        uint32_t beg = pVal->beg;
 
+        weight = score + (float)pattern_len/text_len + (float)(pattern_len << 1)/(text_len - beg);
+    }
+
+    if ( text_mask != mask_buffer )
         free(text_mask);
+    if ( val != val_buffer )
+        free(val);
 
-        return score + (float)pattern_len/text_len + (float)(pattern_len << 1)/(text_len - beg);
-    }
+    return weight;
 }
 
 
@@ -901,23 +1275,23 @@ HighlightGroup* evaluateHighlights_nameOnly(TextContext* pText_ctxt,
                                             uint16_t k,
                                             HighlightGroup* groups[])
 {
-    uint16_t j = pText_ctxt->offset;
+    uint32_t j = pText_ctxt->offset;
 
     if ( groups[k] && groups[k]->beg >= j )
         return groups[k];
 
     uint64_t* text_mask = pText_ctxt->text_mask;
-    uint16_t col_num = pText_ctxt->col_num;
+    uint32_t col_num = pText_ctxt->col_num;
 
     const char* pattern = pPattern_ctxt->pattern;
-    uint16_t base_offset = pattern[k] * col_num;
+    uint32_t base_offset = pPattern_ctxt->mask_row[(uint8_t)pattern[k]] * col_num;
     uint64_t x = text_mask[base_offset + (j >> 6)] >> (j & 63);
-    uint16_t i = 0;
+    uint32_t i = 0;
 
     if ( x == 0 )
     {
         uint64_t bits = 0;
-        uint16_t col = 0;
+        uint32_t col = 0;
         for ( col = (j >> 6) + 1; col < col_num; ++col )
         {
             if ( (bits = text_mask[base_offset + col]) != 0 )
@@ -940,9 +1314,10 @@ HighlightGroup* evaluateHighlights_nameOnly(TextContext* pText_ctxt,
     uint16_t max_prefix_score = 0;
     float max_score = MIN_WEIGHT;
 
+    size_t group_size = HIGHLIGHT_GROUP_SIZE(pPattern_ctxt->pattern_len - k);
     if ( !groups[k] )
     {
-        groups[k] = (HighlightGroup*)calloc(1, sizeof(HighlightGroup));
+        groups[k] = (HighlightGroup*)calloc(1, group_size);
         if ( !groups[k] )
         {
             fprintf(stderr, "Out of memory in evaluateHighlights_nameOnly()!\n");
@@ -951,16 +1326,21 @@ HighlightGroup* evaluateHighlights_nameOnly(TextContext* pText_ctxt,
     }
     else
     {
-        memset(groups[k], 0, sizeof(HighlightGroup));
+        memset(groups[k], 0, group_size);
     }
 
-    HighlightGroup cur_highlights;
-    memset(&cur_highlights, 0, sizeof(HighlightGroup));
+    HighlightGroup* cur_highlights = (HighlightGroup*)calloc(1, group_size);
+    if ( !cur_highlights )
+    {
+        fprintf(stderr, "Out of memory in evaluateHighlights_nameOnly()!\n");
+        return NULL;
+    }
 
     const char* text = pText_ctxt->text;
-    uint16_t text_len = pText_ctxt->text_len;
+    uint32_t text_len = pText_ctxt->text_len;
     uint16_t pattern_len = pPattern_ctxt->pattern_len - k;
     int64_t* pattern_mask = pPattern_ctxt->pattern_mask;
+    int64_t* long_mask = pPattern_ctxt->long_mask;
 
     uint16_t special = 0;
     if ( i == 0 )
@@ -983,17 +1363,17 @@ HighlightGroup* evaluateHighlights_nameOnly(TextContext* pText_ctxt,
         last = d;
         char c = text[i];
         /* c in pattern */
-        if ( pattern_mask[(uint8_t)c] != -1 )
-            d = (d << 1) | (pattern_mask[(uint8_t)c] >> k);
+        if ( IN_PATTERN(c) )
+            d = (d << 1) | PATTERN_MASK(c);
         /**
          * text = 'xxABC', pattern = 'abc'; text[i] == 'B'
          * text = 'xxABC', pattern = 'abc'; text[i] == 'C'
          * NOT text = 'xxABCd', pattern = 'abc'; text[i] == 'C'
          * 'Cd' is considered as a word
          */
-        else if ( isupper(text[i-1]) && pattern_mask[(uint8_t)tolower(c)] != -1
+        else if ( isupper(text[i-1]) && IN_PATTERN(tolower(c))
                   && (i+1 == text_len || !islower(text[i+1])) )
-            d = (d << 1) | (pattern_mask[(uint8_t)tolower(c)] >> k);
+            d = (d << 1) | PATTERN_MASK(tolower(c));
         else
             d = ~0;
 
@@ -1005,23 +1385,26 @@ HighlightGroup* evaluateHighlights_nameOnly(TextContext* pText_ctxt,
             if ( n == pattern_len )
             {
                 score = (float)(special > 0 ? (n > 1 ? valTable[n+1] : valTable[n]) + special : valTable[n]);
-                cur_highlights.score = score;
-                cur_highlights.beg = i - n;
-                cur_highlights.end = i;
-                cur_highlights.end_index = 1;
-                cur_highlights.positions[0].col = i - n + 1;
-                cur_highlights.positions[0].len = n;
+                cur_highlights->score = score;
+                cur_highlights->beg = i - n;
+                cur_highlights->end = i;
+                cur_highlights->end_index = 1;
+                cur_highlights->positions[0].col = i - n + 1;
+                cur_highlights->positions[0].len = n;
                 if ( special > 0 )
                 {
-                    memcpy(groups[k], &cur_highlights, sizeof(HighlightGroup));
+                    memcpy(groups[k], cur_highlights, group_size);
+                    free(cur_highlights);
                     return groups[k];
                 }
             }
             else
             {
                 uint16_t prefix_score = special > 0 ? (n > 1 ? valTable[n+1] : valTable[n]) + special : valTable[n];
-                if ( prefix_score > max_prefix_score )
+                if ( prefix_score > max_prefix_score && CAN_EVALUATE() )
                 {
+                    if ( pText_ctxt->budget > 0 )
+                        --pText_ctxt->budget;
                     max_prefix_score = prefix_score;
                     pText_ctxt->offset = i;
                     HighlightGroup* pGroup = evaluateHighlights_nameOnly(pText_ctxt, pPattern_ctxt, k + n, groups);
@@ -1030,13 +1413,13 @@ HighlightGroup* evaluateHighlights_nameOnly(TextContext* pText_ctxt,
                         if ( pGroup->end )
                         {
                             score = prefix_score + pGroup->score - 0.2f * (pGroup->beg - i);
-                            cur_highlights.score = score;
-                            cur_highlights.beg = i - n;
-                            cur_highlights.end = pGroup->end;
-                            cur_highlights.positions[0].col = i - n + 1;
-                            cur_highlights.positions[0].len = n;
-                            memcpy(cur_highlights.positions + 1, pGroup->positions, pGroup->end_index * sizeof(HighlightPos));
-                            cur_highlights.end_index = pGroup->end_index + 1;
+                            cur_highlights->score = score;
+                            cur_highlights->beg = i - n;
+                            cur_highlights->end = pGroup->end;
+                            cur_highlights->positions[0].col = i - n + 1;
+                            cur_highlights->positions[0].len = n;
+                            memcpy(cur_highlights->positions + 1, pGroup->positions, pGroup->end_index * sizeof(HighlightPos));
+                            cur_highlights->end_index = pGroup->end_index + 1;
                         }
                     }
                 }
@@ -1044,7 +1427,7 @@ HighlightGroup* evaluateHighlights_nameOnly(TextContext* pText_ctxt,
             if ( score > max_score )
             {
                 max_score = score;
-                memcpy(groups[k], &cur_highlights, sizeof(HighlightGroup));
+                memcpy(groups[k], cur_highlights, group_size);
             }
             /* e.g., text = '~_ababc~~~~', pattern = 'abc' */
             special = 0;
@@ -1062,7 +1445,7 @@ HighlightGroup* evaluateHighlights_nameOnly(TextContext* pText_ctxt,
             if ( x == 0 )
             {
                 uint64_t bits = 0;
-                uint16_t col = 0;
+                uint32_t col = 0;
                 for ( col = (i >> 6) + 1; col < col_num; ++col )
                 {
                     if ( (bits = text_mask[base_offset + col]) != 0 )
@@ -1098,7 +1481,8 @@ HighlightGroup* evaluateHighlights_nameOnly(TextContext* pText_ctxt,
     /* e.g., text = '~~~~abcd', pattern = 'abcd' */
     if ( i == text_len )
     {
-        if ( ~d >> (pattern_len - 1) )
+        /* a pattern longer than 64 characters can not be matched in a row */
+        if ( pattern_len <= 64 && ~d >> (pattern_len - 1) )
         {
             float score = (float)(special > 0 ? (pattern_len > 1 ? valTable[pattern_len + 1] : valTable[pattern_len]) + special
                             : valTable[pattern_len]);
@@ -1114,6 +1498,8 @@ HighlightGroup* evaluateHighlights_nameOnly(TextContext* pText_ctxt,
         }
     }
 
+    free(cur_highlights);
+
     return groups[k];
 }
 
@@ -1123,23 +1509,23 @@ HighlightGroup* evaluateHighlights(TextContext* pText_ctxt,
                                    uint16_t k,
                                    HighlightGroup* groups[])
 {
-    uint16_t j = pText_ctxt->offset;
+    uint32_t j = pText_ctxt->offset;
 
     if ( groups[k] && groups[k]->beg >= j )
         return groups[k];
 
     uint64_t* text_mask = pText_ctxt->text_mask;
-    uint16_t col_num = pText_ctxt->col_num;
+    uint32_t col_num = pText_ctxt->col_num;
 
     const char* pattern = pPattern_ctxt->pattern;
-    uint16_t base_offset = pattern[k] * col_num;
+    uint32_t base_offset = pPattern_ctxt->mask_row[(uint8_t)pattern[k]] * col_num;
     uint64_t x = text_mask[base_offset + (j >> 6)] >> (j & 63);
-    uint16_t i = 0;
+    uint32_t i = 0;
 
     if ( x == 0 )
     {
         uint64_t bits = 0;
-        uint16_t col = 0;
+        uint32_t col = 0;
         for ( col = (j >> 6) + 1; col < col_num; ++col )
         {
             if ( (bits = text_mask[base_offset + col]) != 0 )
@@ -1162,9 +1548,10 @@ HighlightGroup* evaluateHighlights(TextContext* pText_ctxt,
     uint16_t max_prefix_score = 0;
     float max_score = MIN_WEIGHT;
 
+    size_t group_size = HIGHLIGHT_GROUP_SIZE(pPattern_ctxt->pattern_len - k);
     if ( !groups[k] )
     {
-        groups[k] = (HighlightGroup*)calloc(1, sizeof(HighlightGroup));
+        groups[k] = (HighlightGroup*)calloc(1, group_size);
         if ( !groups[k] )
         {
             fprintf(stderr, "Out of memory in evaluateHighlights()!\n");
@@ -1173,16 +1560,21 @@ HighlightGroup* evaluateHighlights(TextContext* pText_ctxt,
     }
     else
     {
-        memset(groups[k], 0, sizeof(HighlightGroup));
+        memset(groups[k], 0, group_size);
     }
 
-    HighlightGroup cur_highlights;
-    memset(&cur_highlights, 0, sizeof(HighlightGroup));
+    HighlightGroup* cur_highlights = (HighlightGroup*)calloc(1, group_size);
+    if ( !cur_highlights )
+    {
+        fprintf(stderr, "Out of memory in evaluateHighlights()!\n");
+        return NULL;
+    }
 
     const char* text = pText_ctxt->text;
-    uint16_t text_len = pText_ctxt->text_len;
+    uint32_t text_len = pText_ctxt->text_len;
     uint16_t pattern_len = pPattern_ctxt->pattern_len - k;
     int64_t* pattern_mask = pPattern_ctxt->pattern_mask;
+    int64_t* long_mask = pPattern_ctxt->long_mask;
 
     uint16_t special = 0;
     if ( i == 0 )
@@ -1211,18 +1603,18 @@ HighlightGroup* evaluateHighlights(TextContext* pText_ctxt,
         last = d;
         char c = text[i];
         /* c in pattern */
-        if ( pattern_mask[(uint8_t)c] != -1 )
-            d = (d << 1) | (pattern_mask[(uint8_t)c] >> k);
+        if ( IN_PATTERN(c) )
+            d = (d << 1) | PATTERN_MASK(c);
         /**
          * text = 'xxABC', pattern = 'abc'; text[i] == 'B'
          * text = 'xxABC', pattern = 'abc'; text[i] == 'C'
          * NOT text = 'xxABCd', pattern = 'abc'; text[i] == 'C'
          * 'Cd' is considered as a word
          */
-        /* else if ( isupper(text[i-1]) && pattern_mask[(uint8_t)tolower(c)] != -1 */
+        /* else if ( isupper(text[i-1]) && IN_PATTERN(tolower(c)) */
         /*           && (i+1 == text_len || !islower(text[i+1])) )                 */
-        else if ( pattern_mask[(uint8_t)tolower(c)] != -1 )
-            d = (d << 1) | (pattern_mask[(uint8_t)tolower(c)] >> k);
+        else if ( IN_PATTERN(tolower(c)) )
+            d = (d << 1) | PATTERN_MASK(tolower(c));
         else
             d = ~0;
 
@@ -1234,15 +1626,16 @@ HighlightGroup* evaluateHighlights(TextContext* pText_ctxt,
             if ( n == pattern_len )
             {
                 score = (float)(special > 0 ? (n > 1 ? valTable[n+1] : valTable[n]) + special : valTable[n]);
-                cur_highlights.score = score;
-                cur_highlights.beg = i - n;
-                cur_highlights.end = i;
-                cur_highlights.end_index = 1;
-                cur_highlights.positions[0].col = i - n + 1;
-                cur_highlights.positions[0].len = n;
+                cur_highlights->score = score;
+                cur_highlights->beg = i - n;
+                cur_highlights->end = i;
+                cur_highlights->end_index = 1;
+                cur_highlights->positions[0].col = i - n + 1;
+                cur_highlights->positions[0].len = n;
                 if ( (k == 0 && special == 5) || (k > 0 && special > 0) )
                 {
-                    memcpy(groups[k], &cur_highlights, sizeof(HighlightGroup));
+                    memcpy(groups[k], cur_highlights, group_size);
+                    free(cur_highlights);
                     return groups[k];
                 }
             }
@@ -1253,22 +1646,24 @@ HighlightGroup* evaluateHighlights(TextContext* pText_ctxt,
                  * e.g., text = 'AbcxxAbcyyde', pattern = 'abcde'
                  * prefer matching 'Abcyyde'
                  */
-                if ( prefix_score > max_prefix_score
-                     || (special > 0 && prefix_score == max_prefix_score) )
+                if ( (prefix_score > max_prefix_score
+                      || (special > 0 && prefix_score == max_prefix_score)) && CAN_EVALUATE() )
                 {
+                    if ( pText_ctxt->budget > 0 )
+                        --pText_ctxt->budget;
                     max_prefix_score = prefix_score;
                     pText_ctxt->offset = i;
                     HighlightGroup* pGroup = evaluateHighlights(pText_ctxt, pPattern_ctxt, k + n, groups);
                     if ( pGroup && pGroup->end )
                     {
                         score = prefix_score + pGroup->score - 0.3f * (pGroup->beg - i);
-                        cur_highlights.score = score;
-                        cur_highlights.beg = i - n;
-                        cur_highlights.end = pGroup->end;
-                        cur_highlights.positions[0].col = i - n + 1;
-                        cur_highlights.positions[0].len = n;
-                        memcpy(cur_highlights.positions + 1, pGroup->positions, pGroup->end_index * sizeof(HighlightPos));
-                        cur_highlights.end_index = pGroup->end_index + 1;
+                        cur_highlights->score = score;
+                        cur_highlights->beg = i - n;
+                        cur_highlights->end = pGroup->end;
+                        cur_highlights->positions[0].col = i - n + 1;
+                        cur_highlights->positions[0].len = n;
+                        memcpy(cur_highlights->positions + 1, pGroup->positions, pGroup->end_index * sizeof(HighlightPos));
+                        cur_highlights->end_index = pGroup->end_index + 1;
                     }
                     else
                     {
@@ -1279,7 +1674,7 @@ HighlightGroup* evaluateHighlights(TextContext* pText_ctxt,
             if ( score > max_score )
             {
                 max_score = score;
-                memcpy(groups[k], &cur_highlights, sizeof(HighlightGroup));
+                memcpy(groups[k], cur_highlights, group_size);
             }
             /* e.g., text = '~_ababc~~~~', pattern = 'abc' */
             special = 0;
@@ -1297,7 +1692,7 @@ HighlightGroup* evaluateHighlights(TextContext* pText_ctxt,
             if ( x == 0 )
             {
                 uint64_t bits = 0;
-                uint16_t col = 0;
+                uint32_t col = 0;
                 for ( col = (i >> 6) + 1; col < col_num; ++col )
                 {
                     if ( (bits = text_mask[base_offset + col]) != 0 )
@@ -1339,7 +1734,8 @@ HighlightGroup* evaluateHighlights(TextContext* pText_ctxt,
     /* e.g., text = '~~~~abcd', pattern = 'abcd' */
     if ( i == text_len )
     {
-        if ( ~d >> (pattern_len - 1) )
+        /* a pattern longer than 64 characters can not be matched in a row */
+        if ( pattern_len <= 64 && ~d >> (pattern_len - 1) )
         {
             float score = (float)(special > 0 ? (pattern_len > 1 ? valTable[pattern_len + 1] : valTable[pattern_len]) + special
                             : valTable[pattern_len]);
@@ -1355,6 +1751,8 @@ HighlightGroup* evaluateHighlights(TextContext* pText_ctxt,
         }
     }
 
+    free(cur_highlights);
+
     return groups[k];
 }
 
@@ -1364,35 +1762,24 @@ HighlightGroup* evaluateHighlights(TextContext* pText_ctxt,
  * is the length of the highlight in bytes.
  * e.g., [ [2,3], [6,2], [10,4], ... ]
  */
-HighlightGroup* getHighlights(const char* text,
-                              uint16_t text_len,
-                              PatternContext* pPattern_ctxt,
-                              uint8_t is_name_only)
+static HighlightGroup* getByteHighlights(const char* text,
+                                         uint32_t text_len,
+                                         PatternContext* pPattern_ctxt,
+                                         uint8_t is_name_only)
 {
-    if ( !text || !pPattern_ctxt )
-        return NULL;
-
-    uint16_t col_num = 0;
+    uint32_t col_num = 0;
     uint64_t* text_mask = NULL;
     const char* pattern = pPattern_ctxt->pattern;
     uint16_t pattern_len = pPattern_ctxt->pattern_len;
-    int64_t* pattern_mask = pPattern_ctxt->pattern_mask;
     char first_char = pattern[0];
-    char last_char = pattern[pattern_len - 1];
-
-    /* maximum number of int16_t is (1 << 15) - 1 */
-    if ( text_len >= (1 << 15) )
-    {
-        text_len = (1 << 15) - 1;
-    }
 
     if ( pattern_len == 1 )
     {
         if ( isupper(first_char) )
         {
-            int16_t first_char_pos = -1;
-            int16_t i;
-            for ( i = 0; i < text_len; ++i )
+            int32_t first_char_pos = -1;
+            int32_t i;
+            for ( i = 0; i < (int32_t)text_len; ++i )
             {
                 if ( text[i] == first_char )
                 {
@@ -1419,9 +1806,9 @@ HighlightGroup* getHighlights(const char* text,
         }
         else
         {
-            int16_t first_char_pos = -1;
-            int16_t i;
-            for ( i = 0; i < text_len; ++i )
+            int32_t first_char_pos = -1;
+            int32_t i;
+            for ( i = 0; i < (int32_t)text_len; ++i )
             {
                 if ( tolower(text[i]) == first_char )
                 {
@@ -1454,129 +1841,22 @@ HighlightGroup* getHighlights(const char* text,
         }
     }
 
-    if ( pPattern_ctxt->is_lower )
+    col_num = (text_len + 63) >> 6;     /* (text_len + 63)/64 */
+    /* uint64_t text_mask[row_count][col_num] */
+    uint64_t mask_buffer[TEXT_MASK_BUFFER_SIZE];
+    size_t mask_size = (size_t)pPattern_ctxt->row_count * col_num;
+    text_mask = mask_size <= TEXT_MASK_BUFFER_SIZE ? mask_buffer : (uint64_t*)malloc(mask_size * sizeof(uint64_t));
+    if ( !text_mask )
     {
-        int16_t first_char_pos = -1;
-        int16_t i;
-        for ( i = 0; i < text_len; ++i )
-        {
-            if ( tolower(text[i]) == first_char )
-            {
-                first_char_pos = i;
-                break;
-            }
-        }
-
-        int16_t last_char_pos = -1;
-        for ( i = text_len - 1; i >= first_char_pos; --i )
-        {
-            if ( tolower(text[i]) == last_char )
-            {
-                last_char_pos = i;
-                break;
-            }
-        }
-
-        col_num = (text_len + 63) >> 6;     /* (text_len + 63)/64 */
-        /* uint64_t text_mask[256][col_num] */
-        text_mask = (uint64_t*)calloc(col_num << 8, sizeof(uint64_t));
-        if ( !text_mask )
-        {
-            fprintf(stderr, "Out of memory in getHighlights()!\n");
-            return NULL;
-        }
-        char c;
-        for ( i = first_char_pos; i <= last_char_pos; ++i )
-        {
-            c = tolower(text[i]);
-            /* c in pattern */
-            if ( pattern_mask[(uint8_t)c] != -1 )
-                text_mask[(uint8_t)c * col_num + (i >> 6)] |= 1ULL << (i & 63);
-        }
+        fprintf(stderr, "Out of memory in getHighlights()!\n");
+        return NULL;
     }
-    else
-    {
-        int16_t first_char_pos = -1;
-        if ( isupper(first_char) )
-        {
-            int16_t i;
-            for ( i = 0; i < text_len; ++i )
-            {
-                if ( text[i] == first_char )
-                {
-                    first_char_pos = i;
-                    break;
-                }
-            }
-        }
-        else
-        {
-            int16_t i;
-            for ( i = 0; i < text_len; ++i )
-            {
-                if ( tolower(text[i]) == first_char )
-                {
-                    first_char_pos = i;
-                    break;
-                }
-            }
-        }
 
-        int16_t last_char_pos = -1;
-        if ( isupper(last_char) )
-        {
-            int16_t i;
-            for ( i = text_len - 1; i >= first_char_pos; --i )
-            {
-                if ( text[i] == last_char )
-                {
-                    last_char_pos = i;
-                    break;
-                }
-            }
-        }
-        else
-        {
-            int16_t i;
-            for ( i = text_len - 1; i >= first_char_pos; --i )
-            {
-                if ( tolower(text[i]) == last_char )
-                {
-                    last_char_pos = i;
-                    break;
-                }
-            }
-        }
-
-        col_num = (text_len + 63) >> 6;
-        /* uint64_t text_mask[256][col_num] */
-        text_mask = (uint64_t*)calloc(col_num << 8, sizeof(uint64_t));
-        if ( !text_mask )
-        {
-            fprintf(stderr, "Out of memory in getHighlights()!\n");
-            return NULL;
-        }
-
-        char c;
-        int16_t i;
-        for ( i = first_char_pos; i <= last_char_pos; ++i )
-        {
-            c = text[i];
-            if ( isupper(c) )
-            {
-                /* c in pattern */
-                if ( pattern_mask[(uint8_t)c] != -1 )
-                    text_mask[(uint8_t)c * col_num + (i >> 6)] |= 1ULL << (i & 63);
-                if ( pattern_mask[(uint8_t)tolower(c)] != -1 )
-                    text_mask[(uint8_t)tolower(c) * col_num + (i >> 6)] |= 1ULL << (i & 63);
-            }
-            else
-            {
-                /* c in pattern */
-                if ( pattern_mask[(uint8_t)c] != -1 )
-                    text_mask[(uint8_t)c * col_num + (i >> 6)] |= 1ULL << (i & 63);
-            }
-        }
+    if ( !buildTextMask(text, text_len, pPattern_ctxt, text_mask, col_num) )
+    {
+        if ( text_mask != mask_buffer )
+            free(text_mask);
+        return NULL;
     }
 
     TextContext text_ctxt;
@@ -1585,13 +1865,15 @@ HighlightGroup* getHighlights(const char* text,
     text_ctxt.text_mask = text_mask;
     text_ctxt.col_num = col_num;
     text_ctxt.offset = 0;
+    text_ctxt.budget = pPattern_ctxt->long_mask ? MAX_EVALUATIONS : (uint32_t)-1;
 
     /* HighlightGroup* groups[pattern_len] */
     HighlightGroup** groups = (HighlightGroup**)calloc(pattern_len, sizeof(HighlightGroup*));
     if ( !groups )
     {
         fprintf(stderr, "Out of memory in getHighlights()!\n");
-        free(text_mask);
+        if ( text_mask != mask_buffer )
+            free(text_mask);
         return NULL;
     }
 
@@ -1601,7 +1883,8 @@ HighlightGroup* getHighlights(const char* text,
     else
         pGroup = evaluateHighlights(&text_ctxt, pPattern_ctxt, 0, groups);
 
-    free(text_mask);
+    if ( text_mask != mask_buffer )
+        free(text_mask);
     uint16_t i;
     for ( i = 0; i < pattern_len; ++i )
     {
@@ -1613,6 +1896,96 @@ HighlightGroup* getHighlights(const char* text,
     return pGroup;
 }
 
+#define MAPPED_BUFFER_SIZE 256
+
+float getWeight(const char* text, uint32_t text_len,
+                PatternContext* pPattern_ctxt,
+                uint8_t is_name_only)
+{
+    if ( !text || !pPattern_ctxt )
+        return MIN_WEIGHT;
+
+    if ( pPattern_ctxt->symbol_count == 0 )
+        return getByteWeight(text, text_len, pPattern_ctxt, is_name_only);
+
+    /* the texts not longer than MAPPED_BUFFER_SIZE are mapped on the stack */
+    char buffer[MAPPED_BUFFER_SIZE];
+    char* allocated = NULL;
+    char* mapped = buffer;
+    if ( text_len > MAPPED_BUFFER_SIZE )
+    {
+        allocated = (char*)malloc(text_len);
+        if ( !allocated )
+        {
+            fprintf(stderr, "Out of memory in getWeight()!\n");
+            return MIN_WEIGHT;
+        }
+        mapped = allocated;
+    }
+
+    uint32_t mapped_len = mapText(text, text_len, pPattern_ctxt, mapped, NULL);
+    float weight = getByteWeight(mapped, mapped_len, pPattern_ctxt, is_name_only);
+
+    free(allocated);
+
+    return weight;
+}
+
+/**
+ * if the pattern has non-ASCII characters, the highlights are got from the mapped text,
+ * and then converted to the byte columns and lengths of `text`.
+ */
+HighlightGroup* getHighlights(const char* text,
+                              uint32_t text_len,
+                              PatternContext* pPattern_ctxt,
+                              uint8_t is_name_only)
+{
+    if ( !text || !pPattern_ctxt )
+        return NULL;
+
+    if ( pPattern_ctxt->symbol_count == 0 )
+        return getByteHighlights(text, text_len, pPattern_ctxt, is_name_only);
+
+    char buffer[MAPPED_BUFFER_SIZE];
+    uint32_t offset_buffer[MAPPED_BUFFER_SIZE + 1];
+    char* mapped = buffer;
+    uint32_t* offsets = offset_buffer;
+    if ( text_len > MAPPED_BUFFER_SIZE )
+    {
+        mapped = (char*)malloc(text_len);
+        offsets = (uint32_t*)malloc((text_len + 1) * sizeof(uint32_t));
+        if ( !mapped || !offsets )
+        {
+            free(mapped);
+            free(offsets);
+            fprintf(stderr, "Out of memory in getHighlights()!\n");
+            return NULL;
+        }
+    }
+
+    uint32_t mapped_len = mapText(text, text_len, pPattern_ctxt, mapped, offsets);
+    HighlightGroup* pGroup = getByteHighlights(mapped, mapped_len, pPattern_ctxt, is_name_only);
+    if ( pGroup )
+    {
+        uint16_t i;
+        for ( i = 0; i < pGroup->end_index; ++i )
+        {
+            uint32_t col = pGroup->positions[i].col - 1;
+            uint32_t len = pGroup->positions[i].len;
+            pGroup->positions[i].col = offsets[col] + 1;
+            pGroup->positions[i].len = offsets[col + len] - offsets[col];
+        }
+    }
+
+    if ( mapped != buffer )
+    {
+        free(mapped);
+        free(offsets);
+    }
+
+    return pGroup;
+}
+
 /**
  * e.g., /usr/src/example.tar.gz
  * `dirname` is "/usr/src"
@@ -1804,6 +2177,11 @@ static PyObject* fuzzyMatchC_initPattern(PyObject* self, PyObject* args)
         return NULL;
 
     PatternContext* pCtxt = initPattern(pattern, (uint16_t)pattern_len);
+    if ( !pCtxt )
+    {
+        PyErr_SetString(PyExc_ValueError, "the pattern can not be matched, e.g., it has too many non-ASCII characters.");
+        return NULL;
+    }
 
     return PyCapsule_New(pCtxt, NULL, delPatternContext);
 }
@@ -1824,7 +2202,7 @@ static PyObject* fuzzyMatchC_getWeight(PyObject* self, PyObject* args, PyObject*
     if ( !pCtxt )
         return NULL;
 
-    return Py_BuildValue("f", getWeight(text, (uint16_t)text_len, pCtxt, is_name_only));
+    return Py_BuildValue("f", getWeight(text, (uint32_t)text_len, pCtxt, is_name_only));
 }
 
 static PyObject* fuzzyMatchC_getHighlights(PyObject* self, PyObject* args, PyObject* kwargs)
@@ -1843,7 +2221,7 @@ static PyObject* fuzzyMatchC_getHighlights(PyObject* self, PyObject* args, PyObj
     if ( !pCtxt )
         return NULL;
 
-    HighlightGroup* pGroup = getHighlights(text, (uint16_t)text_len, pCtxt, is_name_only);
+    HighlightGroup* pGroup = getHighlights(text, (uint32_t)text_len, pCtxt, is_name_only);
     if ( !pGroup )
         return NULL;
 
@@ -1851,7 +2229,7 @@ static PyObject* fuzzyMatchC_getHighlights(PyObject* self, PyObject* args, PyObj
     uint16_t i;
     for ( i = 0; i < pGroup->end_index; ++i )
     {
-        PyList_SetItem(list, i, Py_BuildValue("[H,H]", pGroup->positions[i].col, pGroup->positions[i].len));
+        PyList_SetItem(list, i, Py_BuildValue("[I,I]", pGroup->positions[i].col, pGroup->positions[i].len));
     }
     free(pGroup);
 
@@ -1916,6 +2294,37 @@ int main(int argc, const char* argv[])
 
     printf("%d\n", FM_BIT_LENGTH(0x2f00));
 
+    /**
+     * a long pattern on a line made of its own characters must not take long,
+     * see MAX_EVALUATIONS, it took minutes without the limit.
+     */
+    char text[1001];
+    char pattern[101];
+    uint32_t i;
+    srand(1);
+    for ( i = 0; i < 1000; ++i )
+        text[i] = "ab/_"[rand() % 4];
+    text[1000] = '\0';
+    for ( i = 0; i < 100; ++i )
+        pattern[i] = "ab"[i & 1];
+    pattern[100] = '\0';
+
+    PatternContext* pPattern_ctxt = initPattern(pattern, 100);
+    if ( !pPattern_ctxt )
+        return 1;
+
+    clock_t start = clock();
+    float weight = getWeight(text, 1000, pPattern_ctxt, 0);
+    float name_weight = getWeight(text, 1000, pPattern_ctxt, 1);
+    free(getHighlights(text, 1000, pPattern_ctxt, 0));
+    free(getHighlights(text, 1000, pPattern_ctxt, 1));
+    double elapsed = (double)(clock() - start) / CLOCKS_PER_SEC;
+    free(pPattern_ctxt);
+
+    printf("a pattern of 100 characters: %.3fs\n", elapsed);
+    if ( weight == MIN_WEIGHT || name_weight == MIN_WEIGHT || elapsed > 1.0 )
+        return 1;
+
     return 0;
 }
 
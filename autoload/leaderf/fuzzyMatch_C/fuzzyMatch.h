@@ -21,28 +21,53 @@
 
 #define MIN_WEIGHT (-1000000.0f)
 
+/**
+ * a non-ASCII pattern is matched per character instead of per byte: each non-ASCII character
+ * of the pattern is mapped to one of the control characters in [0x01, 0x1F], which is called
+ * a symbol, and so is the same character in a text, or its case folding if it is not in the
+ * pattern (smart case as for ASCII), other non-ASCII characters and the control characters
+ * are mapped to OTHER_SYMBOL.
+ * the mapped pattern is in `symbols`, initPattern() returns NULL if the pattern has more than
+ * MAX_SYMBOL_COUNT distinct non-ASCII characters.
+ */
+#define MAX_SYMBOL_COUNT 31
+#define OTHER_SYMBOL 0x7F
+
+/**
+ * bit i of pattern_mask[c] is 0 if pattern[i] is c, the other bits are 1.
+ * if the pattern is longer than 63 characters, the masks are in `long_mask` instead,
+ * i.e., int64_t long_mask[256][mask_words], the words after the pattern are all 1s.
+ */
 typedef struct PatternContext
 {
     const char* pattern;
     int64_t pattern_mask[256];
+    int64_t* long_mask;
+    int16_t mask_row[256];    /* the row of each character in the text mask, -1 if not in the pattern */
+    uint8_t row_chars[256];   /* the character of each row in the text mask */
+    uint16_t row_count;
+    uint8_t upper_chars[256];   /* the uppercase of each character that also matches it, else itself */
+    uint16_t mask_words;
     uint16_t pattern_len;
-    uint16_t actual_pattern_len;
     uint8_t is_lower;
+    uint8_t symbol_count;
+    uint32_t code_points[MAX_SYMBOL_COUNT];   /* the code point of each symbol */
+    char symbols[1];
 }PatternContext;
 
 typedef struct HighlightPos
 {
-    uint16_t col;
-    uint16_t len;
+    uint32_t col;
+    uint32_t len;
 }HighlightPos;
 
 typedef struct HighlightGroup
 {
     float score;
-    uint16_t beg;
-    uint16_t end;
-    HighlightPos positions[64];
+    uint32_t beg;
+    uint32_t end;
     uint16_t end_index;
+    HighlightPos positions[1];  /* HighlightPos positions[pattern_len] */
 }HighlightGroup;
 
 #ifdef __cplusplus
@@ -51,9 +76,9 @@ extern "C" {
 
 PatternContext* initPattern(const char* pattern, uint16_t pattern_len);
 
-float getWeight(const char* text, uint16_t text_len, PatternContext* pPattern_ctxt, uint8_t is_name_only);
+float getWeight(const char* text, uint32_t text_len, PatternContext* pPattern_ctxt, uint8_t is_name_only);
 
-HighlightGroup* getHighlights(const char* text, uint16_t text_len, PatternContext* pPattern_ctxt, uint8_t is_name_only);
+HighlightGroup* getHighlights(const char* text, uint32_t text_len, PatternContext* pPattern_ctxt, uint8_t is_name_only);
 
 uint32_t getPathWeight(const char* filename,
                        const char* suffix,
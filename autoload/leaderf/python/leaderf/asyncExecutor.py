@@ -1,19 +1,24 @@
 import os
 import sys
+import json
 import shlex
+import locale
 import signal
 import threading
 import itertools
+import collections
 import subprocess
 from .utils import *
+from .devicons import webDevIconsTable
+from .asyncWorker import FRAME_HEADER
 
 if sys.version_info >= (3, 0):
-    import queue as Queue
     lfDEVNULL = subprocess.DEVNULL
 else:
-    import Queue
     lfDEVNULL = open(os.devnull)
 
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "asyncWorker.py")
+
 
 class AsyncExecutor(object):
     """
@@ -21,195 +26,338 @@ class AsyncExecutor(object):
     read the output asynchronously.
     """
     def __init__(self):
-        self._errQueue = Queue.Queue()
         self._process = None
-        self._finished = False
         self._max_count = int(lfEval("g:Lf_MaxCount"))
+        self._chunk_size = 256 * 1024
+        self._max_err_size = 64 * 1024
+        self._worker = lfEval("get(g:, 'Lf_AsyncWorker', '')")
+        if self._worker == '0':
+            self._worker = ''
 
-    def _readerThread(self, fd, queue):
+    def _readerThread(self, fd, err):
+        """
+        read `fd` to the end and keep the first `self._max_err_size` bytes in the list `err`,
+        the rest are discarded, so that a command writing lots of errors does not use up the memory.
+        """
+        size = 0
         try:
-            for line in iter(fd.readline, b""):
-                queue.put(line)
-        except ValueError:
+            while True:
+                chunk = os.read(fd.fileno(), self._chunk_size)
+                if not chunk:
+                    break
+
+                if size < self._max_err_size:
+                    err.append(chunk[:self._max_err_size - size])
+                    size += len(err[-1])
+        except (OSError, ValueError):   # `fd` is closed
             pass
-        finally:
-            queue.put(None)
 
-    def execute(self, cmd, encoding=None, cleanup=None, env=None, raise_except=True, format_line=None):
+    def _reap(self, process):
+        """
+        wait for `process` to exit in a thread, so that it does not become a zombie
+        """
+        if process.poll() is None:
+            reaper = threading.Thread(target=process.wait)
+            reaper.daemon = True
+            reaper.start()
+
+    def _readBlocks(self, fd):
+        """
+        read `fd` in chunks of `self._chunk_size` bytes rather than line by line,
+        yield blocks of complete lines, the line breaks between the lines are kept.
+        """
+        fileno = fd.fileno()
+        parts = []
+        while True:
+            try:
+                chunk = os.read(fileno, self._chunk_size)
+            except OSError:     # `fd` is closed, e.g., by killProcess()
+                break
+
+            if not chunk:
+                break
+
+            end = chunk.rfind(b"\n")
+            if end == -1:
+                parts.append(chunk)
+                continue
+
+            parts.append(chunk[:end])
+            yield b"".join(parts)
+            parts = [chunk[end+1:]]
+
+        rest = b"".join(parts)
+        if rest:
+            yield rest
+
+    def _readFrames(self, fd):
+        """
+        yield the batches of lines the worker process writes to `fd`, see asyncWorker.py
+        """
+        while True:
+            header = fd.read(FRAME_HEADER.size)
+            if len(header) < FRAME_HEADER.size:
+                break
+
+            yield fd.read(FRAME_HEADER.unpack(header)[0]).decode("utf-8").split("\n")
+
+    def _popen(self, cmd, env, stdin=lfDEVNULL, shell=True):
         if os.name == 'nt':
-            self._process = subprocess.Popen(cmd, bufsize=-1,
-                                             stdin=lfDEVNULL,
-                                             stdout=subprocess.PIPE,
-                                             stderr=subprocess.PIPE,
-                                             shell=True,
-                                             env=env,
-                                             universal_newlines=False)
+            return subprocess.Popen(cmd, bufsize=-1,
+                                    stdin=stdin,
+                                    stdout=subprocess.PIPE,
+                                    stderr=subprocess.PIPE,
+                                    shell=shell,
+                                    env=env,
+                                    universal_newlines=False)
         else:
-            self._process = subprocess.Popen(cmd, bufsize=-1,
-                                             stdin=lfDEVNULL,
-                                             stdout=subprocess.PIPE,
-                                             stderr=subprocess.PIPE,
-                                             preexec_fn=os.setsid,
-                                             shell=True,
-                                             env=env,
-                                             universal_newlines=False)
+            return subprocess.Popen(cmd, bufsize=-1,
+                                    stdin=stdin,
+                                    stdout=subprocess.PIPE,
+                                    stderr=subprocess.PIPE,
+                                    preexec_fn=os.setsid,
+                                    shell=shell,
+                                    env=env,
+                                    universal_newlines=False)
+
+    def _startWorker(self, cmd, env, encoding, devicons):
+        """
+        run `cmd` by the worker process, which decodes and formats the output itself,
+        return None if the worker can not be started.
+        """
+        config = {
+            "cmd": cmd,
+            "encoding": encoding,
+            "chunk_size": self._chunk_size,
+            "icons": webDevIconsTable() if devicons else None,
+        }
+        try:
+            process = self._popen([self._worker, WORKER_SCRIPT], env, subprocess.PIPE, False)
+        except OSError:     # e.g., g:Lf_AsyncWorker is not an executable
+            return None
+
+        try:
+            process.stdin.write(json.dumps(config).encode("utf-8"))
+            process.stdin.close()
+        except (IOError, OSError):
+            pass
+
+        return process
+
+    def execute(self, cmd, encoding=None, cleanup=None, env=None, raise_except=True, format_line=None):
+        if sys.version_info >= (3, 0):
+            # the same encoding as lfBytes2Str() decodes the non-ascii lines with
+            block_encoding = encoding or locale.getdefaultlocale()[1] or "utf-8"
+
+        self._process = None
+        if (self._worker and sys.version_info >= (3, 0) and isinstance(block_encoding, str)
+                and (format_line is None or getattr(format_line, "devicons", False))):
+            self._process = self._startWorker(cmd, env, block_encoding, format_line is not None)
 
-        self._finished = False
+        use_worker = self._process is not None
+        if not use_worker:
+            self._process = self._popen(cmd, env)
 
+        process = self._process
+        err_chunks = []
         stderr_thread = threading.Thread(target=self._readerThread,
-                                         args=(self._process.stderr, self._errQueue))
+                                         args=(process.stderr, err_chunks))
         stderr_thread.daemon = True
         stderr_thread.start()
 
         if sys.version_info >= (3, 0):
-            def read(source):
+            def decode(block):
                 try:
-                    count = 0
-                    if encoding:
-                        for line in source:
-                            try:
-                                line.decode("ascii")
-                                yield (
-                                    format_line(line.rstrip(b"\r\n").decode())
-                                ) if format_line else line.rstrip(b"\r\n").decode()
-                            except UnicodeDecodeError:
-                                yield (
-                                    format_line(lfBytes2Str(line.rstrip(b"\r\n"), encoding))
-                                ) if format_line else (
-                                    lfBytes2Str(line.rstrip(b"\r\n"), encoding)
-                                )
-                            if self._max_count > 0:
-                                count += 1
-                                if count >= self._max_count:
-                                    self.killProcess()
-                                    break
-                    else:
-                        for line in source:
-                            try:
-                                line.decode("ascii")
-                                yield (
-                                    format_line(line.rstrip(b"\r\n").decode())
-                                ) if format_line else line.rstrip(b"\r\n").decode()
-                            except UnicodeDecodeError:
-                                yield (
-                                    format_line(lfBytes2Str(line.rstrip(b"\r\n")))
-                                ) if format_line else lfBytes2Str(line.rstrip(b"\r\n"))
-                            if self._max_count > 0:
-                                count += 1
-                                if count >= self._max_count:
-                                    self.killProcess()
-                                    break
-
-                    err = b"".join(iter(self._errQueue.get, None))
-                    if err and raise_except:
-                        raise Exception(lfBytes2Str(err) + lfBytes2Str(err, encoding))
-                except ValueError:
-                    pass
-                finally:
-                    self._finished = True
-                    try:
-                        if self._process:
-                            self._process.stdout.close()
-                            self._process.stderr.close()
-                            self._process.poll()
-                    except IOError:
-                        pass
-
-                    if cleanup:
-                        cleanup()
+                    # usually the whole block is decoded at once
+                    lines = block.decode(block_encoding).split("\n")
+                except (LookupError, TypeError, UnicodeDecodeError):    # e.g., an invalid `encoding`
+                    lines = []
+                    for line in block.split(b"\n"):
+                        try:
+                            lines.append(line.decode("ascii"))
+                        except UnicodeDecodeError:
+                            lines.append(lfBytes2Str(line, encoding))
+                return lines
+
+            def error(err):
+                return lfBytes2Str(err) + lfBytes2Str(err, encoding)
         else:
-            def read(source):
+            def decode(block):
+                lines = block.split(b"\n")
+                if not encoding:
+                    try:
+                        block.decode("ascii")
+                    except UnicodeDecodeError:
+                        lines = [lfEncode(line) for line in lines]
+                return lines
+
+            def error(err):
+                return lfEncode(err) + err
+
+        def parse(source):
+            for block in source:
+                lines = decode(block)
+                if b"\r" in block:     # e.g., CRLF on Windows
+                    lines = [line.rstrip("\r") for line in lines]
+                if format_line:
+                    lines = [format_line(line) for line in lines]
+                yield lines
+
+        def read(source):
+            try:
+                count = 0
+                for lines in source:
+                    if self._max_count > 0:
+                        count += len(lines)
+                        if count >= self._max_count:
+                            # stop the command before the consumer gets the last lines,
+                            # it may not ask for more.
+                            # `self._process` may be another command started later
+                            if self._process is process:
+                                self._process = None
+                            self._kill(process)
+                            del lines[len(lines) - (count - self._max_count):]
+                            yield lines
+                            break
+
+                    yield lines
+
+                stderr_thread.join()
+                err = b"".join(err_chunks)
+                if err and raise_except:
+                    raise Exception(error(err))
+            except ValueError:
+                pass
+            finally:
                 try:
-                    count = 0
-                    if encoding:
-                        for line in source:
-                            yield (
-                                format_line(line.rstrip(b"\r\n"))
-                            ) if format_line else line.rstrip(b"\r\n")
-                            if self._max_count > 0:
-                                count += 1
-                                if count >= self._max_count:
-                                    self.killProcess()
-                                    break
-                    else:
-                        for line in source:
-                            try:
-                                line.decode("ascii")
-                                yield (
-                                    format_line(line.rstrip(b"\r\n"))
-                                ) if format_line else line.rstrip(b"\r\n")
-                            except UnicodeDecodeError:
-                                yield (
-                                    format_line(lfEncode(line.rstrip(b"\r\n")))
-                                ) if format_line else lfEncode(line.rstrip(b"\r\n"))
-                            if self._max_count > 0:
-                                count += 1
-                                if count >= self._max_count:
-                                    self.killProcess()
-                                    break
-
-                    err = b"".join(iter(self._errQueue.get, None))
-                    if err and raise_except:
-                        raise Exception(lfEncode(err) + err)
-                except ValueError:
+                    process.stdout.close()
+                    process.stderr.close()
+                except IOError:
                     pass
-                finally:
-                    self._finished = True
-                    try:
-                        if self._process:
-                            self._process.stdout.close()
-                            self._process.stderr.close()
-                            self._process.poll()
-                    except IOError:
-                        pass
+                self._reap(process)
 
-                    if cleanup:
-                        cleanup()
 
-        result = AsyncExecutor.Result(read(iter(self._process.stdout.readline, b"")))
+                if cleanup:
+                    cleanup()
+
+        if use_worker:
+            source = self._readFrames(process.stdout)
+        else:
+            source = parse(self._readBlocks(process.stdout))
+        result = AsyncExecutor.Result(read(source), batched=True)
 
         return result
 
     def killProcess(self):
-        # Popen.poll always returns None, bug?
-        # if self._process and not self._process.poll():
-        if self._process and not self._finished:
+        process = self._process
+        if process is None:
+            return
+
+        self._process = None
+        self._kill(process)
+
+    def _kill(self, process):
+        """
+        kill `process` and the processes it started, then reap it
+        """
+        # poll() returns None as long as the process is running, and it is not reaped until then,
+        # so its pid can not have been reused
+        if process.poll() is None:
             if os.name == 'nt':
-                subprocess.Popen("TASKKILL /F /PID {pid} /T".format(pid=self._process.pid), shell=True)
+                self._reap(subprocess.Popen("TASKKILL /F /PID {pid} /T".format(pid=process.pid), shell=True))
             else:
                 try:
-                    os.killpg(os.getpgid(self._process.pid), signal.SIGTERM)
+                    # the process is the leader of its process group, see os.setsid
+                    os.killpg(process.pid, signal.SIGTERM)
                 except OSError:
                     pass
 
-            self._process.poll()
-            self._process = None
+        self._reap(process)
 
     class Result(object):
-        def __init__(self, iterable):
-            self._g = iterable
+        """
+        The lines of the output, they can be iterated one by one,
+        or in batches(lists of lines) by batches(), which is much faster.
+        """
+        def __init__(self, iterable, batched=False):
+            """
+            `iterable` yields lists of lines if `batched` is True, otherwise it yields lines.
+            """
+            self._sources = collections.deque([self._toBatches(iterable, batched)])
+            self._batch = []    # the batch being iterated line by line
+            self._pos = 0
+
+        @staticmethod
+        def _toBatches(iterable, batched=False):
+            if batched:
+                return iter(iterable)
+            elif isinstance(iterable, AsyncExecutor.Result):
+                return iterable.batches()
+            else:
+                it = iter(iterable)
+                # a batch waits for 100 lines or the end of `iterable`
+                return iter(lambda: list(itertools.islice(it, 100)), [])
+
+        def _nextBatch(self):
+            """
+            return the next batch, or None if there is none
+            """
+            while self._sources:
+                batch = next(self._sources[0], None)
+                if batch is not None:
+                    return batch
+                self._sources.popleft()
+            return None
+
+        def batches(self):
+            """
+            yield the remaining lines in batches
+            """
+            if self._pos < len(self._batch):
+                batch = self._batch[self._pos:]
+                self._batch = []
+                self._pos = 0
+                yield batch
+
+            while True:
+                batch = self._nextBatch()
+                if batch is None:
+                    return
+                yield batch
 
         def __add__(self, iterable):
-            self._g = itertools.chain(self._g, iterable)
+            self._sources.append(self._toBatches(iterable))
             return self
 
         def __iadd__(self, iterable):
-            self._g = itertools.chain(self._g, iterable)
+            self._sources.append(self._toBatches(iterable))
             return self
 
         def join_left(self, iterable):
-            self._g = itertools.chain(iterable, self._g)
+            if self._pos < len(self._batch):
+                self._sources.appendleft(iter([self._batch[self._pos:]]))
+                self._batch = []
+                self._pos = 0
+            self._sources.appendleft(self._toBatches(iterable))
             return self
 
         def __iter__(self):
             return self
 
         def __next__(self):
-            return next(self._g)
+            while self._pos >= len(self._batch):
+                batch = self._nextBatch()
+                if batch is None:
+                    raise StopIteration
+                self._batch = batch
+                self._pos = 0
+
+            self._pos += 1
+            return self._batch[self._pos - 1]
 
         # for python2
         def next(self):
-            return next(self._g)
+            return self.__next__()
 
 if __name__ == "__main__":
     executor = AsyncExecutor()
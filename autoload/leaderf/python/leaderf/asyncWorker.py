@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+The helper process of AsyncExecutor, see g:Lf_AsyncWorker.
+
+It is run by a Python 3 interpreter outside Vim, so it must not import vim or
+the other modules of leaderf. It reads a JSON object from stdin:
+
+    cmd:            the command to execute in a shell
+    encoding:       the encoding to decode the output with
+    chunk_size:     the number of bytes read from the output at a time
+    icons:          null, or the tables to prefix the devicons with, see webDevIconsTable()
+
+then it runs the command, decodes its output and writes the lines to stdout in frames:
+
+    size:           uint32, the number of bytes of the lines
+    lines:          the lines encoded in utf-8 and joined by '\n'
+
+The stderr of the command goes to the stderr of this process.
+"""
+
+import os
+import sys
+import json
+import struct
+import subprocess
+
+FRAME_HEADER = struct.Struct('=I')
+
+
+def readBlocks(fd, chunk_size):
+    """
+    yield blocks of complete lines read from the file descriptor `fd`,
+    the line breaks between the lines are kept.
+    """
+    parts = []
+    while True:
+        chunk = os.read(fd, chunk_size)
+        if not chunk:
+            break
+
+        end = chunk.rfind(b"\n")
+        if end == -1:
+            parts.append(chunk)
+            continue
+
+        parts.append(chunk[:end])
+        yield b"".join(parts)
+        parts = [chunk[end+1:]]
+
+    rest = b"".join(parts)
+    if rest:
+        yield rest
+
+def decode(block, encoding):
+    """
+    the same as what AsyncExecutor does in the Vim process
+    """
+    try:
+        return block.decode(encoding).split("\n")
+    except (LookupError, UnicodeDecodeError):
+        lines = []
+        for line in block.split(b"\n"):
+            try:
+                lines.append(line.decode(encoding))
+            except (LookupError, UnicodeDecodeError):
+                lines.append(line.decode(errors="ignore"))
+        return lines
+
+def iconGetter(icons):
+    """
+    return a function that returns the devicon of a file the same as webDevIconsGetFileTypeSymbol()
+    """
+    default = icons["default"] + icons["spaces"]
+    exact = dict((k, v + icons["spaces"]) for k, v in icons["exact"].items())
+    extension = dict((k, v + icons["spaces"]) for k, v in icons["extension"].items())
+    separators = "/\\" if os.name == 'nt' else "/"
+
+    def getIcon(file):
+        start = max(file.rfind(sep) for sep in separators) + 1
+        name = file[start:].lower()
+        if name in exact:
+            return exact[name]
+
+        idx = name.rfind('.')
+        return extension.get('' if idx == -1 else name[idx+1:], default)
+
+    return getIcon
+
+def main():
+    config = json.loads(sys.stdin.read())
+    encoding = config["encoding"]
+    icons = config.get("icons")
+    get_icon = iconGetter(icons) if icons else None
+
+    with open(os.devnull, 'rb') as devnull:
+        process = subprocess.Popen(config["cmd"], bufsize=-1,
+                                   stdin=devnull,
+                                   stdout=subprocess.PIPE,
+                                   shell=True)
+
+    out = sys.stdout.buffer
+    try:
+        for block in readBlocks(process.stdout.fileno(), config["chunk_size"]):
+            lines = decode(block, encoding)
+            if b"\r" in block:
+                lines = [line.rstrip("\r") for line in lines]
+            if get_icon:
+                lines = [get_icon(line) + line for line in lines]
+
+            data = "\n".join(lines).encode("utf-8")
+            out.write(FRAME_HEADER.pack(len(data)))
+            out.write(data)
+            out.flush()
+    except (IOError, OSError):  # e.g., Vim does not want the rest of the output
+        pass
+    finally:
+        process.stdout.close()
+        process.wait()
+
+if __name__ == "__main__":
+    main()
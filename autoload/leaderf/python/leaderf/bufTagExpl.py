@@ -8,7 +8,6 @@ import sys
 import os.path
 import tempfile
 import itertools
-import multiprocessing
 from .utils import *
 from .explorer import *
 from .manager import *
@@ -60,7 +59,7 @@ class BufTagExplorer(Explorer):
 
     def _getTagList(self):
         buffers = [b for b in vim.buffers]
-        n = multiprocessing.cpu_count()
+        n = lfCpuCount()
         for i in range(0, len(vim.buffers), n):
             tag_list = []
             exe_result = []
@@ -432,9 +431,6 @@ class BufTagExplManager(Manager):
         if self._supports_preview:
             if self._getInstance().isReverseOrder() and self._getInstance().getCurrentPos()[0] <= 3:
                 self._setResultContent()
-                if self._cli.pattern and len(self._highlight_pos) < len(self._getInstance().buffer) // 2 \
-                        and len(self._highlight_pos) < int(lfEval("g:Lf_NumberOfHighlight")):
-                    self._highlight_method()
 
             if self._getInstance().isReverseOrder():
                 lfCmd("norm! 3kj")
@@ -444,6 +440,7 @@ class BufTagExplManager(Manager):
                     lfCmd("call win_execute(%d, 'norm! 2k')" % (self._getInstance().getPopupWinId()))
                 else:
                     lfCmd("norm! 2k")
+            self._updateViewport()
         else:
             super(BufTagExplManager, self)._toUp()
 
@@ -460,6 +457,7 @@ class BufTagExplManager(Manager):
                     lfCmd("call win_execute(%d, 'norm! 3jk')" % (self._getInstance().getPopupWinId()))
                 else:
                     lfCmd("norm! 3jk")
+            self._updateViewport()
         else:
             super(BufTagExplManager, self)._toDown()
 
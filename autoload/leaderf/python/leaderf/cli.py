@@ -626,6 +626,10 @@ class LfCli(object):
     def pattern(self):
         return self._pattern
 
+    @property
+    def cmdline(self):
+        return ''.join(self._cmdline)
+
     @property
     def isFullPath(self):
         return self._is_full_path
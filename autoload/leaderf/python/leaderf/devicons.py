@@ -442,6 +442,17 @@ def webDevIconsGetFileTypeSymbol(file, isdir=False):
 
     return symbol + _spaces
 
+def webDevIconsTable():
+    """
+    return the tables webDevIconsGetFileTypeSymbol() looks up, for the worker process of AsyncExecutor
+    """
+    return {
+        "default": fileNodesDefaultSymbol,
+        "exact": fileNodesExactSymbols,
+        "extension": fileNodesExtensionSymbols,
+        "spaces": _spaces,
+    }
+
 def _normalize_name(val):
     # Replace unavailable characters for highlights with __
     # [^a-zA-Z0-9_]
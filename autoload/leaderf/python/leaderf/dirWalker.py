@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import time
+import threading
+from .utils import *
+
+if sys.version_info >= (3, 0):
+    import queue as Queue
+else:
+    import Queue
+
+try:
+    from os import scandir
+except ImportError:
+    scandir = None
+
+
+class DirWalker(object):
+    """
+    A class to walk a directory tree in several threads,
+    each directory is listed by a thread as soon as it is found.
+    """
+    def __init__(self, wildignore, follow_links, thread_count=None):
+        self._dir_pattern = compileGlobs(wildignore.get('dir', []))
+        self._file_pattern = compileGlobs(wildignore.get('file', []))
+        self._follow_links = follow_links
+        if thread_count is None:
+            # listing a directory mostly waits for the file system, e.g., on NFS
+            thread_count = min(32, lfCpuCount() + 4)
+        self._thread_count = thread_count
+        self._stop = False
+        self.completed = False
+
+    def listDir(self, dir_path):
+        """
+        return a tuple (mtime, subdirectories, files) of `dir_path`,
+        the subdirectories are those to walk into, the names matching g:Lf_WildIgnore are excluded.
+        return None if `dir_path` can not be listed.
+        """
+        dir_pattern = self._dir_pattern
+        file_pattern = self._file_pattern
+        dirs = []
+        files = []
+        try:
+            # stat before listing, so that a change made in between is found next time
+            mtime = os.stat(dir_path).st_mtime
+            if scandir is not None:
+                for entry in scandir(dir_path):
+                    try:
+                        is_dir = entry.is_dir()
+                    except OSError:
+                        is_dir = False
+
+                    if is_dir:
+                        if (dir_pattern is None or dir_pattern.match(entry.name) is None) \
+                                and (self._follow_links or not entry.is_symlink()):
+                            dirs.append(os.path.join(dir_path, entry.name))
+                    elif file_pattern is None or file_pattern.match(entry.name) is None:
+                        files.append(lfEncode(os.path.join(dir_path, entry.name)))
+            else:
+                for name in os.listdir(dir_path):
+                    path = os.path.join(dir_path, name)
+                    if os.path.isdir(path):
+                        if (dir_pattern is None or dir_pattern.match(name) is None) \
+                                and (self._follow_links or not os.path.islink(path)):
+                            dirs.append(path)
+                    elif file_pattern is None or file_pattern.match(name) is None:
+                        files.append(lfEncode(path))
+        except OSError:
+            return None
+
+        return (mtime, dirs, files)
+
+    def _work(self, dirs, results, pending, stopped):
+        while True:
+            dir_path = dirs.get()
+            if dir_path is None:
+                return
+
+            listing = None if self._stop or stopped[0] else self.listDir(dir_path)
+            if listing is not None:
+                mtime, subdirs, files = listing
+                # a directory is put before its subdirectories are listed
+                results.put((dir_path, mtime, files))
+                with pending[1]:
+                    pending[0] += len(subdirs)
+                for path in subdirs:
+                    dirs.put(path)
+
+            with pending[1]:
+                pending[0] -= 1
+                done = pending[0] == 0
+            if done:
+                results.put(None)
+
+    def walk(self, dir, deadline=None):
+        """
+        yield a tuple (directory, mtime, files) for each directory in `dir`, including `dir` itself,
+        a directory is always yielded before its subdirectories.
+        `dir` can also be a list of directories, which are walked by the same threads.
+        `self.completed` is True if all the directories are walked before `deadline`.
+        """
+        roots = dir if isinstance(dir, list) else [dir]
+        self.completed = False
+        if not roots:
+            self.completed = True
+            return
+
+        dirs = Queue.Queue()
+        results = Queue.Queue()
+        pending = [len(roots), threading.Lock()]
+        stopped = [False]
+        for path in roots:
+            dirs.put(path)
+
+        threads = []
+        for i in range(self._thread_count):
+            t = threading.Thread(target=self._work, args=(dirs, results, pending, stopped))
+            t.daemon = True
+            t.start()
+            threads.append(t)
+
+        try:
+            while True:
+                if deadline is None:
+                    result = results.get()
+                else:
+                    try:
+                        result = results.get(timeout=max(deadline - time.time(), 0))
+                    except Queue.Empty:
+                        return
+
+                if result is None:
+                    self.completed = True
+                    return
+
+                yield result
+
+                if deadline is not None and time.time() > deadline:
+                    return
+        finally:
+            stopped[0] = True
+            for t in threads:
+                dirs.put(None)
+
+    def stop(self):
+        """
+        stop walking, the walks not finished yet end soon after
+        """
+        self._stop = True
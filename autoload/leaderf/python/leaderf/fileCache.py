@@ -0,0 +1,294 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import time
+import struct
+from array import array
+from contextlib import contextmanager
+
+if os.name == 'nt':
+    import msvcrt
+else:
+    import fcntl
+
+"""
+The binary format of a file list cache:
+
+    header:     magic, version, line count, icon count, size of the icon table, size of the blob
+    icon ids:   uint8 * line count, the index of the devicon of each line in the icon table,
+                only if icon count > 0
+    icon table: the devicons joined by '\n'
+    blob:       the lines, each of which ends with '\n'
+
+The integers are in native byte order, a cache written on a machine with
+another byte order is taken as invalid because its version does not match.
+"""
+
+CACHE_MAGIC = b'LFFC'
+CACHE_VERSION = 2
+_HEADER = struct.Struct('=4sIIIII')
+
+_MAX_ICON_COUNT = 256
+
+if sys.version_info >= (3, 0):
+
+    def _encode(str):
+        return str.encode('utf-8', errors='ignore')
+
+    def _decode(bytes):
+        return bytes.decode('utf-8', errors='ignore')
+
+    def _arrayToBytes(a):
+        return a.tobytes()
+
+else:
+
+    def _encode(str):
+        return str
+
+    def _decode(bytes):
+        return bytes
+
+    def _arrayToBytes(a):
+        return a.tostring()
+
+
+def _replace(src, dst):
+    try:
+        os.rename(src, dst)
+    except OSError:     # os.rename() does not overwrite an existing file on Windows
+        os.remove(dst)
+        os.rename(src, dst)
+
+def writeFileList(path, lines, icons=None):
+    """
+    write `lines` to the cache file `path`,
+    `icons` is the list of the devicons of `lines`, or None if there are no devicons.
+    The file is written to a temporary file first and then renamed,
+    so that a reader never sees it half written.
+    """
+    encoded = [_encode(line) for line in lines]
+    if encoded:
+        encoded.append(b'')     # the blob ends with '\n'
+    blob = b'\n'.join(encoded)
+
+    icon_table = []
+    icon_ids = array('B')
+    if icons is not None:
+        icon_index = {}
+        for icon in icons:
+            if icon not in icon_index:
+                if len(icon_index) == _MAX_ICON_COUNT:
+                    icon_table = []
+                    icon_ids = array('B')
+                    break
+                icon_index[icon] = len(icon_table)
+                icon_table.append(icon)
+            icon_ids.append(icon_index[icon])
+
+    icon_bytes = _encode('\n'.join(icon_table))
+
+    tmp_path = path + '.tmp%d' % os.getpid()
+    with open(tmp_path, 'wb') as f:
+        f.write(_HEADER.pack(CACHE_MAGIC, CACHE_VERSION, len(lines), len(icon_table), len(icon_bytes), len(blob)))
+        f.write(_arrayToBytes(icon_ids))
+        f.write(icon_bytes)
+        f.write(blob)
+
+    _replace(tmp_path, path)
+
+def readFileList(path):
+    """
+    return a tuple (lines, icons) read from the cache file `path`,
+    `icons` is None if the devicons are not saved.
+    return (None, None) if `path` does not exist or is not a valid cache file, e.g., an old text cache.
+    """
+    try:
+        with open(path, 'rb') as f:
+            buffer = f.read()
+    except (IOError, OSError):
+        return (None, None)
+
+    try:
+        magic, version, count, icon_count, icon_size, blob_size = _HEADER.unpack_from(buffer, 0)
+        if magic != CACHE_MAGIC or version != CACHE_VERSION:
+            return (None, None)
+
+        pos = _HEADER.size
+
+        if icon_count > 0:
+            icon_ids = buffer[pos:pos + count]
+            pos += count
+            icon_table = _decode(buffer[pos:pos + icon_size]).split('\n')
+            pos += icon_size
+
+        if len(buffer) != pos + blob_size:
+            return (None, None)
+
+        # the lines are decoded at once, which is much faster than one by one
+        lines = _decode(buffer[pos:]).split('\n')
+        lines.pop()     # the blob ends with '\n'
+        if len(lines) != count:
+            return (None, None)
+
+        if icon_count > 0:
+            icons = list(map(icon_table.__getitem__, bytearray(icon_ids)))
+        else:
+            icons = None
+
+        return (lines, icons)
+    except (struct.error, IndexError):
+        return (None, None)
+
+def writeDirList(path, header, dirs):
+    """
+    write `dirs` to the file `path` after the line `header`,
+    `dirs` is a list of (directory, mtime, the number of files in the directory).
+    """
+    writeFileList(path, [header] + ['%r %d %s' % (mtime, count, dir) for dir, mtime, count in dirs])
+
+def readDirList(path, header):
+    """
+    return the list of (directory, mtime, the number of files in the directory) read from `path`,
+    return None if `path` is not valid or its first line is not `header`.
+    """
+    lines, _ = readFileList(path)
+    if not lines or lines[0] != header:
+        return None
+
+    dirs = []
+    try:
+        for line in lines[1:]:
+            mtime, count, dir = line.split(' ', 2)
+            dirs.append((dir, float(mtime), int(count)))
+    except ValueError:
+        return None
+
+    return dirs
+
+
+class CacheIndex(object):
+    """
+    The index of the file list caches, it maps a directory to the time it is
+    last used and the name of its cache file. The directories end with os.sep.
+
+    The index is a text file, each line of which is "timestamp name directory",
+    e.g., "1496669495.329 cache_1496669495.329_1234 /foo/bar/".
+    It is read and written only in `with index.locked():`, which holds a lock
+    shared by all the Vim instances, and it is replaced atomically when written.
+    """
+    def __init__(self, path):
+        self._path = path
+        self._entries = {}  # {directory: [timestamp, name]}
+        self._modified = False
+
+    @contextmanager
+    def locked(self):
+        with open(self._path + '.lock', 'a+') as lock_file:
+            if os.name == 'nt':
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+            else:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                self._load()
+                yield self
+                if self._modified:
+                    self._save()
+            finally:
+                if os.name == 'nt':
+                    lock_file.seek(0)
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+                else:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _load(self):
+        self._entries = {}
+        self._modified = False
+        try:
+            with open(self._path, 'r') as f:
+                for line in f:
+                    fields = line.rstrip('\r\n').split(None, 2)
+                    if len(fields) == 3:
+                        self._entries[fields[2]] = [fields[0], fields[1]]
+        except (IOError, OSError):
+            pass
+
+    def _save(self):
+        tmp_path = self._path + '.tmp%d' % os.getpid()
+        with open(tmp_path, 'w') as f:
+            for dir, (timestamp, name) in self._entries.items():
+                f.write('%s %s %s\n' % (timestamp, name, dir))
+        _replace(tmp_path, self._path)
+        self._modified = False
+
+    def __len__(self):
+        return len(self._entries)
+
+    def getCacheName(self, dir):
+        """
+        return the name of the cache file of `dir`, or None if `dir` is not cached
+        """
+        entry = self._entries.get(dir)
+        return entry[1] if entry else None
+
+    def findAncestor(self, dir):
+        """
+        return the longest one of the cached directories that `dir` is in(including `dir` itself),
+        or None if there is none
+        """
+        path = dir
+        while True:
+            if path in self._entries:
+                return path
+            parent = os.path.dirname(path.rstrip(os.sep))
+            if not parent or parent == path.rstrip(os.sep):
+                return None
+            path = parent if parent.endswith(os.sep) else parent + os.sep
+
+    def findDescendant(self, dir):
+        """
+        return one of the cached directories that are in `dir`, or None if there is none
+        """
+        for path in self._entries:
+            if path.startswith(dir):
+                return path
+        return None
+
+    def findOldest(self):
+        """
+        return the cached directory that is used least recently
+        """
+        return min(self._entries, key=lambda dir: float(self._entries[dir][0]))
+
+    def touch(self, dir):
+        self._entries[dir][0] = '%.3f' % time.time()
+        self._modified = True
+
+    def add(self, dir, name=None):
+        """
+        add `dir` to the index and return the name of its cache file,
+        a new name is made if `name` is None.
+        """
+        timestamp = '%.3f' % time.time()
+        if name is None:
+            # unique among the entries and the files in the cache directory, which is safe in `locked()`
+            used = set(entry[1] for entry in self._entries.values())
+            cache_dir = os.path.dirname(self._path)
+            name = 'cache_%s_%d' % (timestamp, os.getpid())
+            count = 0
+            while name in used or os.path.exists(os.path.join(cache_dir, name)):
+                count += 1
+                name = 'cache_%s_%d_%d' % (timestamp, os.getpid(), count)
+        self._entries[dir] = [timestamp, name]
+        self._modified = True
+        return name
+
+    def remove(self, dir):
+        """
+        remove `dir` from the index and return the name of its cache file
+        """
+        self._modified = True
+        return self._entries.pop(dir)[1]
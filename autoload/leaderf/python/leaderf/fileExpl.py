@@ -5,17 +5,18 @@ import vim
 import re
 import os
 import os.path
-import fnmatch
 import time
 import locale
-import shutil
 from functools import wraps
 from .utils import *
 from .explorer import *
 from .manager import *
 from .asyncExecutor import AsyncExecutor
+from .fileCache import readFileList, writeFileList, readDirList, writeDirList, CacheIndex
+from .dirWalker import DirWalker
 from .devicons import (
     webDevIconsGetFileTypeSymbol,
+    webDevIconsStrLen,
     removeDevIcons,
     matchaddDevIconsDefault,
     matchaddDevIconsExact,
@@ -50,6 +51,65 @@ def showDevIcons(func):
 def format_line(line):
     return webDevIconsGetFileTypeSymbol(line) + line
 
+# the worker process of AsyncExecutor can prefix the devicons itself, see g:Lf_AsyncWorker
+format_line.devicons = True
+
+# ((PATH, PATHEXT), names of the executables in PATH)
+_path_executables = (None, frozenset())
+
+def getPathExecutables():
+    """
+    return the names that shutil.which() finds in PATH,
+    they are listed again only if PATH or PATHEXT changes.
+    """
+    global _path_executables
+    path = os.environ.get("PATH", os.defpath)
+    pathext = os.environ.get("PATHEXT", "")
+    if _path_executables[0] == (path, pathext):
+        return _path_executables[1]
+
+    dirs = path.split(os.pathsep)
+    if os.name == 'nt':
+        dirs.insert(0, os.curdir)
+        exts = [ext.lower() for ext in pathext.split(os.pathsep) if ext]
+
+    names = set()
+    for dir in dirs:
+        try:
+            entries = os.listdir(dir or os.curdir)
+        except OSError:
+            continue
+
+        for name in entries:
+            full_path = os.path.join(dir, name)
+            if os.name == 'nt':
+                root, ext = os.path.splitext(name)
+                if ext.lower() in exts and not os.path.isdir(full_path):
+                    names.add(name.lower())
+                    names.add(root.lower())
+            elif os.access(full_path, os.X_OK) and not os.path.isdir(full_path):
+                names.add(name)
+
+    _path_executables = ((path, pathext), frozenset(names))
+    return _path_executables[1]
+
+def filterExecutables(content):
+    """
+    yield the batches of `content` without the names of the executables in PATH,
+    the batches are filtered as they come, so `content` is not drained at once.
+    Only a line without a directory part can be such a name, which the set lookup
+    takes care of, since the names have no path separators.
+    """
+    executables = getPathExecutables()
+    for batch in content.batches():
+        if os.name == 'nt':
+            batch = [line for line in batch if line.lower() not in executables]
+        elif not executables.isdisjoint(batch):
+            batch = [line for line in batch if line not in executables]
+
+        if batch:
+            yield batch
+
 
 #*****************************************************
 # FileExplorer
@@ -62,107 +122,197 @@ class FileExplorer(Explorer):
                                        'LeaderF',
                                        'python' + lfEval("g:Lf_PythonVersion"),
                                        'file')
-        self._cache_index = os.path.join(self._cache_dir, 'cacheIndex')
+        self._cache_index = CacheIndex(os.path.join(self._cache_dir, 'cacheIndex'))
         self._external_cmd = None
         self._initCache()
         self._executor = []
         self._no_ignore = None
         self._cmd_work_dir = ""
+        self._walker = None
+        self._walk_result = None
 
     def _initCache(self):
         if not os.path.exists(self._cache_dir):
             os.makedirs(self._cache_dir)
-        if not os.path.exists(self._cache_index):
-            with lfOpen(self._cache_index, 'w', errors='ignore'):
-                pass
 
-    def _getFiles(self, dir):
-        start_time = time.time()
-        wildignore = lfEval("g:Lf_WildIgnore")
+    def _saveFileList(self, dir, file_list, icons=None, dir_mtimes=None):
+        """
+        save `file_list` as the cache of `dir`, if there are already g:Lf_NumberOfCache caches,
+        the cache of a subdirectory of `dir` or the least recently used one is replaced.
+        `dir_mtimes` is saved in the file `<cache>.dirs` for the incremental refresh,
+        the file is removed if `dir_mtimes` is empty or None.
+        """
+        with self._cache_index.locked() as index:
+            cache_file_name = index.getCacheName(dir)
+            if cache_file_name is not None:
+                index.touch(dir)
+            elif len(index) < int(lfEval("g:Lf_NumberOfCache")):
+                cache_file_name = index.add(dir)
+            else:
+                path = index.findDescendant(dir)
+                if path is None:
+                    path = index.findOldest()
+                cache_file_name = index.add(dir, index.remove(path))
+            cache_file_name = os.path.join(self._cache_dir, cache_file_name)
+            writeFileList(cache_file_name, file_list, icons)
+            if dir_mtimes:
+                writeDirList(cache_file_name + '.dirs', repr(self._getWalkOptions()), dir_mtimes)
+            elif os.path.exists(cache_file_name + '.dirs'):
+                os.remove(cache_file_name + '.dirs')
+
+    def _getWalkOptions(self):
+        return (lfEval("g:Lf_WildIgnore"), lfEval("g:Lf_FollowLinks") == '1')
+
+    def _getFiles(self, dir, dir_mtimes=None):
+        """
+        return the files in `dir`,
+        if `dir_mtimes` is not None, (directory, mtime, the number of its files) of each directory
+        is appended to it, it is left empty if the walk is not finished in g:Lf_IndexTimeLimit.
+        """
+        deadline = time.time() + float(lfEval("g:Lf_IndexTimeLimit"))
+        walker = DirWalker(*self._getWalkOptions())
         file_list = []
-        for dir_path, dirs, files in os.walk(dir, followlinks = False
-                if lfEval("g:Lf_FollowLinks") == '0' else True):
-            dirs[:] = [i for i in dirs if True not in (fnmatch.fnmatch(i,j)
-                       for j in wildignore.get('dir', []))]
-            for name in files:
-                if True not in (fnmatch.fnmatch(name, j)
-                                for j in wildignore.get('file', [])):
-                    file_list.append(lfEncode(os.path.join(dir_path,name)))
-                if time.time() - start_time > float(
-                        lfEval("g:Lf_IndexTimeLimit")):
-                    return file_list
+        if dir_mtimes is None:
+            dir_mtimes = []
+        for dir_path, mtime, files in walker.walk(dir, deadline):
+            file_list.extend(files)
+            dir_mtimes.append((dir_path, mtime, len(files)))
+        if not walker.completed:
+            del dir_mtimes[:]
         return file_list
 
+    def _walkFiles(self, dir):
+        """
+        return a generator that yields the lines of the files in `dir` as soon as they are found,
+        the lines are the same as those self._getFileList(dir) returns,
+        the files are cached when self.setContent() is called.
+        """
+        deadline = time.time() + float(lfEval("g:Lf_IndexTimeLimit"))
+        walker = DirWalker(*self._getWalkOptions())
+        self._walker = walker
+        self._walk_result = None
+
+        if lfEval("g:Lf_ShowRelativePath") == '1':
+            # os.path.relpath() is too slow!
+            cwd = lfGetCwd() if self._cmd_work_dir == "" else dir
+            cwd_length = len(lfEncode(cwd))
+            if not cwd.endswith(os.sep):
+                cwd_length += 1
+        else:
+            cwd_length = 0
+        show_icons = lfEval("get(g:, 'Lf_ShowDevIcons', 1)") == "1"
+
+        def generate():
+            file_list = []
+            dir_mtimes = []
+            for dir_path, mtime, files in walker.walk(dir, deadline):
+                file_list.extend(files)
+                dir_mtimes.append((dir_path, mtime, len(files)))
+                for line in files:
+                    line = line[cwd_length:]
+                    yield format_line(line) if show_icons else line
+
+            self._walk_result = (dir, file_list, dir_mtimes if walker.completed else [])
+
+        return generate()
+
+    def _getChangedFiles(self, file_list, dir_mtimes):
+        """
+        return a tuple (file_list, dir_mtimes) updated from `file_list` and `dir_mtimes`,
+        only the directories whose mtime changes are listed again, the new directories are walked.
+        return (None, None) if it is not finished in g:Lf_IndexTimeLimit.
+        """
+        deadline = time.time() + float(lfEval("g:Lf_IndexTimeLimit"))
+        walker = DirWalker(*self._getWalkOptions())
+
+        # the mtime of a directory changes only when an entry is added, removed or renamed in it,
+        # so the subdirectories recorded are compared with those listed again to find the removed ones
+        children = {}
+        for dir_path, _, _ in dir_mtimes[1:]:   # dir_mtimes[0] is the top directory
+            children.setdefault(os.path.join(os.path.dirname(dir_path), ''), set()).add(dir_path)
+
+        new_file_list = []
+        new_dir_mtimes = []
+        removed = set()
+        new_dirs = []
+        start = 0
+        for dir_path, mtime, count in dir_mtimes:
+            end = start + count
+            if os.path.join(os.path.dirname(dir_path), '') in removed:
+                removed.add(os.path.join(dir_path, ''))
+            else:
+                try:
+                    unchanged = os.stat(dir_path).st_mtime == mtime
+                except OSError:
+                    unchanged = False
+
+                if unchanged:
+                    new_file_list.extend(file_list[start:end])
+                    new_dir_mtimes.append((dir_path, mtime, count))
+                else:
+                    listing = walker.listDir(dir_path)
+                    if listing is None:
+                        removed.add(os.path.join(dir_path, ''))
+                    else:
+                        new_mtime, dirs, files = listing
+                        new_file_list.extend(files)
+                        new_dir_mtimes.append((dir_path, new_mtime, len(files)))
+                        recorded = children.get(os.path.join(dir_path, ''), set())
+                        for path in recorded.difference(dirs):
+                            removed.add(os.path.join(path, ''))
+                        new_dirs.extend(path for path in dirs if path not in recorded)
+
+                if time.time() > deadline:
+                    return (None, None)
+            start = end
+
+        # the new directories are walked at once, so that the threads of the walker are started only once
+        for dir_path, mtime, files in walker.walk(new_dirs, deadline):
+            new_file_list.extend(files)
+            new_dir_mtimes.append((dir_path, mtime, len(files)))
+        if not walker.completed:
+            return (None, None)
+
+        return (new_file_list, new_dir_mtimes)
+
+    def _isCached(self, dir):
+        """
+        return True if the files in `dir` can be got from the cache of `dir` or its ancestor
+        """
+        dir = dir if dir.endswith(os.sep) else dir + os.sep
+        with self._cache_index.locked() as index:
+            return index.findAncestor(dir) is not None
+
     @showDevIcons
     @showRelativePath
     def _getFileList(self, dir):
         dir = dir if dir.endswith(os.sep) else dir + os.sep
-        with lfOpen(self._cache_index, 'r+', errors='ignore') as f:
-            lines = f.readlines()
-            path_length = 0
-            target = -1
-            for i, line in enumerate(lines):
-                path = line.split(None, 2)[2].strip()
-                if dir.startswith(path) and len(path) > path_length:
-                    path_length = len(path)
-                    target = i
-
-            if target != -1:
-                lines[target] = re.sub('^\S*',
-                                       '%.3f' % time.time(),
-                                       lines[target])
-                f.seek(0)
-                f.truncate(0)
-                f.writelines(lines)
-                with lfOpen(os.path.join(self._cache_dir,
-                                         lines[target].split(None, 2)[1]),
-                            'r', errors='ignore') as cache_file:
-                    if lines[target].split(None, 2)[2].strip() == dir:
-                        return cache_file.readlines()
-                    else:
-                        file_list = [line for line in cache_file.readlines()
-                                     if line.startswith(dir)]
-                        if file_list == []:
-                            file_list = self._getFiles(dir)
-                        return file_list
-            else:
-                start_time = time.time()
+        with self._cache_index.locked() as index:
+            path = index.findAncestor(dir)
+            if path is not None:
+                index.touch(path)
+                file_list, _ = readFileList(os.path.join(self._cache_dir, index.getCacheName(path)))
+
+        if path == dir:
+            if file_list is None: # e.g., the cache is of the old text format
+                dir_mtimes = []
+                file_list = self._getFiles(dir, dir_mtimes)
+                self._saveFileList(dir, file_list, dir_mtimes=dir_mtimes)
+            return file_list
+        elif path is not None:
+            file_list = [line for line in file_list or []
+                         if line.startswith(dir)]
+            if file_list == []:
                 file_list = self._getFiles(dir)
-                delta_seconds = time.time() - start_time
-                if delta_seconds > float(lfEval("g:Lf_NeedCacheTime")):
-                    cache_file_name = ''
-                    if len(lines) < int(lfEval("g:Lf_NumberOfCache")):
-                        f.seek(0, 2)
-                        ts = time.time()
-                        line = '%.3f cache_%.3f %s\n' % (ts, ts, dir)
-                        f.write(line)
-                        cache_file_name = 'cache_%.3f' % ts
-                    else:
-                        for i, line in enumerate(lines):
-                            path = line.split(None, 2)[2].strip()
-                            if path.startswith(dir):
-                                cache_file_name = line.split(None, 2)[1].strip()
-                                line = '%.3f %s %s\n' % (time.time(),
-                                        cache_file_name, dir)
-                                break
-                        if cache_file_name == '':
-                            timestamp = lines[0].split(None, 2)[0]
-                            oldest = 0
-                            for i, line in enumerate(lines):
-                                if line.split(None, 2)[0] < timestamp:
-                                    timestamp = line.split(None, 2)[0]
-                                    oldest = i
-                            cache_file_name = lines[oldest].split(None, 2)[1].strip()
-                            lines[oldest] = '%.3f %s %s\n' % (time.time(),
-                                            cache_file_name, dir)
-                        f.seek(0)
-                        f.truncate(0)
-                        f.writelines(lines)
-                    with lfOpen(os.path.join(self._cache_dir, cache_file_name),
-                                'w', errors='ignore') as cache_file:
-                        for line in file_list:
-                            cache_file.write(line + '\n')
-                return file_list
+            return file_list
+        else:
+            start_time = time.time()
+            dir_mtimes = []
+            file_list = self._getFiles(dir, dir_mtimes)
+            delta_seconds = time.time() - start_time
+            if delta_seconds > float(lfEval("g:Lf_NeedCacheTime")):
+                self._saveFileList(dir, file_list, dir_mtimes=dir_mtimes)
+            return file_list
 
     @showDevIcons
     def _readFromFileList(self, files):
@@ -175,27 +325,47 @@ class FileExplorer(Explorer):
     def _refresh(self):
         dir = os.path.abspath(self._cur_dir)
         dir = dir if dir.endswith(os.sep) else dir + os.sep
-        with lfOpen(self._cache_index, 'r+', errors='ignore') as f:
-            lines = f.readlines()
-            path_length = 0
-            target = -1
-            for i, line in enumerate(lines):
-                path = line.split(None, 2)[2].strip()
-                if dir.startswith(path) and len(path) > path_length:
-                    path_length = len(path)
-                    target = i
-
-            if target != -1:
-                lines[target] = re.sub('^\S*', '%.3f' % time.time(), lines[target])
-                f.seek(0)
-                f.truncate(0)
-                f.writelines(lines)
-                cache_file_name = lines[target].split(None, 2)[1]
-                file_list = self._getFiles(dir)
-                with lfOpen(os.path.join(self._cache_dir, cache_file_name),
-                            'w', errors='ignore') as cache_file:
-                    for line in file_list:
-                        cache_file.write(line + '\n')
+        with self._cache_index.locked() as index:
+            path = index.findAncestor(dir)
+            if path is not None:
+                cache_file_name = os.path.join(self._cache_dir, index.getCacheName(path))
+                file_list, icons = readFileList(cache_file_name)
+                dir_mtimes = readDirList(cache_file_name + '.dirs', repr(self._getWalkOptions()))
+                if file_list is None or dir_mtimes is None \
+                        or sum(count for _, _, count in dir_mtimes) != len(file_list):
+                    dir_mtimes = None
+
+        if path == dir:
+            if dir_mtimes is not None:
+                # only the directories changed are listed again
+                file_list, dir_mtimes = self._getChangedFiles(file_list, dir_mtimes)
+            else:
+                file_list = None
+
+            if file_list is None:
+                dir_mtimes = []
+                file_list = self._getFiles(dir, dir_mtimes)
+            if icons is not None:
+                icons = [webDevIconsGetFileTypeSymbol(line) for line in file_list]
+            self._saveFileList(dir, file_list, icons, dir_mtimes)
+        elif path is not None:
+            # only the files in `dir` are refreshed in the cache of its ancestor,
+            # so are the devicons and the directories recorded of `dir`
+            new_dir_mtimes = []
+            new_file_list = self._getFiles(dir, new_dir_mtimes)
+            if file_list is None:
+                file_list = []
+            kept = [i for i, line in enumerate(file_list) if not line.startswith(dir)]
+            file_list = [file_list[i] for i in kept] + new_file_list
+            if icons is not None:
+                icons = [icons[i] for i in kept] + [webDevIconsGetFileTypeSymbol(line)
+                                                    for line in new_file_list]
+            if dir_mtimes is not None and new_dir_mtimes:
+                dir_mtimes = [item for item in dir_mtimes
+                              if not os.path.join(item[0], '').startswith(dir)] + new_dir_mtimes
+            else:
+                dir_mtimes = None
+            self._saveFileList(path, file_list, icons, dir_mtimes)
 
     def _exists(self, path, dir):
         """
@@ -470,115 +640,68 @@ class FileExplorer(Explorer):
 
         return cmd
 
-    @removeDevIcons
     def _writeCache(self, content):
+        # the devicons are saved apart, so that they need not be computed again when read
+        if lfEval("get(g:, 'Lf_ShowDevIcons', 1)") == "1":
+            start = webDevIconsStrLen()
+            icons = [line[:start] for line in content]
+            content = [line[start:] for line in content]
+        else:
+            icons = None
+
         dir = self._cur_dir if self._cur_dir.endswith(os.sep) else self._cur_dir + os.sep
-        with lfOpen(self._cache_index, 'r+', errors='ignore') as f:
-            lines = f.readlines()
-            target = -1
-            for i, line in enumerate(lines):
-                if dir == line.split(None, 2)[2].strip():
-                    target = i
-                    break
-
-            if target != -1:    # already cached
-                if time.time() - self._cmd_start_time <= float(lfEval("g:Lf_NeedCacheTime")):
-                    os.remove(os.path.join(self._cache_dir, lines[target].split(None, 2)[1]))
-                    del lines[target]
-                    f.seek(0)
-                    f.truncate(0)
-                    f.writelines(lines)
-                    return
-
-                # update the time
-                lines[target] = re.sub('^\S*',
-                                       '%.3f' % time.time(),
-                                       lines[target])
-                f.seek(0)
-                f.truncate(0)
-                f.writelines(lines)
-                with lfOpen(os.path.join(self._cache_dir,
-                                         lines[target].split(None, 2)[1]),
-                            'w', errors='ignore') as cache_file:
-                    for line in content:
-                        cache_file.write(line + '\n')
-            else:
-                if time.time() - self._cmd_start_time <= float(lfEval("g:Lf_NeedCacheTime")):
-                    return
-
-                cache_file_name = ''
-                if len(lines) < int(lfEval("g:Lf_NumberOfCache")):
-                    f.seek(0, 2)
-                    ts = time.time()
-                    # e.g., line = "1496669495.329 cache_1496669495.329 /foo/bar"
-                    line = '%.3f cache_%.3f %s\n' % (ts, ts, dir)
-                    f.write(line)
-                    cache_file_name = 'cache_%.3f' % ts
-                else:
-                    timestamp = lines[0].split(None, 2)[0]
-                    oldest = 0
-                    for i, line in enumerate(lines):
-                        if line.split(None, 2)[0] < timestamp:
-                            timestamp = line.split(None, 2)[0]
-                            oldest = i
-                    cache_file_name = lines[oldest].split(None, 2)[1].strip()
-                    lines[oldest] = '%.3f %s %s\n' % (time.time(), cache_file_name, dir)
-
-                    f.seek(0)
-                    f.truncate(0)
-                    f.writelines(lines)
-
-                with lfOpen(os.path.join(self._cache_dir, cache_file_name),
-                            'w', errors='ignore') as cache_file:
-                    for line in content:
-                        cache_file.write(line + '\n')
+        if time.time() - self._cmd_start_time <= float(lfEval("g:Lf_NeedCacheTime")):
+            with self._cache_index.locked() as index:
+                if index.getCacheName(dir) is not None:    # already cached
+                    cache_file_name = os.path.join(self._cache_dir, index.remove(dir))
+                    os.remove(cache_file_name)
+                    if os.path.exists(cache_file_name + '.dirs'):
+                        os.remove(cache_file_name + '.dirs')
+            return
+
+        self._saveFileList(dir, content, icons)
 
-    @showDevIcons
     def _getFilesFromCache(self):
         dir = self._cur_dir if self._cur_dir.endswith(os.sep) else self._cur_dir + os.sep
-        with lfOpen(self._cache_index, 'r+', errors='ignore') as f:
-            lines = f.readlines()
-            target = -1
-            for i, line in enumerate(lines):
-                if dir == line.split(None, 2)[2].strip():
-                    target = i
-                    break
-
-            if target != -1:    # already cached
-                # update the time
-                lines[target] = re.sub('^\S*',
-                                       '%.3f' % time.time(),
-                                       lines[target])
-                f.seek(0)
-                f.truncate(0)
-                f.writelines(lines)
-                with lfOpen(os.path.join(self._cache_dir,
-                                         lines[target].split(None, 2)[1]),
-                            'r', errors='ignore') as cache_file:
-                    file_list = cache_file.readlines()
-                    if not file_list: # empty
-                        return None
-
-                    if lfEval("g:Lf_ShowRelativePath") == '1':
-                        if os.path.isabs(file_list[0]):
-                            # os.path.relpath() is too slow!
-                            cwd_length = len(lfEncode(dir))
-                            if not dir.endswith(os.sep):
-                                cwd_length += 1
-                            return [line[cwd_length:] for line in file_list]
-                        else:
-                            return file_list
-                    else:
-                        if os.path.isabs(file_list[0]):
-                            return file_list
-                        else:
-                            return [os.path.join(lfEncode(dir), file) for file in file_list]
-            else:
+        with self._cache_index.locked() as index:
+            cache_file_name = index.getCacheName(dir)
+            if cache_file_name is not None:    # already cached
+                index.touch(dir)
+                file_list, icons = readFileList(os.path.join(self._cache_dir, cache_file_name))
+
+        if cache_file_name is not None:
+            if not file_list: # empty, or the cache is of the old text format
                 return None
 
+            if lfEval("g:Lf_ShowRelativePath") == '1':
+                if os.path.isabs(file_list[0]):
+                    # os.path.relpath() is too slow!
+                    cwd_length = len(lfEncode(dir))
+                    if not dir.endswith(os.sep):
+                        cwd_length += 1
+                    file_list = [line[cwd_length:] for line in file_list]
+            else:
+                if not os.path.isabs(file_list[0]):
+                    file_list = [os.path.join(lfEncode(dir), file) for file in file_list]
+
+            if lfEval("get(g:, 'Lf_ShowDevIcons', 1)") == "1":
+                if icons is not None and len(icons[0]) == webDevIconsStrLen():
+                    return [icon + line for icon, line in zip(icons, file_list)]
+                else:
+                    return [format_line(line) for line in file_list]
+            else:
+                return file_list
+        else:
+            return None
+
     def setContent(self, content):
         self._content = content
-        if lfEval("g:Lf_UseCache") == '1':
+        if self._walk_result is not None:   # the content is from self._walkFiles()
+            dir, file_list, dir_mtimes = self._walk_result
+            self._walk_result = None
+            if time.time() - self._cmd_start_time > float(lfEval("g:Lf_NeedCacheTime")):
+                self._saveFileList(dir, file_list, dir_mtimes=dir_mtimes)
+        elif lfEval("g:Lf_UseCache") == '1':
             self._writeCache(content)
 
     def getContentFromMultiDirs(self, dirs, **kwargs):
@@ -680,12 +803,11 @@ class FileExplorer(Explorer):
                     else:
                         content = executor.execute(cmd, encoding=lfEval("&encoding"))
                 self._cmd_start_time = time.time()
-                result = []
-                for c in content:
-                    if shutil.which(c) is None:
-                        result.append(c)
-                content = result
-                return content
+                return AsyncExecutor.Result(filterExecutables(content), batched=True)
+            elif not self._isCached(dir):
+                # the files are displayed while the directory is being walked
+                self._cmd_start_time = time.time()
+                return AsyncExecutor.Result(self._walkFiles(dir if dir.endswith(os.sep) else dir + os.sep))
             else:
                 self._content = self._getFileList(dir)
 
@@ -720,6 +842,9 @@ class FileExplorer(Explorer):
         for exe in self._executor:
             exe.killProcess()
         self._executor = []
+        if self._walker is not None:
+            self._walker.stop()
+            self._walker = None
 
 
 #*****************************************************
@@ -8,7 +8,6 @@ import sys
 import os.path
 import tempfile
 import itertools
-import multiprocessing
 from .utils import *
 from .explorer import *
 from .manager import *
@@ -86,7 +85,7 @@ class FunctionExplorer(Explorer):
 
     def _getFunctionList(self):
         buffers = [b for b in vim.buffers]
-        n = multiprocessing.cpu_count()
+        n = lfCpuCount()
         for i in range(0, len(vim.buffers), n):
             func_list = []
             exe_result = []
@@ -248,6 +248,9 @@ class LfInstance(object):
         self._tabpage_object = None
         self._window_object = None
         self._buffer_object = None
+        self._buffer_lines = None   # the lines written by setBuffer() last time
+        self._buffer_changedtick = -1
+        self._buffer_lines_number = -1  # the number of the buffer that `_buffer_lines` were written to
         self._buffer_name = 'Leaderf://' + category + '/LeaderF'
         self._input_buffer_number = -1
         self._stl_buffer_number = -1
@@ -1218,7 +1221,42 @@ class LfInstance(object):
                                    % escQuote(i).replace('\x00', '\x01'))) + columns - 1)// columns
         return num
 
+    def _getBufferChangedtick(self):
+        return int(lfEval("getbufvar(%d, 'changedtick')" % self._buffer_object.number))
+
+    def _updateBuffer(self, lines):
+        """
+        make the buffer the same as `lines`, only the lines that differ from those
+        written last time are replaced, e.g., a truncated tail or a short splice.
+        The buffer is replaced as a whole if it is not the buffer written last time
+        or it has been changed elsewhere since then.
+        """
+        buffer = self._buffer_object
+        old_lines = self._buffer_lines
+        if (old_lines is None or not old_lines or not lines
+                or buffer.number != self._buffer_lines_number
+                or self._getBufferChangedtick() != self._buffer_changedtick):
+            buffer[:] = lines
+        elif old_lines != lines:
+            old_len = len(old_lines)
+            new_len = len(lines)
+            n = min(old_len, new_len)
+            start = 0
+            while start < n and old_lines[start] == lines[start]:
+                start += 1
+            end = 0
+            while end < n - start and old_lines[old_len - end - 1] == lines[new_len - end - 1]:
+                end += 1
+            buffer[start:old_len - end] = lines[start:new_len - end]
+
+        # `lines` may be changed by the caller later
+        self._buffer_lines = lines[:]
+        self._buffer_lines_number = buffer.number
+        self._buffer_changedtick = self._getBufferChangedtick()
+
     def setBuffer(self, content, need_copy=False):
+        if not isinstance(content, list): # e.g., a ResultView returned by fuzzyEngine
+            content = list(content)
         self._cur_buffer_name_ignored = False
         if self._ignore_cur_buffer_name:
             if self._win_pos == 'popup':
@@ -1249,12 +1287,13 @@ class LfInstance(object):
                 orig_row = self._window_object.cursor[0]
                 orig_buf_len = len(self._buffer_object)
 
-                self._buffer_object[:] = content[::-1]
+                lines = content[::-1]
+                self._updateBuffer(lines)
                 buffer_len = len(self._buffer_object)
                 if buffer_len < self._initial_win_height:
                     if "--nowrap" not in self._arguments:
                         self._window_object.height = min(self._initial_win_height,
-                                                         self._actualLength(self._buffer_object))
+                                                         self._actualLength(lines))
                     else:
                         self._window_object.height = buffer_len
                 elif self._window_object.height < self._initial_win_height:
@@ -1271,14 +1310,14 @@ class LfInstance(object):
                 self.setLineNumber()
             else:
                 orig_row = self._window_object.cursor[0]
-                self._buffer_object[:] = content
+                self._updateBuffer(content)
 
                 if self._auto_resize and self._win_pos not in ('popup', 'floatwin'):
                     buffer_len = len(self._buffer_object)
                     if buffer_len < self._initial_win_height:
                         if "--nowrap" not in self._arguments:
                             self._window_object.height = min(self._initial_win_height,
-                                                             self._actualLength(self._buffer_object))
+                                                             self._actualLength(content))
                         else:
                             self._window_object.height = buffer_len
                     elif self._window_object.height < self._initial_win_height:
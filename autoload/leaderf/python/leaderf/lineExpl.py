@@ -152,6 +152,7 @@ class LineExplManager(Manager):
         lfCmd("echohl WarningMsg | redraw | echo ' Output result to location list.' | echohl NONE")
 
     def _getFormatedContents(self):
+        self._extendBuffer(True)
         items = []
         for line in self._instance._buffer_object[self._help_length:]:
             text, info = line.rsplit("\t", 1)
@@ -9,7 +9,6 @@ import time
 import operator
 import itertools
 import threading
-import multiprocessing
 from functools import partial
 from functools import wraps
 from .instance import LfInstance
@@ -26,7 +25,6 @@ is_fuzzyEngine_C = False
 try:
     import fuzzyEngine
     is_fuzzyEngine_C = True
-    cpu_count = multiprocessing.cpu_count()
     lfCmd("let g:Lf_fuzzyEngine_C = 1")
 except ImportError:
     lfCmd("let g:Lf_fuzzyEngine_C = 0")
@@ -39,6 +37,10 @@ try:
 except ImportError:
     lfCmd("let g:Lf_fuzzyMatch_C = 0")
 
+# the number of distinct non-ASCII characters a pattern of the C extensions can have,
+# see MAX_SYMBOL_COUNT in fuzzyMatch.h
+MAX_SYMBOL_COUNT = 31
+
 if sys.version_info >= (3, 0):
     def isAscii(str):
         try:
@@ -46,6 +48,13 @@ if sys.version_info >= (3, 0):
             return True
         except UnicodeEncodeError:
             return False
+
+    def isCSupported(pattern):
+        """
+        return True if `pattern` can be matched by the C extensions,
+        they match the pattern against the UTF-8 bytes of the text
+        """
+        return len(set(c for c in pattern if c >= '\x80')) <= MAX_SYMBOL_COUNT
 else:
     def isAscii(str):
         try:
@@ -54,6 +63,16 @@ else:
         except UnicodeDecodeError:
             return False
 
+    def isCSupported(pattern):
+        """
+        return True if `pattern` can be matched by the C extensions,
+        they match the pattern against the UTF-8 bytes of the text
+        """
+        if isAscii(pattern):
+            return True
+        return (lf_encoding == 'utf-8'
+                and len(set(c for c in pattern.decode('utf-8', 'ignore') if c >= u'\x80')) <= MAX_SYMBOL_COUNT)
+
 
 def modifiableController(func):
     @wraps(func)
@@ -106,17 +125,28 @@ class Manager(object):
         self._explorer = None
         self._content = []
         self._index = 0
+        self._search_cmdline = ''
         self._help_length = 0
         self._show_help = False
         self._selections = {}
         self._highlight_pos = []
         self._highlight_pos_list = []
         self._highlight_refine_pos = []
+        self._highlight_start = 0
         self._highlight_ids = []
         self._orig_line = None
         self._fuzzy_engine = None
+        self._thread_count = 1
+        self._digest_param = None
+        self._corpus = None
+        self._sort_rest = False
         self._result_content = []
+        self._buffer_limit = 0
         self._reader_thread = None
+        # the reader thread waits while this many lines it has read are not consumed by the UI
+        self._content_high_water = 200000
+        self._content_consumed = 0
+        self._content_cond = threading.Condition()
         self._timer_id = None
         self._highlight_method = lambda : None
         self._orig_cwd = None
@@ -177,6 +207,22 @@ class Manager(object):
             if maparg == {} or maparg.get("buffer", "0") == "0" :
                 lfCmd("nnoremap <buffer> <silent> {} {}".format(lhs, rhs))
 
+    def _defineJumpMaps(self):
+        """
+        the buffer holds only part of the results, `G` or `gg` must write the rest before jumping,
+        and so must `/` or `?` before searching
+        """
+        for lhs in ('gg', 'G'):
+            maparg = lfEval("maparg('{}', 'n', 0, 1)".format(lhs))
+            if maparg == {} or maparg.get("buffer", "0") == "0" :
+                lfCmd("nnoremap <buffer> <silent> {0} :<C-U>exec g:Lf_py \"import ctypes; "
+                      "ctypes.cast({1}, ctypes.py_object).value.jump('{0}')\"<CR>".format(lhs, id(self)))
+        for lhs in ('/', '?'):
+            maparg = lfEval("maparg('{}', 'n', 0, 1)".format(lhs))
+            if maparg == {} or maparg.get("buffer", "0") == "0" :
+                lfCmd("nnoremap <buffer> <silent> {0} :<C-U>exec g:Lf_py \"import ctypes; "
+                      "ctypes.cast({1}, ctypes.py_object).value._extendBuffer(True)\"<CR>{0}".format(lhs, id(self)))
+
     def _cmdExtension(self, cmd):
         """
         this function can be overridden to add new cmd
@@ -309,6 +355,7 @@ class Manager(object):
             self._defineMaps()
             self._defineCommonMaps()
             self._defineNormalCommandMaps()
+            self._defineJumpMaps()
 
             id = int(lfEval("matchadd('Lf_hl_cursorline', '.*\%#.*', -100)"))
             self._match_ids.append(id)
@@ -319,7 +366,9 @@ class Manager(object):
             self._match_ids.append(id)
 
         if is_fuzzyEngine_C:
-            self._fuzzy_engine = fuzzyEngine.createFuzzyEngine(cpu_count, False)
+            self._thread_count = lfThreadCount()
+            self._fuzzy_engine = fuzzyEngine.createFuzzyEngine(self._thread_count, False)
+            self._corpus = fuzzyEngine.createCorpus()
 
     def _beforeExit(self):
         if self._getInstance().window.valid:
@@ -330,6 +379,7 @@ class Manager(object):
         if self._fuzzy_engine:
             fuzzyEngine.closeFuzzyEngine(self._fuzzy_engine)
             self._fuzzy_engine = None
+            self._corpus = None
 
         if self._reader_thread and self._reader_thread.is_alive():
             self._stop_reader_thread = True
@@ -363,7 +413,8 @@ class Manager(object):
         if self._cli.pattern and self._index == 0:
             self._search(self._content)
             if len(self._getInstance().buffer) < len(self._result_content):
-                self._getInstance().appendBuffer(self._result_content[self._initial_count:])
+                self._sortRest()
+                self._getInstance().appendBuffer(self._result_content[self._initial_count:self._buffer_limit])
 
     def _bangReadFinished(self):
         pass
@@ -1155,17 +1206,20 @@ class Manager(object):
         """
         direction is in {'j', 'k'}
         """
+        self._extendBuffer()
         if direction == 'j' and self._getInstance().window.cursor[0] == len(self._getInstance().buffer):
             lfCmd("noautocmd call win_execute(%d, 'norm! gg')" % (self._getInstance().getPopupWinId()))
         elif direction == 'k' and self._getInstance().window.cursor[0] == 1:
             lfCmd("noautocmd call win_execute(%d, 'norm! G')" % (self._getInstance().getPopupWinId()))
         else:
             lfCmd("noautocmd call win_execute(%d, 'norm! %s')" % (self._getInstance().getPopupWinId(), direction))
+        self._updateViewport()
 
     def moveAndPreview(self, direction):
         """
         direction is in {'j', 'k', 'Down', 'Up', 'PageDown', 'PageUp'}
         """
+        self._extendBuffer()
         if direction in ("j", "Down") and self._getInstance().window.cursor[0] == len(self._getInstance().buffer):
             lfCmd('noautocmd exec "norm! gg"')
         elif direction in ("k", "Up") and self._getInstance().window.cursor[0] == 1:
@@ -1175,6 +1229,7 @@ class Manager(object):
                 lfCmd('noautocmd exec "norm! \<{}>"'.format(direction))
             else:
                 lfCmd('noautocmd exec "norm! {}"'.format(direction))
+        self._updateViewport()
 
         if self._getInstance().getWinPos() == 'floatwin':
             self._cli._buildPopupPrompt()
@@ -1182,22 +1237,20 @@ class Manager(object):
         self._previewResult(False)
 
     def _toUp(self):
+        self._extendBuffer()
         if self._getInstance().getWinPos() == 'popup':
             if self._getInstance().window.cursor[0] == 1:
                 lfCmd("noautocmd call win_execute(%d, 'norm! G')" % (self._getInstance().getPopupWinId()))
             else:
                 lfCmd("noautocmd call win_execute(%d, 'norm! k')" % (self._getInstance().getPopupWinId()))
             self._getInstance().refreshPopupStatusline()
+            self._updateViewport()
             return
 
         adjust = False
         if self._getInstance().isReverseOrder() and self._getInstance().getCurrentPos()[0] == 1:
             adjust = True
             self._setResultContent()
-            if self._cli.pattern and self._cli.isFuzzy \
-                    and len(self._highlight_pos) < (len(self._getInstance().buffer) - self._help_length) // self._getUnit() \
-                    and len(self._highlight_pos) < int(lfEval("g:Lf_NumberOfHighlight")):
-                self._highlight_method()
 
         if self._getInstance().window.cursor[0] == 1:
             lfCmd("noautocmd norm! G")
@@ -1207,17 +1260,21 @@ class Manager(object):
         if adjust:
             lfCmd("norm! zt")
 
+        self._updateViewport()
+
         self._getInstance().setLineNumber()
         lfCmd("setlocal cursorline!")   # these two help to redraw the statusline,
         lfCmd("setlocal cursorline!")   # also fix a weird bug of vim
 
     def _toDown(self):
+        self._extendBuffer()
         if self._getInstance().getWinPos() == 'popup':
             if self._getInstance().window.cursor[0] == len(self._getInstance().buffer):
                 lfCmd("noautocmd call win_execute(%d, 'norm! gg')" % (self._getInstance().getPopupWinId()))
             else:
                 lfCmd("noautocmd call win_execute(%d, 'norm! j')" % (self._getInstance().getPopupWinId()))
             self._getInstance().refreshPopupStatusline()
+            self._updateViewport()
             return
 
         if not self._getInstance().isReverseOrder() \
@@ -1228,6 +1285,7 @@ class Manager(object):
             lfCmd("noautocmd norm! gg")
         else:
             lfCmd("noautocmd norm! j")
+        self._updateViewport()
         self._getInstance().setLineNumber()
         lfCmd("setlocal cursorline!")   # these two help to redraw the statusline,
         lfCmd("setlocal cursorline!")   # also fix a weird bug of vim
@@ -1236,16 +1294,14 @@ class Manager(object):
         if self._getInstance().getWinPos() == 'popup':
             lfCmd("""call win_execute(%d, 'exec "norm! \<PageUp>"')""" % (self._getInstance().getPopupWinId()))
             self._getInstance().refreshPopupStatusline()
+            self._updateViewport()
             return
 
         if self._getInstance().isReverseOrder():
             self._setResultContent()
-            if self._cli.pattern and self._cli.isFuzzy \
-                    and len(self._highlight_pos) < (len(self._getInstance().buffer) - self._help_length) // self._getUnit() \
-                    and len(self._highlight_pos) < int(lfEval("g:Lf_NumberOfHighlight")):
-                self._highlight_method()
 
         lfCmd('noautocmd exec "norm! \<PageUp>"')
+        self._updateViewport()
 
         self._getInstance().setLineNumber()
 
@@ -1253,12 +1309,14 @@ class Manager(object):
         if self._getInstance().getWinPos() == 'popup':
             lfCmd("""call win_execute(%d, 'exec "norm! \<PageDown>"')""" % (self._getInstance().getPopupWinId()))
             self._getInstance().refreshPopupStatusline()
+            self._updateViewport()
             return
 
         if not self._getInstance().isReverseOrder():
             self._setResultContent()
 
         lfCmd('noautocmd exec "norm! \<PageDown>"')
+        self._updateViewport()
 
         self._getInstance().setLineNumber()
 
@@ -1300,7 +1358,9 @@ class Manager(object):
             self._toDown()
 
     def _search(self, content, is_continue=False, step=0):
+        self._sort_rest = False
         if not is_continue:
+            self._search_cmdline = self._cli.cmdline
             self.clearSelections()
             self._clearHighlights()
             self._clearHighlightsPos()
@@ -1336,11 +1396,13 @@ class Manager(object):
         unit = self._getUnit()
         step = step // unit * unit
         length = len(content)
+        # (begin, end) of content to be filtered if self._cb_content is not involved
+        cur_range = None
         if self._index == 0:
             self._cb_content = []
             self._result_content = []
             self._index = min(step, length)
-            cur_content = content[:self._index]
+            cur_range = (0, self._index)
         else:
             if not is_continue and self._result_content:
                 if self._cb_content:
@@ -1349,17 +1411,32 @@ class Manager(object):
                     self._cb_content = self._result_content
 
             if len(self._cb_content) >= step:
-                cur_content = self._cb_content[:step]
-                self._cb_content = self._cb_content[step:]
+                if is_fuzzyEngine_C and isinstance(self._cb_content, fuzzyEngine.ResultView):
+                    # the previous results are not turned into a list
+                    cur_content = self._cb_content.view(0, step)
+                    self._cb_content = self._cb_content.view(step)
+                else:
+                    cur_content = self._cb_content[:step]
+                    self._cb_content = self._cb_content[step:]
             else:
                 cur_content = self._cb_content
                 left = step - len(self._cb_content)
                 self._cb_content = []
                 if self._index < length:
                     end = min(self._index + left, length)
-                    cur_content += content[self._index:end]
+                    if cur_content:
+                        cur_content += content[self._index:end]
+                    else:
+                        cur_range = (self._index, end)
                     self._index = end
 
+        # the strings of content are converted only once if they are in the corpus
+        use_corpus = (cur_range is not None and use_fuzzy_engine and not return_index
+                      and not self._cli.isAndMode and self._corpus is not None
+                      and isinstance(content, list))
+        if cur_range is not None and not use_corpus:
+            cur_content = content[cur_range[0]:cur_range[1]]
+
         if self._cli.isAndMode:
             result, highlight_methods = filter_method(cur_content)
             if is_continue:
@@ -1375,6 +1452,12 @@ class Manager(object):
                 tmp_content = [self._getDigest(line, mode) for line in cur_content]
                 result = filter_method(source=tmp_content)
                 result = (result[0], [cur_content[i] for i in result[1]])
+            elif use_corpus:
+                result = filter_method(source=content, corpus=self._corpus,
+                                       begin=cur_range[0], end=cur_range[1])
+            elif isinstance(cur_content, fuzzyEngine.ResultView):
+                # the strings are reused if cur_content is a view of the corpus
+                result = filter_method(source=cur_content, corpus=self._corpus)
             else:
                 result = filter_method(source=cur_content)
 
@@ -1432,7 +1515,7 @@ class Manager(object):
         highlight_methods = []
         for p in self._cli.pattern:
             use_fuzzy_engine = False
-            if self._fuzzy_engine and isAscii(p) and self._getUnit() == 1: # currently, only BufTag's _getUnit() is 2
+            if self._fuzzy_engine and isCSupported(p) and self._getUnit() == 1: # currently, only BufTag's _getUnit() is 2
                 use_fuzzy_engine = True
                 pattern = fuzzyEngine.initPattern(p)
                 if self._getExplorer().getStlCategory() == "File" and self._cli.isFullPath:
@@ -1450,7 +1533,7 @@ class Manager(object):
                 getHighlights = partial(fuzzyEngine.getHighlights, engine=self._fuzzy_engine,
                                         pattern=pattern, is_name_only=not self._cli.isFullPath)
                 highlight_method = partial(self._highlight, self._cli.isFullPath, getHighlights, True, clear=False)
-            elif is_fuzzyMatch_C and isAscii(p):
+            elif is_fuzzyMatch_C and isCSupported(p):
                 pattern = fuzzyMatchC.initPattern(p)
                 if self._getExplorer().getStlCategory() == "File" and self._cli.isFullPath:
                     getWeight = partial(fuzzyMatchC.getWeight, pattern=pattern, is_name_only=False)
@@ -1517,7 +1600,7 @@ class Manager(object):
             filter_method = self._andModeFilter
         elif self._cli.isRefinement:
             if self._cli.pattern[1] == '':      # e.g. abc;
-                if self._fuzzy_engine and isAscii(self._cli.pattern[0]):
+                if self._fuzzy_engine and isCSupported(self._cli.pattern[0]):
                     use_fuzzy_engine = True
                     return_index = True
                     pattern = fuzzyEngine.initPattern(self._cli.pattern[0])
@@ -1526,7 +1609,7 @@ class Manager(object):
                     getHighlights = partial(fuzzyEngine.getHighlights, engine=self._fuzzy_engine,
                                             pattern=pattern, is_name_only=True)
                     highlight_method = partial(self._highlight, True, getHighlights, True)
-                elif is_fuzzyMatch_C and isAscii(self._cli.pattern[0]):
+                elif is_fuzzyMatch_C and isCSupported(self._cli.pattern[0]):
                     use_fuzzy_match_c = True
                     pattern = fuzzyMatchC.initPattern(self._cli.pattern[0])
                     getWeight = partial(fuzzyMatchC.getWeight, pattern=pattern, is_name_only=True)
@@ -1543,7 +1626,7 @@ class Manager(object):
                     filter_method = partial(self._fuzzyFilter, False, getWeight)
                     highlight_method = partial(self._highlight, False, getHighlights)
             elif self._cli.pattern[0] == '':    # e.g. ;abc
-                if self._fuzzy_engine and isAscii(self._cli.pattern[1]):
+                if self._fuzzy_engine and isCSupported(self._cli.pattern[1]):
                     use_fuzzy_engine = True
                     return_index = True
                     pattern = fuzzyEngine.initPattern(self._cli.pattern[1])
@@ -1552,7 +1635,7 @@ class Manager(object):
                     getHighlights = partial(fuzzyEngine.getHighlights, engine=self._fuzzy_engine,
                                             pattern=pattern, is_name_only=False)
                     highlight_method = partial(self._highlight, True, getHighlights, True)
-                elif is_fuzzyMatch_C and isAscii(self._cli.pattern[1]):
+                elif is_fuzzyMatch_C and isCSupported(self._cli.pattern[1]):
                     use_fuzzy_match_c = True
                     pattern = fuzzyMatchC.initPattern(self._cli.pattern[1])
                     getWeight = partial(fuzzyMatchC.getWeight, pattern=pattern, is_name_only=False)
@@ -1569,7 +1652,7 @@ class Manager(object):
                     filter_method = partial(self._fuzzyFilter, True, getWeight)
                     highlight_method = partial(self._highlight, True, getHighlights)
             else:   # e.g. abc;def
-                if is_fuzzyMatch_C and isAscii(self._cli.pattern[0]):
+                if is_fuzzyMatch_C and isCSupported(self._cli.pattern[0]):
                     is_ascii_0 = True
                     pattern_0 = fuzzyMatchC.initPattern(self._cli.pattern[0])
                     getWeight_0 = partial(fuzzyMatchC.getWeight, pattern=pattern_0, is_name_only=True)
@@ -1583,7 +1666,7 @@ class Manager(object):
                         getWeight_0 = fuzzy_match_0.getWeight
                     getHighlights_0 = fuzzy_match_0.getHighlights
 
-                if is_fuzzyMatch_C and isAscii(self._cli.pattern[1]):
+                if is_fuzzyMatch_C and isCSupported(self._cli.pattern[1]):
                     is_ascii_1 = True
                     pattern_1 = fuzzyMatchC.initPattern(self._cli.pattern[1])
                     getWeight_1 = partial(fuzzyMatchC.getWeight, pattern=pattern_1, is_name_only=False)
@@ -1602,9 +1685,11 @@ class Manager(object):
                 filter_method = partial(self._refineFilter, getWeight_0, getWeight_1)
                 highlight_method = partial(self._highlightRefine, getHighlights_0, getHighlights_1)
         else:
-            if self._fuzzy_engine and isAscii(self._cli.pattern) and self._getUnit() == 1: # currently, only BufTag's _getUnit() is 2
+            if self._fuzzy_engine and isCSupported(self._cli.pattern) and self._getUnit() == 1: # currently, only BufTag's _getUnit() is 2
                 use_fuzzy_engine = True
                 pattern = fuzzyEngine.initPattern(self._cli.pattern)
+                # the category and parameter that getHighlights() uses to find the digests
+                highlight_digest = None
                 if self._getExplorer().getStlCategory() == "File":
                     return_index = False
                     if self._cli.isFullPath:
@@ -1613,7 +1698,7 @@ class Manager(object):
                     else:
                         filter_method = partial(fuzzyEngine.fuzzyMatchPart, engine=self._fuzzy_engine,
                                                 pattern=pattern, category=fuzzyEngine.Category_File,
-                                                param=fuzzyEngine.createParameter(1),
+                                                param=self._getDigestParameter(fuzzyEngine.createParameter, 1),
                                                 is_name_only=True, sort_results=do_sort)
                 elif self._getExplorer().getStlCategory() == "Rg":
                     return_index = False
@@ -1621,17 +1706,22 @@ class Manager(object):
                         filter_method = partial(fuzzyEngine.fuzzyMatch, engine=self._fuzzy_engine, pattern=pattern,
                                                 is_name_only=True, sort_results=do_sort)
                     else:
+                        param = self._getDigestParameter(fuzzyEngine.createRgParameter,
+                                                         self._getExplorer().displayMulti(),
+                                                         self._getExplorer().getContextSeparator(),
+                                                         self._has_column)
                         filter_method = partial(fuzzyEngine.fuzzyMatchPart, engine=self._fuzzy_engine,
                                                 pattern=pattern, category=fuzzyEngine.Category_Rg,
-                                                param=fuzzyEngine.createRgParameter(self._getExplorer().displayMulti(),
-                                                    self._getExplorer().getContextSeparator(), self._has_column),
-                                                is_name_only=True, sort_results=do_sort)
+                                                param=param, is_name_only=True, sort_results=do_sort)
+                        highlight_digest = (fuzzyEngine.Category_Rg, param)
                 elif self._getExplorer().getStlCategory() == "Tag":
                     return_index = False
                     mode = 0 if self._cli.isFullPath else 1
+                    param = self._getDigestParameter(fuzzyEngine.createParameter, mode)
                     filter_method = partial(fuzzyEngine.fuzzyMatchPart, engine=self._fuzzy_engine,
                                             pattern=pattern, category=fuzzyEngine.Category_Tag,
-                                            param=fuzzyEngine.createParameter(mode), is_name_only=True, sort_results=do_sort)
+                                            param=param, is_name_only=True, sort_results=do_sort)
+                    highlight_digest = (fuzzyEngine.Category_Tag, param)
                 elif self._getExplorer().getStlCategory() == "Gtags":
                     return_index = False
                     result_format = 1
@@ -1639,15 +1729,18 @@ class Manager(object):
                         result_format = 0
                     elif self._getExplorer().getResultFormat() == "ctags-x":
                         result_format = 2
+                    param = self._getDigestParameter(fuzzyEngine.createGtagsParameter,
+                                                     0, result_format, self._match_path)
                     filter_method = partial(fuzzyEngine.fuzzyMatchPart, engine=self._fuzzy_engine,
                                             pattern=pattern, category=fuzzyEngine.Category_Gtags,
-                                            param=fuzzyEngine.createGtagsParameter(0, result_format, self._match_path),
-                                            is_name_only=True, sort_results=do_sort)
+                                            param=param, is_name_only=True, sort_results=do_sort)
+                    highlight_digest = (fuzzyEngine.Category_Gtags, param)
                 elif self._getExplorer().getStlCategory() == "Line":
                     return_index = False
                     filter_method = partial(fuzzyEngine.fuzzyMatchPart, engine=self._fuzzy_engine,
                                             pattern=pattern, category=fuzzyEngine.Category_Line,
-                                            param=fuzzyEngine.createParameter(1), is_name_only=True, sort_results=do_sort)
+                                            param=self._getDigestParameter(fuzzyEngine.createParameter, 1),
+                                            is_name_only=True, sort_results=do_sort)
                 elif self._getExplorer().getStlCategory() in ["Self", "Buffer", "Mru", "BufTag",
                         "Function", "History", "Cmd_History", "Search_History", "Filetype",
                         "Command", "Window", "QuickFix", "LocList"]:
@@ -1659,10 +1752,17 @@ class Manager(object):
                     filter_method = partial(fuzzyEngine.fuzzyMatchEx, engine=self._fuzzy_engine, pattern=pattern,
                                             is_name_only=not self._cli.isFullPath, sort_results=do_sort)
 
-                getHighlights = partial(fuzzyEngine.getHighlights, engine=self._fuzzy_engine,
-                                        pattern=pattern, is_name_only=not self._cli.isFullPath)
-                highlight_method = partial(self._highlight, self._cli.isFullPath, getHighlights, True)
-            elif is_fuzzyMatch_C and isAscii(self._cli.pattern):
+                if highlight_digest is not None:
+                    getHighlights = partial(fuzzyEngine.getHighlights, engine=self._fuzzy_engine,
+                                            pattern=pattern, is_name_only=not self._cli.isFullPath,
+                                            category=highlight_digest[0], param=highlight_digest[1])
+                    highlight_method = partial(self._highlight, self._cli.isFullPath, getHighlights, True,
+                                               engine_digest=True)
+                else:
+                    getHighlights = partial(fuzzyEngine.getHighlights, engine=self._fuzzy_engine,
+                                            pattern=pattern, is_name_only=not self._cli.isFullPath)
+                    highlight_method = partial(self._highlight, self._cli.isFullPath, getHighlights, True)
+            elif is_fuzzyMatch_C and isCSupported(self._cli.pattern):
                 use_fuzzy_match_c = True
                 pattern = fuzzyMatchC.initPattern(self._cli.pattern)
                 if self._getExplorer().getStlCategory() == "File" and self._cli.isFullPath:
@@ -1700,8 +1800,8 @@ class Manager(object):
                                            fuzzy_match.getHighlights)
 
         if self._cli.isAndMode:
-            if self._fuzzy_engine and isAscii(''.join(self._cli.pattern)):
-                step = 20000 * cpu_count
+            if self._fuzzy_engine and isCSupported(''.join(self._cli.pattern)):
+                step = 20000 * self._thread_count
             else:
                 step = 10000
             pair, highlight_methods = self._filter(step, filter_method, content, is_continue)
@@ -1714,11 +1814,15 @@ class Manager(object):
         elif use_fuzzy_engine:
             if step == 0:
                 if return_index == True:
-                    step = 30000 * cpu_count
+                    step = 30000 * self._thread_count
                 else:
-                    step = 60000 * cpu_count
+                    step = 60000 * self._thread_count
 
+            if do_sort:
+                # only the results to be displayed are sorted, see _sortRest()
+                filter_method = partial(filter_method, top_k=self._initial_count)
             _, self._result_content = self._filter(step, filter_method, content, is_continue, True, return_index)
+            self._sort_rest = do_sort
         else:
             if step == 0:
                 if use_fuzzy_match_c:
@@ -1754,6 +1858,7 @@ class Manager(object):
         return ((FuzzyMatch.getPathWeight(filename, suffix, dirname, line[icon_len:]), line) for line in iterable)
 
     def _guessSearch(self, content, is_continue=False, step=0):
+        self._sort_rest = False
         if self._cur_buffer.name == '' or self._cur_buffer.options["buftype"] not in [b'', '']:
             self._getInstance().setBuffer(content[:self._initial_count])
             self._getInstance().setStlResultsCount(len(content), True)
@@ -1792,29 +1897,44 @@ class Manager(object):
 
     def _highlight_and_mode(self, highlight_methods):
         self._clearHighlights()
+        self._highlight_pos_list = []
         for i, highlight_method in enumerate(highlight_methods):
             highlight_method(hl_group='Lf_hl_match' + str(i % 5))
 
-    def _clearHighlights(self):
+    def _getHighlightWinId(self):
+        """
+        return the id of the window the highlights are added to, 0 for the current window
+        """
         if self._getInstance().getWinPos() == 'popup':
-            for i in self._highlight_ids:
-                lfCmd("silent! call matchdelete(%d, %d)" % (i, self._getInstance().getPopupWinId()))
+            return self._getInstance().getPopupWinId()
         else:
-            for i in self._highlight_ids:
-                lfCmd("silent! call matchdelete(%d)" % i)
+            return 0
+
+    def _addHighlights(self, hl_group, pos_list):
+        """
+        highlight `pos_list`, a list of [line, col, length], with `hl_group` in a single call of Vim
+        """
+        if not pos_list:
+            return
+        ids = lfEval("leaderf#matchaddposList(%d, '%s', %s)"
+                     % (self._getHighlightWinId(), hl_group, str(pos_list)))
+        self._highlight_ids.extend(int(i) for i in ids)
+
+    def _clearHighlights(self):
+        if self._highlight_ids:
+            lfCmd("call leaderf#matchdeleteList(%d, %s)" % (self._getHighlightWinId(), str(self._highlight_ids)))
         self._highlight_ids = []
 
     def _clearHighlightsPos(self):
         self._highlight_pos = []
         self._highlight_pos_list = []
         self._highlight_refine_pos = []
+        self._highlight_start = 0
 
     @windo
     def _resetHighlights(self):
         self._clearHighlights()
 
-        unit = self._getUnit()
-        bottom = len(self._getInstance().buffer) - self._help_length
         if self._cli.isAndMode:
             highlight_pos_list = self._highlight_pos_list
         else:
@@ -1822,158 +1942,184 @@ class Manager(object):
 
         for n, highlight_pos in enumerate(highlight_pos_list):
             hl_group = 'Lf_hl_match' + str(n % 5)
-            for i, pos in enumerate(highlight_pos):
-                if self._getInstance().isReverseOrder():
-                    pos = [[bottom - unit*i] + p for p in pos]
-                else:
-                    pos = [[unit*i + 1 + self._help_length] + p for p in pos]
-                # The maximum number of positions is 8 in matchaddpos().
-                for j in range(0, len(pos), 8):
-                    if self._getInstance().getWinPos() == 'popup':
-                        lfCmd("""call win_execute(%d, "let matchid = matchaddpos('%s', %s)")"""
-                                % (self._getInstance().getPopupWinId(), hl_group, str(pos[j:j+8])))
-                        id = int(lfEval("matchid"))
-                    else:
-                        id = int(lfEval("matchaddpos('%s', %s)" % (hl_group, str(pos[j:j+8]))))
-                    self._highlight_ids.append(id)
+            self._addHighlights(hl_group, self._getHighlightPosList(self._highlight_start, highlight_pos))
 
-        for i, pos in enumerate(self._highlight_refine_pos):
-            if self._getInstance().isReverseOrder():
-                pos = [[bottom - unit*i] + p for p in pos]
-            else:
-                pos = [[unit*i + 1 + self._help_length] + p for p in pos]
-            # The maximum number of positions is 8 in matchaddpos().
-            for j in range(0, len(pos), 8):
-                if self._getInstance().getWinPos() == 'popup':
-                    lfCmd("""call win_execute(%d, "let matchid = matchaddpos('Lf_hl_matchRefine', %s)")"""
-                            % (self._getInstance().getPopupWinId(), str(pos[j:j+8])))
-                    id = int(lfEval("matchid"))
-                else:
-                    id = int(lfEval("matchaddpos('Lf_hl_matchRefine', %s)" % str(pos[j:j+8])))
-                self._highlight_ids.append(id)
+        self._addHighlights('Lf_hl_matchRefine',
+                            self._getHighlightPosList(self._highlight_start, self._highlight_refine_pos))
+
+    @windo
+    def _getVisibleLines(self):
+        """
+        return a tuple (top, bottom), the numbers of the first and the last lines visible in the window
+        """
+        if self._getInstance().getWinPos() == 'popup':
+            winid = self._getInstance().getPopupWinId()
+            return (int(lfEval("line('w0', %d)" % winid)), int(lfEval("line('w$', %d)" % winid)))
+        else:
+            return (int(lfEval("line('w0')")), int(lfEval("line('w$')")))
 
-    def _highlight(self, is_full_path, get_highlights, use_fuzzy_engine=False, clear=True, hl_group='Lf_hl_match'):
+    def _getVisibleRows(self):
+        """
+        return a tuple (first, last), the results from the `first`th to the `last`th(exclusive)
+        are visible in the window, each result takes `self._getUnit()` lines.
+        """
+        unit = self._getUnit()
+        count = len(self._getInstance().buffer) - self._help_length
+        top, bottom = self._getVisibleLines()
+        if self._getInstance().isReverseOrder():
+            first, last = count - bottom, count - top
+        else:
+            first, last = top - 1 - self._help_length, bottom - 1 - self._help_length
+
+        first = max(first, 0) // unit
+        last = min(last, count - 1) // unit + 1
+        return (first, max(first, last))
+
+    def _getHighlightRows(self):
+        """
+        return a tuple (first, last), the results from the `first`th to the `last`th(exclusive) are
+        to be highlighted, which are the visible ones and those next to them, so that scrolling a
+        little needs no highlighting again. At most g:Lf_NumberOfHighlight lines are highlighted.
+        """
+        unit = self._getUnit()
+        max_count = (int(lfEval("g:Lf_NumberOfHighlight")) + unit - 1) // unit
+        first, last = self._getVisibleRows()
+        margin = max(0, min(last - first, (max_count - (last - first)) // 2))
+        first = max(0, first - margin)
+        last = min(last + margin, first + max_count)
+        return (first, last)
+
+    def _getRowLines(self, first, last):
+        """
+        return the first line of each of the results from the `first`th to the `last`th(exclusive)
+        """
+        cb = self._getInstance().buffer
+        unit = self._getUnit()
+        if self._getInstance().isReverseOrder():
+            count = len(cb) - self._help_length
+            return cb[max(count - last * unit, 0):count - first * unit][::-1][::unit]
+        else:
+            return cb[self._help_length + first * unit:self._help_length + last * unit][::unit]
+
+    def _getHighlightPosList(self, first, highlight_pos):
+        """
+        return a list of [line, col, length] for matchaddpos(),
+        `highlight_pos` is the highlight positions of the results from the `first`th on.
+        """
+        unit = self._getUnit()
+        pos_list = []
+        if self._getInstance().isReverseOrder():
+            bottom = len(self._getInstance().buffer) - self._help_length
+            for i, pos in enumerate(highlight_pos, first):
+                pos_list.extend([bottom - unit*i] + p for p in pos)
+        else:
+            for i, pos in enumerate(highlight_pos, first):
+                pos_list.extend([unit*i + 1 + self._help_length] + p for p in pos)
+        return pos_list
+
+    def _updateViewport(self):
+        """
+        called after the window is scrolled or the cursor is moved
+        """
+        self._extendBuffer()
+        self._highlightViewport()
+
+    def _highlightViewport(self):
+        """
+        highlight the results that have become visible but are not highlighted, e.g., after scrolling
+        """
+        if not self._cli.pattern or not self._cli.isFuzzy or self._getInstance().empty():
+            return
+
+        first, last = self._getVisibleRows()
+        max_count = (int(lfEval("g:Lf_NumberOfHighlight")) + self._getUnit() - 1) // self._getUnit()
+        last = min(last, first + max_count)
+        if first < self._highlight_start or last > self._highlight_start + len(self._highlight_pos):
+            self._highlight_method()
+
+    def _getDigestParameter(self, create, *args):
+        """
+        return the parameter of fuzzyEngine.fuzzyMatchPart() created by `create(*args)`,
+        the same object is returned as long as the arguments do not change,
+        so that the engine reuses the digests it has calculated with it.
+        """
+        key = (create, args)
+        if self._digest_param is None or self._digest_param[0] != key:
+            self._digest_param = (key, create(*args))
+        return self._digest_param[1]
+
+    def _highlight(self, is_full_path, get_highlights, use_fuzzy_engine=False, clear=True, hl_group='Lf_hl_match',
+                   engine_digest=False):
+        """
+        if `engine_digest` is True, `get_highlights` finds the digests of the lines itself,
+        and the columns it returns are those in the whole lines.
+        """
         # matchaddpos() is introduced by Patch 7.4.330
         if (lfEval("exists('*matchaddpos')") == '0' or
                 lfEval("g:Lf_HighlightIndividual") == '0'):
             return
-        cb = self._getInstance().buffer
         if self._getInstance().empty(): # buffer is empty.
             return
 
-        highlight_number = int(lfEval("g:Lf_NumberOfHighlight"))
         if clear:
             self._clearHighlights()
 
         getDigest = partial(self._getDigest, mode=0 if is_full_path else 1)
-        unit = self._getUnit()
-
-        if self._getInstance().isReverseOrder():
-            if self._help_length > 0:
-                content = cb[:-self._help_length][::-1]
-            else:
-                content = cb[:][::-1]
-        else:
-            content = cb[self._help_length:]
+        first, last = self._getHighlightRows()
+        content = self._getRowLines(first, last)
+        self._highlight_start = first
 
         if use_fuzzy_engine:
-            self._highlight_pos = get_highlights(source=[getDigest(line)
-                                                         for line in content[:highlight_number:unit]])
+            if engine_digest:
+                self._highlight_pos = get_highlights(source=content)
+            else:
+                self._highlight_pos = get_highlights(source=[getDigest(line) for line in content])
         else:
             # e.g., self._highlight_pos = [ [ [2,3], [6,2] ], [ [1,4], [7,6], ... ], ... ]
             # where [2, 3] indicates the highlight starts at the 2nd column with the
             # length of 3 in bytes
-            self._highlight_pos = [get_highlights(getDigest(line))
-                                   for line in content[:highlight_number:unit]]
+            self._highlight_pos = [get_highlights(getDigest(line)) for line in content]
         if self._cli.isAndMode:
             self._highlight_pos_list.append(self._highlight_pos)
 
-        bottom = len(content)
-        for i, pos in enumerate(self._highlight_pos):
-            start_pos = self._getDigestStartPos(content[unit*i], 0 if is_full_path else 1)
-            if start_pos > 0:
-                for j in range(len(pos)):
-                    pos[j][0] += start_pos
-            if self._getInstance().isReverseOrder():
-                pos = [[bottom - unit*i] + p for p in pos]
-            else:
-                pos = [[unit*i + 1 + self._help_length] + p for p in pos]
-            # The maximum number of positions is 8 in matchaddpos().
-            for j in range(0, len(pos), 8):
-                if self._getInstance().getWinPos() == 'popup':
-                    lfCmd("""call win_execute(%d, "let matchid = matchaddpos('%s', %s)")"""
-                            % (self._getInstance().getPopupWinId(), hl_group, str(pos[j:j+8])))
-                    id = int(lfEval("matchid"))
-                else:
-                    id = int(lfEval("matchaddpos('%s', %s)" % (hl_group, str(pos[j:j+8]))))
-                self._highlight_ids.append(id)
+        if not engine_digest:
+            for i, pos in enumerate(self._highlight_pos):
+                start_pos = self._getDigestStartPos(content[i], 0 if is_full_path else 1)
+                if start_pos > 0:
+                    for j in range(len(pos)):
+                        pos[j][0] += start_pos
+        self._addHighlights(hl_group, self._getHighlightPosList(first, self._highlight_pos))
 
     def _highlightRefine(self, first_get_highlights, get_highlights):
         # matchaddpos() is introduced by Patch 7.4.330
         if (lfEval("exists('*matchaddpos')") == '0' or
                 lfEval("g:Lf_HighlightIndividual") == '0'):
             return
-        cb = self._getInstance().buffer
         if self._getInstance().empty(): # buffer is empty.
             return
 
-        highlight_number = int(lfEval("g:Lf_NumberOfHighlight"))
         self._clearHighlights()
 
         getDigest = self._getDigest
-        unit = self._getUnit()
+        first, last = self._getHighlightRows()
+        content = self._getRowLines(first, last)
+        self._highlight_start = first
 
-        if self._getInstance().isReverseOrder():
-            if self._help_length > 0:
-                content = cb[:-self._help_length][::-1]
-            else:
-                content = cb[:][::-1]
-        else:
-            content = cb[self._help_length:]
-
-        bottom = len(content)
-
-        self._highlight_pos = [first_get_highlights(getDigest(line, 1))
-                               for line in content[:highlight_number:unit]]
+        self._highlight_pos = [first_get_highlights(getDigest(line, 1)) for line in content]
         for i, pos in enumerate(self._highlight_pos):
-            start_pos = self._getDigestStartPos(content[unit*i], 1)
+            start_pos = self._getDigestStartPos(content[i], 1)
             if start_pos > 0:
                 for j in range(len(pos)):
                     pos[j][0] += start_pos
-            if self._getInstance().isReverseOrder():
-                pos = [[bottom - unit*i] + p for p in pos]
-            else:
-                pos = [[unit*i + 1 + self._help_length] + p for p in pos]
-            # The maximum number of positions is 8 in matchaddpos().
-            for j in range(0, len(pos), 8):
-                if self._getInstance().getWinPos() == 'popup':
-                    lfCmd("""call win_execute(%d, "let matchid = matchaddpos('Lf_hl_match', %s)")"""
-                            % (self._getInstance().getPopupWinId(), str(pos[j:j+8])))
-                    id = int(lfEval("matchid"))
-                else:
-                    id = int(lfEval("matchaddpos('Lf_hl_match', %s)" % str(pos[j:j+8])))
-                self._highlight_ids.append(id)
+        self._addHighlights('Lf_hl_match', self._getHighlightPosList(first, self._highlight_pos))
 
-        self._highlight_refine_pos = [get_highlights(getDigest(line, 2))
-                                      for line in content[:highlight_number:unit]]
+        self._highlight_refine_pos = [get_highlights(getDigest(line, 2)) for line in content]
         for i, pos in enumerate(self._highlight_refine_pos):
-            start_pos = self._getDigestStartPos(content[unit*i], 2)
+            start_pos = self._getDigestStartPos(content[i], 2)
             if start_pos > 0:
                 for j in range(len(pos)):
                     pos[j][0] += start_pos
-            if self._getInstance().isReverseOrder():
-                pos = [[bottom - unit*i] + p for p in pos]
-            else:
-                pos = [[unit*i + 1 + self._help_length] + p for p in pos]
-            # The maximum number of positions is 8 in matchaddpos().
-            for j in range(0, len(pos), 8):
-                if self._getInstance().getWinPos() == 'popup':
-                    lfCmd("""call win_execute(%d, "let matchid = matchaddpos('Lf_hl_matchRefine', %s)")"""
-                            % (self._getInstance().getPopupWinId(), str(pos[j:j+8])))
-                    id = int(lfEval("matchid"))
-                else:
-                    id = int(lfEval("matchaddpos('Lf_hl_matchRefine', %s)" % str(pos[j:j+8])))
-                self._highlight_ids.append(id)
+        self._addHighlights('Lf_hl_matchRefine', self._getHighlightPosList(first, self._highlight_refine_pos))
 
     def _regexFilter(self, iterable):
         def noErrMatch(text, pattern):
@@ -2374,6 +2520,8 @@ class Manager(object):
 
     def selectAll(self):
         line_num = len(self._getInstance().buffer)
+        # if the buffer holds only part of the results, there are more than 300 of them,
+        # see _getBufferChunk()
         if line_num > 300:
             lfCmd("echohl Error | redraw | echo ' Too many files selected!' | echohl NONE")
             lfCmd("sleep 1")
@@ -2470,6 +2618,7 @@ class Manager(object):
         # clear the buffer only when the content is not a list
         self._getInstance().enterBuffer(win_pos, not isinstance(content, list))
         self._initial_count = self._getInstance().getInitialWinHeight()
+        self._buffer_limit = self._getBufferChunk()
 
         self._getInstance().setStlCategory(self._getExplorer().getStlCategory())
         self._setStlMode(**kwargs)
@@ -2520,9 +2669,10 @@ class Manager(object):
                 self.input()
             else:
                 if not remember_last_status and not empty_query:
-                    self._getInstance().appendBuffer(self._content[self._initial_count:])
+                    self._getInstance().appendBuffer(self._content[self._initial_count:self._buffer_limit])
                 elif remember_last_status and len(self._getInstance().buffer) < len(self._result_content):
-                    self._getInstance().appendBuffer(self._result_content[self._initial_count:])
+                    self._sortRest()
+                    self._getInstance().appendBuffer(self._result_content[self._initial_count:self._buffer_limit])
 
                 lfCmd("echo")
                 if self._cli.pattern:
@@ -2536,9 +2686,9 @@ class Manager(object):
                     self._guessSearch(self._content)
                     if self._result_content: # self._result_content is [] only if
                                              #  self._cur_buffer.name == '' or self._cur_buffer.options["buftype"] not in [b'', '']:
-                        self._getInstance().appendBuffer(self._result_content[self._initial_count:])
+                        self._getInstance().appendBuffer(self._result_content[self._initial_count:self._buffer_limit])
                     else:
-                        self._getInstance().appendBuffer(self._content[self._initial_count:])
+                        self._getInstance().appendBuffer(self._content[self._initial_count:self._buffer_limit])
 
                     if self._timer_id is not None:
                         lfCmd("call timer_stop(%s)" % self._timer_id)
@@ -2571,10 +2721,7 @@ class Manager(object):
 
                 self._read_finished = 0
 
-                self._stop_reader_thread = False
-                self._reader_thread = threading.Thread(target=self._readContent, args=(content,))
-                self._reader_thread.daemon = True
-                self._reader_thread.start()
+                self._startReaderThread(content)
                 self._previewFirstLine()
 
             if not kwargs.get('bang', 0):
@@ -2605,23 +2752,127 @@ class Manager(object):
                 self._bangEnter()
                 self._getInstance().mimicCursor()
 
+    def _startReaderThread(self, content):
+        """
+        read `content` into `self._content` in a thread
+        """
+        self._stop_reader_thread = False
+        self._content_consumed = len(self._content)
+        self._reader_thread = threading.Thread(target=self._readContent, args=(content,))
+        self._reader_thread.daemon = True
+        self._reader_thread.start()
+
+    def _consumeContent(self):
+        """
+        called by the UI when it has taken the lines read so far, see _readContent()
+        """
+        with self._content_cond:
+            self._content_consumed = len(self._content)
+            self._content_cond.notify()
+
     def _readContent(self, content):
         try:
-            for line in content:
-                self._content.append(line)
+            for batch in content.batches():
+                with self._content_cond:
+                    self._content.extend(batch)
+                    # stop reading while the UI is behind, then the command is blocked by the pipe
+                    # instead of the lines piling up in memory
+                    while (len(self._content) - self._content_consumed >= self._content_high_water
+                           and not self._stop_reader_thread):
+                        self._content_cond.wait(0.1)
                 if self._stop_reader_thread:
                     break
+                # release the GIL, so that the UI thread is not blocked by a long output
+                time.sleep(0)
             else:
                 self._read_finished = 1
         except Exception:
             self._read_finished = 1
             self._read_content_exception = sys.exc_info()
 
+    def _sortRest(self):
+        """
+        sort the results that are beyond the top ones sorted by the fuzzy engine,
+        it must be called before they are displayed
+        """
+        if self._sort_rest:
+            fuzzyEngine.sortRest(self._previous_result)
+            self._sort_rest = False
+
     def _setResultContent(self):
+        """
+        write the results to the buffer, at most `self._buffer_limit` lines of them,
+        the rest are written by _extendBuffer() when they are scrolled to
+        """
         if len(self._result_content) > len(self._getInstance().buffer):
-            self._getInstance().setBuffer(self._result_content)
+            self._sortRest()
+            self._getInstance().setBuffer(self._result_content[:self._buffer_limit])
         elif self._index == 0:
-            self._getInstance().setBuffer(self._content, need_copy=True)
+            self._getInstance().setBuffer(self._content[:self._buffer_limit])
+
+    def _getBufferChunk(self):
+        """
+        return the number of lines written to the buffer at a time, see _extendBuffer()
+        """
+        unit = self._getUnit()
+        return max(1000, 10 * self._initial_count) // unit * unit
+
+    def _extendBuffer(self, all=False):
+        """
+        write another chunk of the results to the buffer if the window is near its end,
+        or all of them if `all` is True.
+        Writing tens of thousands of lines to the buffer at once takes seconds,
+        so the buffer holds only the first `self._buffer_limit` lines of the results.
+        """
+        instance = self._getInstance()
+        if instance.empty():
+            return
+
+        count = len(instance.buffer) - self._help_length
+        if count < self._buffer_limit:  # all the results are written
+            return
+
+        if self._cli.pattern or self._result_content:
+            content = self._result_content
+        else:
+            content = self._content
+
+        if len(content) <= count:
+            return
+
+        if all:
+            self._buffer_limit = sys.maxsize
+        else:
+            top, bottom = self._getVisibleLines()
+            height = bottom - top + 1
+            if instance.isReverseOrder():
+                if top > height:
+                    return
+            elif len(instance.buffer) - bottom >= height:
+                return
+            self._buffer_limit = count + self._getBufferChunk()
+
+        if content is self._result_content:
+            self._sortRest()
+        else:
+            self._offset_in_content = min(len(content), self._buffer_limit)
+        instance.appendBuffer(content[count:self._buffer_limit])
+
+    def jump(self, cmd):
+        """
+        cmd is in {'gg', 'G'}, a count is accepted as in Normal mode
+        """
+        count = int(lfEval("v:count"))
+        if count == 0 and (cmd == 'G') != self._getInstance().isReverseOrder():
+            self._extendBuffer(True)
+
+        cmd = (str(count) if count > 0 else '') + cmd
+        if self._getInstance().getWinPos() == 'popup':
+            lfCmd("noautocmd call win_execute(%d, 'norm! %s')" % (self._getInstance().getPopupWinId(), cmd))
+        else:
+            lfCmd("noautocmd norm! %s" % cmd)
+            self._getInstance().setLineNumber()
+        self._updateViewport()
 
     @catchException
     def _workInIdle(self, content=None, bang=False):
@@ -2639,7 +2890,7 @@ class Manager(object):
         if self._is_content_list:
             if self._cli.pattern and (self._index < len(self._content) or len(self._cb_content) > 0):
                 if self._fuzzy_engine:
-                    step = 60000 * cpu_count
+                    step = 60000 * self._thread_count
                 elif is_fuzzyMatch_C:
                     step = 10000
                 else:
@@ -2647,12 +2898,12 @@ class Manager(object):
                 self._search(self._content, True, step)
             return
 
-        if content:
-            i = -1
-            for i, line in enumerate(itertools.islice(content, 20)):
-                self._content.append(line)
+        self._consumeContent()
 
-            if i == -1 and self._read_finished == 0:
+        if content:
+            cur_len = len(self._content)
+            self._content.extend(itertools.islice(content, 20))
+            if len(self._content) == cur_len and self._read_finished == 0:
                 self._read_finished = 1
 
         if self._read_finished > 0:
@@ -2669,9 +2920,9 @@ class Manager(object):
                     if bang:
                         if self._result_content: # self._result_content is [] only if
                                                  #  self._cur_buffer.name == '' or self._cur_buffer.options["buftype"] != b'':
-                            self._getInstance().appendBuffer(self._result_content[self._initial_count:])
+                            self._getInstance().appendBuffer(self._result_content[self._initial_count:self._buffer_limit])
                         else:
-                            self._getInstance().appendBuffer(self._content[self._initial_count:])
+                            self._getInstance().appendBuffer(self._content[self._initial_count:self._buffer_limit])
 
                         if self._timer_id is not None:
                             lfCmd("call timer_stop(%s)" % self._timer_id)
@@ -2683,11 +2934,11 @@ class Manager(object):
                 else:
                     if bang:
                         if self._getInstance().empty():
-                            self._offset_in_content = len(self._content)
+                            self._offset_in_content = min(len(self._content), self._buffer_limit)
                             if self._offset_in_content > 0:
                                 self._getInstance().appendBuffer(self._content[:self._offset_in_content])
                         else:
-                            cur_len = len(self._content)
+                            cur_len = min(len(self._content), self._buffer_limit)
                             if cur_len > self._offset_in_content:
                                 self._getInstance().appendBuffer(self._content[self._offset_in_content:cur_len])
                                 self._offset_in_content = cur_len
@@ -2713,7 +2964,7 @@ class Manager(object):
             if self._cli.pattern:
                 if self._index < len(self._content) or len(self._cb_content) > 0:
                     if self._fuzzy_engine:
-                        step = 60000 * cpu_count
+                        step = 60000 * self._thread_count
                     elif is_fuzzyMatch_C:
                         step = 10000
                     else:
@@ -2721,7 +2972,8 @@ class Manager(object):
                     self._search(self._content, True, step)
 
                     if bang:
-                        self._getInstance().appendBuffer(self._result_content[self._initial_count:])
+                        self._sortRest()
+                        self._getInstance().appendBuffer(self._result_content[self._initial_count:self._buffer_limit])
         else:
             cur_len = len(self._content)
             if time.time() - self._start_time > 0.1:
@@ -2740,20 +2992,20 @@ class Manager(object):
             if self._cli.pattern:
                 if self._index < cur_len or len(self._cb_content) > 0:
                     if self._fuzzy_engine:
-                        step = 60000 * cpu_count
+                        step = 60000 * self._thread_count
                     elif is_fuzzyMatch_C:
                         step = 10000
                     else:
                         step = 2000
-                    self._search(self._content[:cur_len], True, step)
+                    self._search(self._content, True, step)
             else:
                 if bang:
                     if self._getInstance().empty():
-                        self._offset_in_content = len(self._content)
+                        self._offset_in_content = min(len(self._content), self._buffer_limit)
                         if self._offset_in_content > 0:
                             self._getInstance().appendBuffer(self._content[:self._offset_in_content])
                     else:
-                        cur_len = len(self._content)
+                        cur_len = min(len(self._content), self._buffer_limit)
                         if cur_len > self._offset_in_content:
                             self._getInstance().appendBuffer(self._content[self._offset_in_content:cur_len])
                             self._offset_in_content = cur_len
@@ -2801,21 +3053,25 @@ class Manager(object):
             self._guessSearch(self._content)
             self._previewResult(False)
 
+        # self._content is only appended to by the reader thread and _filter()
+        # takes a snapshot of its length, so there is no need to copy it
         for cmd in self._cli.input(self._callback):
-            cur_len = len(self._content)
-            cur_content = self._content[:cur_len]
             if equal(cmd, '<Update>'):
                 if self._getInstance().getWinPos() == 'popup':
                     if self._getInstance()._window_object.cursor[0] > 1:
                         lfCmd("call win_execute({}, 'norm! gg')".format(self._getInstance().getPopupWinId()))
-                self._search(cur_content)
+                # the previous results can only be narrowed if the pattern is
+                # extended at the end, e.g., `abc def` -> `abc de f` can not
+                if not self._cli.cmdline.startswith(self._search_cmdline):
+                    self._index = 0
+                self._search(self._content)
             elif equal(cmd, '<Shorten>'):
                 if self._getInstance().isReverseOrder():
                     lfCmd("normal! G")
                 else:
                     self._gotoFirstLine()
                 self._index = 0 # search from beginning
-                self._search(cur_content)
+                self._search(self._content)
             elif equal(cmd, '<Mode>'):
                 self._setStlMode()
                 if self._getInstance().getWinPos() in ('popup', 'floatwin'):
@@ -2827,7 +3083,7 @@ class Manager(object):
                     self._gotoFirstLine()
                 self._index = 0 # search from beginning
                 if self._cli.pattern and "--live" not in self._arguments:
-                    self._search(cur_content)
+                    self._search(self._content)
             elif equal(cmd, '<C-K>'):
                 self._toUp()
                 self._previewResult(False)
@@ -2841,7 +3097,7 @@ class Manager(object):
                     else:
                         self._gotoFirstLine()
                     self._index = 0 # search from beginning
-                    self._search(cur_content)
+                    self._search(self._content)
             elif equal(cmd, '<Down>'):
                 if self._cli.nextHistory(self._getExplorer().getStlCategory()):
                     if self._getInstance().isReverseOrder():
@@ -2849,7 +3105,7 @@ class Manager(object):
                     else:
                         self._gotoFirstLine()
                     self._index = 0 # search from beginning
-                    self._search(cur_content)
+                    self._search(self._content)
             elif equal(cmd, '<LeftMouse>'):
                 if self._leftClick():
                     break
@@ -2899,10 +3155,7 @@ class Manager(object):
                 self._cli.hideCursor()
                 self._createHelpHint()
                 self._resetHighlights()
-                if self._getInstance().isReverseOrder() and self._cli.pattern \
-                        and len(self._highlight_pos) < (len(self._getInstance().buffer) - self._help_length) // self._getUnit() \
-                        and len(self._highlight_pos) < int(lfEval("g:Lf_NumberOfHighlight")):
-                    self._highlight_method()
+                self._updateViewport()
 
                 if self._getInstance().getWinPos() in ('popup', 'floatwin'):
                     self._cli.buildPopupPrompt()
@@ -5,7 +5,6 @@ import vim
 import os
 import sys
 import os.path
-import fnmatch
 from .utils import *
 
 
@@ -50,10 +49,10 @@ class Mru(object):
 
     def saveToCache(self, buf_name_list):
         buf_names = []
+        exclude = compileGlobs(lfEval("g:Lf_MruFileExclude"))
         for name in buf_name_list:
             name = self.normalize(name)
-            if True in (fnmatch.fnmatch(name, i)
-                        for i in lfEval("g:Lf_MruFileExclude")):
+            if exclude is not None and exclude.match(os.path.normcase(name)):
                 continue
             buf_names.append(name)
 
@@ -4,7 +4,6 @@
 import vim
 import os
 import os.path
-from fnmatch import fnmatch
 from .utils import *
 from .explorer import *
 from .manager import *
@@ -50,9 +49,11 @@ class MruExplorer(Explorer):
             lines = [name for name in lines if lfDecode(name).startswith(os.path.join(project_root, ''))]
 
         lines = [line.rstrip() for line in lines] # remove the '\n'
-        wildignore = lfEval("g:Lf_MruWildIgnore")
-        lines = [name for name in lines if True not in (fnmatch(name, j) for j in wildignore.get('file', []))
-                    and True not in (fnmatch(name, "*/" + j + "/*") for j in wildignore.get('dir', []))]
+        dir_regex, file_regex = getIgnoreRegexes("g:Lf_MruWildIgnore", "*/%s/*")
+        if file_regex is not None:
+            lines = [name for name in lines if not file_regex.match(os.path.normcase(name))]
+        if dir_regex is not None:
+            lines = [name for name in lines if not dir_regex.match(os.path.normcase(name))]
 
         if len(lines) == 0:
             return lines
@@ -44,6 +44,8 @@ class RgExplorer(Explorer):
         self._display_multi = False
         self._cmd_work_dir = ""
         self._rg = lfEval("get(g:, 'Lf_Rg', 'rg')")
+        self._live_files = None     # [key, pattern, files] of the last live search that finished
+        self._file_regex = re.compile(r'(.+?):\d+:')
 
     def getContent(self, *args, **kwargs):
         arguments_dict = kwargs.get("arguments", {})
@@ -335,13 +337,94 @@ class RgExplorer(Explorer):
         else:
             heading = "--no-heading"
 
-        cmd = '''{} {} --no-config --no-ignore-messages {} --with-filename --color never --line-number '''\
-                '''{} {}{}{}{}{}{}{}'''.format(self._rg, extra_options, heading, case_flag, word_or_line, zero_args_options,
-                                                  one_args_options, repeatable_options, lfDecode(pattern), path, no_error_message)
+        xargs = ''
+        if "--live" in arguments_dict:
+            # the options except the pattern
+            key = (lfGetCwd(), extra_options, heading, case_flag, word_or_line, zero_args_options,
+                   one_args_options, repeatable_options, path)
+            if (os.name != 'nt' and lfEval("get(g:, 'Lf_RgLiveNarrow', 1)") == '1'
+                    and is_literal and word_or_line == '' and "-v" not in arguments_dict
+                    and "--current-buffer" not in arguments_dict and "--all-buffers" not in arguments_dict
+                    and not any(opt.strip().startswith(("-v", "--invert-match", "-w", "--word-regexp",
+                                                        "-x", "--line-regexp")) for opt in rg_config)):
+                files = self._getLiveFiles(key, kwargs["pattern"])
+            else:
+                files = None
+
+            if files is not None:
+                if not files:
+                    return AsyncExecutor.Result(iter([]))
+
+                with tmp_file(mode='w', suffix='_files', delete=False) as f:
+                    file_name = lfDecode(f.name)
+                    f.write('\0'.join(files))
+
+                tmpfilenames.append(file_name)
+                xargs = 'xargs -0 '
+                path = '< "%s"' % file_name
+
+        cmd = '''{}{} {} --no-config --no-ignore-messages {} --with-filename --color never --line-number '''\
+                '''{} {}{}{}{}{}{}{}'''.format(xargs, self._rg, extra_options, heading, case_flag, word_or_line,
+                                                  zero_args_options, one_args_options, repeatable_options,
+                                                  lfDecode(pattern), path, no_error_message)
         lfCmd("let g:Lf_Debug_RgCmd = '%s'" % escQuote(cmd))
         content = executor.execute(cmd, encoding=lfEval("&encoding"), cleanup=partial(removeFiles, tmpfilenames))
+        if "--live" in arguments_dict:
+            content = AsyncExecutor.Result(self._recordFiles(content, [key, kwargs["pattern"], None],
+                                                             key[0], int(lfEval("g:Lf_MaxCount"))),
+                                           batched=True)
         return content
 
+    def _getLiveFiles(self, key, pattern):
+        """
+        return the files that can contain `pattern`, or None if all the files must be searched.
+        the literal `pattern` can only be in the files where the pattern of the last search is,
+        if it contains that pattern, e.g., the user types more characters.
+        """
+        live_files = self._live_files
+        if live_files is None or live_files[0] != key or live_files[1] not in pattern:
+            return None
+
+        return live_files[2]
+
+    def _recordFiles(self, content, live_files, cwd, max_count):
+        """
+        yield the lines of `content` in batches, and keep the files in them
+        if all the lines are read, see _getLiveFiles().
+        """
+        files = []
+        seen = set()
+        count = 0
+        for lines in content.batches():
+            count += len(lines)
+            if files is not None:
+                for line in lines:
+                    m = self._file_regex.match(line)
+                    if m is None:   # e.g., --heading, context lines
+                        files = None
+                        break
+
+                    file = m.group(1)
+                    if file not in seen:
+                        if len(files) >= 2000:  # rg walks faster than it searches so many files given
+                            files = None
+                            break
+
+                        # a file name like 'a:1:b' is matched wrongly
+                        if not os.path.isfile(os.path.join(cwd, lfDecode(file))):
+                            files = None
+                            break
+
+                        seen.add(file)
+                        files.append(file)
+
+            yield lines
+
+        # the output is not complete if it is cut at g:Lf_MaxCount
+        if files is not None and (max_count <= 0 or count < max_count):
+            live_files[2] = files
+            self._live_files = live_files
+
     def translateRegex(self, regex, is_perl=False):
 
         def replace(text, pattern, repl):
@@ -449,6 +532,7 @@ class RgExplorer(Explorer):
         for exe in self._executor:
             exe.killProcess()
         self._executor = []
+        self._live_files = None
 
     def getPatternRegex(self):
         return self._pattern_regex
@@ -1020,10 +1104,7 @@ class RgExplManager(Manager):
 
         self._read_finished = 0
 
-        self._stop_reader_thread = False
-        self._reader_thread = threading.Thread(target=self._readContent, args=(content,))
-        self._reader_thread.daemon = True
-        self._reader_thread.start()
+        self._startReaderThread(content)
         # for the case of --input
         self._previewFirstLine()
 
@@ -1197,7 +1278,15 @@ class RgExplManager(Manager):
         lfCmd("call setloclist(%d, %s, 'r')" % (int(winnr), json.dumps(items, ensure_ascii=False)))
         lfCmd("echohl WarningMsg | redraw | echo ' Output result to location list.' | echohl NONE")
 
+    def _extendBuffer(self, all=False):
+        # the buffer is being edited in the replace mode
+        if self._current_mode == 'NORMAL' and self._getInstance().buffer.options["modifiable"]:
+            return
+
+        super(RgExplManager, self)._extendBuffer(all)
+
     def _getFormatedContents(self):
+        self._extendBuffer(True)
         items = []
         for line in self._instance._buffer_object:
             if self._has_column:
@@ -1226,6 +1315,9 @@ class RgExplManager(Manager):
         if self._read_finished == 0:
             return
 
+        # all the results must be in the buffer before it is edited
+        self._extendBuffer(True)
+
         try:
             if not self._getInstance().buffer.options["modifiable"]:
                 self._getInstance().buffer.options["buftype"] = "acwrite"
@@ -1454,6 +1546,8 @@ class RgExplManager(Manager):
         if not self._cli.pattern:   # e.g., when <BS> or <Del> is typed
             return
 
+        self._consumeContent()
+
         if self._read_content_exception is not None:
             raise self._read_content_exception[1]
 
@@ -1518,14 +1612,11 @@ class RgExplManager(Manager):
             return
 
         self._clearPreviewHighlights()
-        self._stop_reader_thread = False
         self._read_finished = 0
         self._content = []
         self._pattern_changed = True
         content = self._getExplorer().getContent(arguments=self._arguments, pattern=self._cli.pattern)
-        self._reader_thread = threading.Thread(target=self._readContent, args=(content,))
-        self._reader_thread.daemon = True
-        self._reader_thread.start()
+        self._startReaderThread(content)
 
         self._highlightMatch()
         self._highlightInPreview()
@@ -8,6 +8,8 @@ import os
 import os.path
 import time
 import locale
+import fnmatch
+import multiprocessing
 import traceback
 import warnings
 warnings.filterwarnings("ignore", category=DeprecationWarning)
@@ -250,6 +252,138 @@ def nearestAncestor(markers, path):
 
     return ""
 
+# {tuple of glob patterns: compiled regex}
+_glob_regexes = {}
+
+def compileGlobs(patterns):
+    """
+    return a compiled regex that matches a name if fnmatch.fnmatch() matches it with
+    any of the glob `patterns`, or None if `patterns` is empty.
+    As fnmatch.fnmatch() does, the patterns are normalized by os.path.normcase(), so must be
+    the names that have a directory part before they are matched, e.g., '/' is '\\' on Windows.
+    The regex is cached, so it is compiled again only when `patterns` changes.
+    """
+    key = tuple(patterns)
+    if key in _glob_regexes:
+        return _glob_regexes[key]
+
+    if not key:
+        regex = None
+    else:
+        regexes = []
+        for p in key:
+            regex = fnmatch.translate(os.path.normcase(p))
+            # e.g., '.*\\.o\\Z(?ms)' before python 3.6, the inline flags can not be in the middle
+            if regex.endswith('(?ms)'):
+                regex = regex[:-len('(?ms)')]
+            regexes.append('(?:%s)' % regex)
+
+        # fnmatch.fnmatch() ignores case on Windows, so that the base names need not be normalized
+        flags = re.IGNORECASE if os.name == 'nt' else 0
+        regex = re.compile('|'.join(regexes), flags | re.DOTALL)
+
+    if len(_glob_regexes) >= 32:
+        _glob_regexes.clear()
+    _glob_regexes[key] = regex
+    return regex
+
+def getIgnoreRegexes(option, dir_format="%s"):
+    """
+    return a tuple (dir_regex, file_regex) compiled by compileGlobs() from the 'dir' and 'file'
+    patterns of `option`, e.g., "g:Lf_WildIgnore".
+    `dir_format` is applied to each 'dir' pattern, e.g., "*/%s/*" to match a full path.
+    """
+    wildignore = lfEval(option)
+    return (compileGlobs([dir_format % p for p in wildignore.get('dir', [])]),
+            compileGlobs(wildignore.get('file', [])))
+
+def _readCpuQuota(cgroup_dir):
+    """
+    return the number of CPUs that the cgroup `cgroup_dir` is allowed to use,
+    or None if it is not limited or can not be read.
+    """
+    try:
+        # cgroup v2, e.g., "200000 100000" or "max 100000"
+        with open(os.path.join(cgroup_dir, 'cpu.max')) as f:
+            quota, period = f.read().split()[:2]
+        if quota == 'max':
+            return None
+        return float(quota) / float(period)
+    except (IOError, OSError, ValueError):
+        pass
+
+    try:
+        # cgroup v1, the quota is -1 if it is not limited
+        with open(os.path.join(cgroup_dir, 'cpu.cfs_quota_us')) as f:
+            quota = int(f.read())
+        with open(os.path.join(cgroup_dir, 'cpu.cfs_period_us')) as f:
+            period = int(f.read())
+        if quota <= 0 or period <= 0:
+            return None
+        return float(quota) / period
+    except (IOError, OSError, ValueError):
+        return None
+
+def _cgroupCpuCount():
+    """
+    return the CPU quota of the cgroup of this process, rounded up, or None if it is not limited
+    """
+    try:
+        with open('/proc/self/cgroup') as f:
+            lines = f.read().splitlines()
+    except (IOError, OSError):
+        return None
+
+    dirs = []
+    for line in lines:
+        fields = line.split(':', 2)
+        if len(fields) != 3:
+            continue
+        controllers = fields[1].split(',')
+        path = fields[2].lstrip('/')
+        if fields[0] == '0' and fields[1] == '':
+            dirs.extend([os.path.join('/sys/fs/cgroup', path), '/sys/fs/cgroup'])
+        elif 'cpu' in controllers:
+            for root in ('/sys/fs/cgroup/cpu,cpuacct', '/sys/fs/cgroup/cpu'):
+                dirs.extend([os.path.join(root, path), root])
+
+    for dir in dirs:
+        quota = _readCpuQuota(dir)
+        if quota is not None:
+            return max(1, int(quota + 0.999))
+
+    return None
+
+_cpu_count = None
+
+def lfCpuCount():
+    """
+    return the number of CPUs this process can actually use, i.e., the CPUs in
+    its affinity mask, limited by the CPU quota of its cgroup, e.g., in a container.
+    """
+    global _cpu_count
+    if _cpu_count is None:
+        try:
+            count = len(os.sched_getaffinity(0))
+        except (AttributeError, OSError):
+            count = multiprocessing.cpu_count()
+
+        quota = _cgroupCpuCount()
+        if quota is not None:
+            count = min(count, quota)
+
+        _cpu_count = max(1, count)
+
+    return _cpu_count
+
+def lfThreadCount():
+    """
+    return the number of threads used by the fuzzy engine,
+    which is g:Lf_FuzzyEngineThreads if it is greater than 0, otherwise lfCpuCount().
+    """
+    count = int(lfEval("get(g:, 'Lf_FuzzyEngineThreads', 0)"))
+    return count if count > 0 else lfCpuCount()
+
 extension_ft = {
     ".8th"         : "8th",
     ".aap"         : "aap",